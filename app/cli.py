@@ -1,7 +1,11 @@
 import argparse
+import sys
+import time
 from pathlib import Path
 
-from app.db import init_db
+from app.config import JOB_WORKERS
+from app.finance import auto_reconcile, check_financial_totals
+from app.import_validation import IMPORT_SPECS, dry_run_import, format_dry_run
 from app.importers import (
     import_bank_accounts,
     import_bank_transactions,
@@ -12,12 +16,17 @@ from app.importers import (
     import_owners,
     import_trucks,
 )
+from app.jobs import job_worker_metrics, start_job_workers, stop_job_workers
+from app.migrations import migrate, migration_status
 
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Bot Empresa (importações)")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
+    migrate_parser = subparsers.add_parser("migrate")
+    migrate_parser.add_argument("--status", action="store_true")
+    migrate_parser.add_argument("--target", type=int, default=None)
     subparsers.add_parser("init-db")
 
     import_bank = subparsers.add_parser("import-bank")
@@ -48,44 +57,104 @@ def build_parser() -> argparse.ArgumentParser:
     import_expense = subparsers.add_parser("import-expenses")
     import_expense.add_argument("path", type=Path)
 
+    reconcile = subparsers.add_parser("auto-reconcile")
+    reconcile.add_argument("--min-score", type=int, default=None)
+    reconcile.add_argument("--apply", action="store_true")
+
+    check_totals = subparsers.add_parser("check-totals")
+    check_totals.add_argument("--rebuild", action="store_true")
+
+    check_csv = subparsers.add_parser("check-csv")
+    check_csv.add_argument("kind", choices=sorted(IMPORT_SPECS))
+    check_csv.add_argument("path", type=Path)
+    check_csv.add_argument("--truck-id", type=str, default=None)
+
+    worker = subparsers.add_parser("worker")
+    worker.add_argument("--workers", type=int, default=max(1, JOB_WORKERS))
+
     return parser
 
 
+def _print_progress(rows: int) -> None:
+    print(f"... {rows} linhas processadas", file=sys.stderr)
+
+
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
-    if args.command == "init-db":
-        init_db()
-        print("Banco de dados inicializado.")
+    if args.command == "migrate" and args.status:
+        for item in migration_status():
+            mode = "" if item["transactional"] in (True, None) else " (sem transação)"
+            applied_at = f" em {item['applied_at']:%Y-%m-%d %H:%M:%S} ({item['duration_ms']} ms)" if item["applied_at"] else ""
+            print(f"{item['version']:04d}_{item['name']}{mode}: {item['state']}{applied_at}")
+    elif args.command in {"migrate", "init-db"}:
+        applied = migrate(target=getattr(args, "target", None))
+        for item in applied:
+            print(f"Aplicada {item['version']:04d}_{item['name']} ({item['duration_ms']} ms)")
+        print(f"{len(applied)} migrações aplicadas." if applied else "Banco de dados já está atualizado.")
     elif args.command == "import-bank":
-        count = import_bank_transactions(args.path, sheet_owner=args.sheet_owner)
+        count = import_bank_transactions(args.path, sheet_owner=args.sheet_owner, progress=_print_progress)
         print(f"{count} transações bancárias importadas.")
     elif args.command == "import-loads":
-        count = import_loads(args.path, sheet_owner=args.sheet_owner)
+        count = import_loads(args.path, sheet_owner=args.sheet_owner, progress=_print_progress)
         print(f"{count} loads importados.")
     elif args.command == "import-car-loads":
         count = import_car_loads(
             args.path,
             truck_external_id=args.truck_id,
             sheet_owner=args.sheet_owner,
+            progress=_print_progress,
         )
         print(f"{count} loads de carros importados.")
     elif args.command == "import-drivers":
-        count = import_drivers(args.path)
+        count = import_drivers(args.path, progress=_print_progress)
         print(f"{count} motoristas importados.")
     elif args.command == "import-owners":
-        count = import_owners(args.path)
+        count = import_owners(args.path, progress=_print_progress)
         print(f"{count} donos importados.")
     elif args.command == "import-trucks":
-        count = import_trucks(args.path)
+        count = import_trucks(args.path, progress=_print_progress)
         print(f"{count} trucks importados.")
     elif args.command == "import-accounts":
-        count = import_bank_accounts(args.path)
+        count = import_bank_accounts(args.path, progress=_print_progress)
         print(f"{count} contas bancárias importadas.")
     elif args.command == "import-expenses":
-        count = import_expenses(args.path)
+        count = import_expenses(args.path, progress=_print_progress)
         print(f"{count} despesas importadas.")
+    elif args.command == "auto-reconcile":
+        result = auto_reconcile(min_score=args.min_score, dry_run=not args.apply)
+        for item in result["matches"]:
+            print(
+                f"{item['transaction_id']} -> {item['load_external_id']} "
+                f"score={item['score']} gap={item['amount_gap']} day_gap={item['day_gap']}"
+            )
+        print(
+            f"{result['matched']} pares (score >= {result['min_score']}) entre {result['credits']} créditos "
+            f"e {result['open_loads']} loads em {result['elapsed_seconds']}s; {result['applied']} aplicados."
+        )
+    elif args.command == "check-totals":
+        result = check_financial_totals(rebuild=args.rebuild)
+        for item in result["differences"]:
+            print(f"{item['scope']}:{item['scope_key']} armazenado={item['stored']} real={item['live']}")
+        print(f"{len(result['differences'])} divergências em financial_totals.")
+        if result["rebuilt"]:
+            print("financial_totals reconstruída.")
+        elif result["differences"]:
+            sys.exit(1)
+    elif args.command == "check-csv":
+        report = dry_run_import(args.kind, args.path, {"truck_id": args.truck_id} if args.truck_id else None)
+        print(format_dry_run(report, limit=len(report["errors"])))
+        if report["error_count"]:
+            sys.exit(1)
+    elif args.command == "worker":
+        start_job_workers(args.workers)
+        print(f"{job_worker_metrics()['workers']} workers de jobs rodando. Ctrl+C para parar.", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            stop_job_workers()
 
 
 if __name__ == "__main__":
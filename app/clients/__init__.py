@@ -0,0 +1 @@
+"""Clients for external HTTP APIs."""
@@ -0,0 +1,301 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import (
+    TELEGRAM_API_BASE_URL,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_MAX_RETRIES,
+    TELEGRAM_TOKEN,
+)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class TelegramApiError(RuntimeError):
+    def __init__(
+        self,
+        description: str,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        super().__init__(description)
+        self.description = description
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def chat_unreachable(self) -> bool:
+        # Blocked by the user, user deactivated, bot kicked (403) or chat deleted (400).
+        return self.status_code == 403 or (
+            self.status_code == 400 and "chat not found" in self.description.lower()
+        )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes one token and returns how long the caller must wait before using it.
+
+        Tokens may go negative, so concurrent callers queue up behind each other instead
+        of all waking at the same time."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Global and per-chat token buckets matching the Bot API limits."""
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        max_chats: int = 10000,
+    ) -> None:
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.max_chats = max_chats
+        self._chats: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, chat_id: str | None = None) -> float:
+        with self._lock:
+            delay = self.global_bucket.reserve()
+            if chat_id is None:
+                return delay
+            bucket = self._chats.get(chat_id)
+            if bucket is None:
+                bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, 1)
+                if len(self._chats) > self.max_chats:
+                    self._chats.popitem(last=False)
+            self._chats.move_to_end(chat_id)
+            return max(delay, bucket.reserve())
+
+
+default_rate_limiter = RateLimiter()
+
+
+def _retry_delay(attempt: int, backoff: float, retry_after: float | None) -> float:
+    if retry_after is not None:
+        return min(MAX_BACKOFF_SECONDS, retry_after)
+    return min(MAX_BACKOFF_SECONDS, backoff * (2**attempt))
+
+
+def _parse_response(status_code: int, payload: Any) -> tuple[Any, TelegramApiError | None, bool]:
+    """Returns (result, error, retryable) for a Bot API response."""
+    payload = payload if isinstance(payload, dict) else {}
+    if status_code < 400 and payload.get("ok", True):
+        return payload.get("result"), None, False
+    description = payload.get("description") or f"HTTP {status_code}"
+    retry_after = (payload.get("parameters") or {}).get("retry_after")
+    error = TelegramApiError(description, status_code=status_code, retry_after=retry_after)
+    if retry_after is not None and retry_after > MAX_BACKOFF_SECONDS:
+        # Sleeping through a long flood wait would hold a dispatcher or job worker thread.
+        return None, error, False
+    return None, error, status_code == 429 or status_code >= 500
+
+
+class TelegramClient:
+    """Bot API client over a keep-alive requests.Session.
+
+    Retries 429 (honouring retry_after up to MAX_BACKOFF_SECONDS), 5xx and connection
+    errors with exponential backoff; other errors raise TelegramApiError right away.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = TELEGRAM_API_BASE_URL,
+        timeout: float = 10.0,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _method_url(self, method: str) -> str:
+        return f"{self.base_url}/bot{self.token}/{method}"
+
+    def call(self, method: str, payload: dict[str, Any] | None = None, chat_id: str | None = None) -> Any:
+        for attempt in range(self.max_retries + 1):
+            delay = self.rate_limiter.reserve(chat_id)
+            if delay:
+                time.sleep(delay)
+            try:
+                response = self.session.post(self._method_url(method), json=payload or {}, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.max_retries:
+                    raise TelegramApiError(f"Falha de conexão com o Telegram: {exc}") from exc
+                time.sleep(_retry_delay(attempt, self.backoff, None))
+                continue
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            result, error, retryable = _parse_response(response.status_code, body)
+            if error is None:
+                return result
+            if not retryable or attempt == self.max_retries:
+                raise error
+            time.sleep(_retry_delay(attempt, self.backoff, error.retry_after))
+        raise TelegramApiError("Tentativas esgotadas.")
+
+    def send_message(self, chat_id: str, text: str, **extra: Any) -> dict:
+        return self.call("sendMessage", {"chat_id": chat_id, "text": text, **extra}, chat_id=str(chat_id))
+
+    def edit_message(self, chat_id: str, message_id: int, text: str) -> Any:
+        return self.call(
+            "editMessageText",
+            {"chat_id": chat_id, "message_id": message_id, "text": text},
+            chat_id=str(chat_id),
+        )
+
+    def get_file_path(self, file_id: str) -> str:
+        result = self.call("getFile", {"file_id": file_id}) or {}
+        file_path = result.get("file_path")
+        if not file_path:
+            raise TelegramApiError("Arquivo não encontrado no Telegram.")
+        return file_path
+
+    def download_file(self, file_id: str, destination: Path, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> None:
+        url = f"{self.base_url}/file/bot{self.token}/{self.get_file_path(file_id)}"
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    if response.status_code >= 500 and attempt < self.max_retries:
+                        time.sleep(_retry_delay(attempt, self.backoff, None))
+                        continue
+                    if response.status_code >= 400:
+                        raise TelegramApiError(f"HTTP {response.status_code}", status_code=response.status_code)
+                    with destination.open("wb") as output:
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            output.write(chunk)
+                    return
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                if attempt == self.max_retries:
+                    raise TelegramApiError(f"Falha de conexão com o Telegram: {exc}") from exc
+                time.sleep(_retry_delay(attempt, self.backoff, None))
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncTelegramClient:
+    """asyncio variant of TelegramClient (httpx), sharing the same rate limiter."""
+
+    def __init__(
+        self,
+        token: str,
+        base_url: str = TELEGRAM_API_BASE_URL,
+        timeout: float = 10.0,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+        backoff: float = 0.5,
+        pool_size: int = 20,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def call(self, method: str, payload: dict[str, Any] | None = None, chat_id: str | None = None) -> Any:
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        for attempt in range(self.max_retries + 1):
+            delay = self.rate_limiter.reserve(chat_id)
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                response = await self.client.post(url, json=payload or {})
+            except httpx.TransportError as exc:
+                if attempt == self.max_retries:
+                    raise TelegramApiError(f"Falha de conexão com o Telegram: {exc}") from exc
+                await asyncio.sleep(_retry_delay(attempt, self.backoff, None))
+                continue
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            result, error, retryable = _parse_response(response.status_code, body)
+            if error is None:
+                return result
+            if not retryable or attempt == self.max_retries:
+                raise error
+            await asyncio.sleep(_retry_delay(attempt, self.backoff, error.retry_after))
+        raise TelegramApiError("Tentativas esgotadas.")
+
+    async def send_message(self, chat_id: str, text: str, **extra: Any) -> dict:
+        return await self.call("sendMessage", {"chat_id": chat_id, "text": text, **extra}, chat_id=str(chat_id))
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_client: TelegramClient | None = None
+_async_client: AsyncTelegramClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_telegram_client() -> TelegramClient:
+    global _client
+    if not TELEGRAM_TOKEN:
+        raise RuntimeError("BOT_TELEGRAM_TOKEN não configurado.")
+    with _client_lock:
+        if _client is None:
+            _client = TelegramClient(TELEGRAM_TOKEN)
+        return _client
+
+
+def close_telegram_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_async_telegram_client() -> AsyncTelegramClient:
+    global _async_client
+    if not TELEGRAM_TOKEN:
+        raise RuntimeError("BOT_TELEGRAM_TOKEN não configurado.")
+    if _async_client is None:
+        _async_client = AsyncTelegramClient(TELEGRAM_TOKEN)
+    return _async_client
+
+
+async def close_async_telegram_client() -> None:
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -36,3 +37,55 @@ SUMMARY_SCHEDULE_ENABLED = (get_env("BOT_SUMMARY_SCHEDULE_ENABLED", "0") or "0")
 SUMMARY_SCHEDULE_INTERVAL_MINUTES = int(
     get_env("BOT_SUMMARY_SCHEDULE_INTERVAL_MINUTES", "60") or "60"
 )
+
+DB_POOL_MIN_SIZE = int(get_env("BOT_DB_POOL_MIN_SIZE", "1") or "1")
+DB_POOL_MAX_SIZE = int(get_env("BOT_DB_POOL_MAX_SIZE", "10") or "10")
+DB_POOL_TIMEOUT_SECONDS = float(get_env("BOT_DB_POOL_TIMEOUT_SECONDS", "10") or "10")
+DB_POOL_MAX_LIFETIME_SECONDS = float(get_env("BOT_DB_POOL_MAX_LIFETIME_SECONDS", "1800") or "1800")
+DB_POOL_HEALTH_CHECK_SECONDS = float(get_env("BOT_DB_POOL_HEALTH_CHECK_SECONDS", "30") or "30")
+ASYNC_DB_POOL_MIN_SIZE = int(get_env("BOT_ASYNC_DB_POOL_MIN_SIZE", "2") or "2")
+ASYNC_DB_POOL_MAX_SIZE = int(get_env("BOT_ASYNC_DB_POOL_MAX_SIZE", "20") or "20")
+IMPORT_BATCH_SIZE = int(get_env("BOT_IMPORT_BATCH_SIZE", "5000") or "5000")
+IMPORT_DRY_RUN_MAX_ERRORS = int(get_env("BOT_IMPORT_DRY_RUN_MAX_ERRORS", "50") or "50")
+ENTITY_CACHE_SIZE = int(get_env("BOT_ENTITY_CACHE_SIZE", "50000") or "50000")
+AUTO_RECONCILE_MIN_SCORE = int(get_env("BOT_AUTO_RECONCILE_MIN_SCORE", "90") or "90")
+AUTO_RECONCILE_EXACT_CELLS = int(get_env("BOT_AUTO_RECONCILE_EXACT_CELLS", "40000") or "40000")
+MULTI_MATCH_TOLERANCE = float(get_env("BOT_MULTI_MATCH_TOLERANCE", "1.00") or "1.00")
+MULTI_MATCH_MAX_TOLERANCE = float(get_env("BOT_MULTI_MATCH_MAX_TOLERANCE", "100.00") or "100.00")
+MULTI_MATCH_WINDOW_DAYS = int(get_env("BOT_MULTI_MATCH_WINDOW_DAYS", "45") or "45")
+MULTI_MATCH_MAX_LOADS = int(get_env("BOT_MULTI_MATCH_MAX_LOADS", "8") or "8")
+MULTI_MATCH_TIME_BUDGET_MS = int(get_env("BOT_MULTI_MATCH_TIME_BUDGET_MS", "500") or "500")
+DASHBOARD_PAGE_SIZE = int(get_env("BOT_DASHBOARD_PAGE_SIZE", "50") or "50")
+TELEGRAM_WORKERS = int(get_env("BOT_TELEGRAM_WORKERS", "4") or "4")
+TELEGRAM_QUEUE_SIZE = int(get_env("BOT_TELEGRAM_QUEUE_SIZE", "1000") or "1000")
+TELEGRAM_API_BASE_URL = (get_env("BOT_TELEGRAM_API_BASE_URL", "https://api.telegram.org") or "https://api.telegram.org").rstrip("/")
+TELEGRAM_GLOBAL_RATE = float(get_env("BOT_TELEGRAM_GLOBAL_RATE", "30") or "30")
+TELEGRAM_CHAT_RATE = float(get_env("BOT_TELEGRAM_CHAT_RATE", "1") or "1")
+TELEGRAM_MAX_RETRIES = int(get_env("BOT_TELEGRAM_MAX_RETRIES", "3") or "3")
+SUMMARY_SEND_CONCURRENCY = int(get_env("BOT_SUMMARY_SEND_CONCURRENCY", "20") or "20")
+AUTH_CACHE_TTL_SECONDS = float(get_env("BOT_AUTH_CACHE_TTL_SECONDS", "300") or "300")
+AUDIT_MODE = (get_env("BOT_AUDIT_MODE", "buffered") or "buffered").strip().lower()
+AUDIT_SYNC_COMMANDS = {
+    item.strip()
+    for item in (get_env("BOT_AUDIT_SYNC_COMMANDS", "/close_week,/confirm,/authorize,/auto_reconcile") or "").split(",")
+    if item.strip()
+}
+AUDIT_FLUSH_SIZE = int(get_env("BOT_AUDIT_FLUSH_SIZE", "200") or "200")
+AUDIT_FLUSH_INTERVAL_SECONDS = float(get_env("BOT_AUDIT_FLUSH_INTERVAL_SECONDS", "2") or "2")
+AUDIT_MAX_BUFFER = int(get_env("BOT_AUDIT_MAX_BUFFER", "10000") or "10000")
+CONFIRMATION_TTL_SECONDS = int(get_env("BOT_CONFIRMATION_TTL_SECONDS", "600") or "600")
+CONFIRMATION_BACKEND = (get_env("BOT_CONFIRMATION_BACKEND", "postgres") or "postgres").strip().lower()
+UPDATE_DEDUP_CACHE_SIZE = int(get_env("BOT_UPDATE_DEDUP_CACHE_SIZE", "10000") or "10000")
+PROCESSED_UPDATES_RETENTION_HOURS = int(get_env("BOT_PROCESSED_UPDATES_RETENTION_HOURS", "72") or "72")
+COMMAND_SLOW_MS = float(get_env("BOT_COMMAND_SLOW_MS", "1000") or "1000")
+COMMAND_METRICS_SAMPLES = int(get_env("BOT_COMMAND_METRICS_SAMPLES", "1000") or "1000")
+SUMMARY_CACHE_TTL_SECONDS = float(get_env("BOT_SUMMARY_CACHE_TTL_SECONDS", "60") or "60")
+JOB_WORKERS = int(get_env("BOT_JOB_WORKERS", "2") or "2")
+JOB_MAX_ATTEMPTS = int(get_env("BOT_JOB_MAX_ATTEMPTS", "3") or "3")
+JOB_RETRY_BACKOFF_SECONDS = float(get_env("BOT_JOB_RETRY_BACKOFF_SECONDS", "30") or "30")
+JOB_POLL_SECONDS = float(get_env("BOT_JOB_POLL_SECONDS", "2") or "2")
+JOB_STALE_SECONDS = float(get_env("BOT_JOB_STALE_SECONDS", "900") or "900")
+JOB_PROGRESS_INTERVAL_SECONDS = float(get_env("BOT_JOB_PROGRESS_INTERVAL_SECONDS", "3") or "3")
+JOB_HEARTBEAT_SECONDS = float(get_env("BOT_JOB_HEARTBEAT_SECONDS", "60") or "60")
+FINANCIAL_TOTALS_FOLD_SECONDS = float(get_env("BOT_FINANCIAL_TOTALS_FOLD_SECONDS", "30") or "30")
+JOBS_DIR = Path(get_env("BOT_JOBS_DIR") or Path(tempfile.gettempdir()) / "bot-empresa-jobs")
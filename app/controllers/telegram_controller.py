@@ -1,10 +1,20 @@
+from functools import partial
+
 from fastapi import APIRouter, HTTPException, Request
 
-from app.config import TELEGRAM_WEBHOOK_SECRET
+from app.config import TELEGRAM_QUEUE_SIZE, TELEGRAM_WEBHOOK_SECRET, TELEGRAM_WORKERS
+from app.repositories.summary_cache import summary_cache
 from app.services.telegram_service import TelegramService
+from app.services.update_dispatcher import QueueFullError, UpdateDispatcher
 
 router = APIRouter()
 service = TelegramService()
+# The webhook claims update_ids on the event loop, so workers skip the claim.
+dispatcher = UpdateDispatcher(
+    partial(service.handle_update, claimed=True),
+    workers=TELEGRAM_WORKERS,
+    max_queued=TELEGRAM_QUEUE_SIZE,
+)
 
 
 @router.post("/telegram/webhook")
@@ -14,12 +24,41 @@ async def telegram_webhook(request: Request) -> dict:
         if secret_header != TELEGRAM_WEBHOOK_SECRET:
             raise HTTPException(status_code=403, detail="Invalid webhook secret")
     update = await request.json()
-    service.handle_update(update)
+    update_id = update.get("update_id")
+    if not await service.deduplicator.aclaim(update_id):
+        return {"ok": True}
+    try:
+        dispatcher.submit(update)
+    except QueueFullError as exc:
+        # Telegram retries non-2xx deliveries, so a full queue pushes back instead of dropping;
+        # the claim is released so the retry is not taken for a duplicate.
+        await service.deduplicator.arelease(update_id)
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
     return {"ok": True}
 
 
-def send_scheduled_summary() -> int:
-    return service.send_scheduled_summary()
+@router.get("/telegram/metrics")
+def telegram_metrics() -> dict:
+    return {
+        **dispatcher.metrics(),
+        "audit": service.audit_writer.stats(),
+        "dedup": service.deduplicator.stats(),
+        "commands": service.command_metrics.snapshot(),
+        "summary_cache": summary_cache.stats(),
+    }
+
+
+def start_dispatcher() -> None:
+    dispatcher.start()
+
+
+def stop_dispatcher() -> None:
+    dispatcher.stop()
+    service.audit_writer.close()
+
+
+async def send_scheduled_summary() -> dict:
+    return await service.send_scheduled_summary()
 
 
 def handle_update(update: dict) -> None:
@@ -1,21 +1,90 @@
+import asyncio
+from datetime import date
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from urllib.parse import urlencode, urlsplit
 
 from fastapi import APIRouter, File, Form, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 
-from app.importers import import_loads
+from app.config import DASHBOARD_PAGE_SIZE
+from app.db import get_pool_stats
+from app.finance import find_multi_load_matches
+from app.import_validation import check_csv_headers, dry_run_import
+from app.jobs import enqueue_job, get_job, job_file, job_worker_metrics
+from app.models.dashboard import DashboardFilters
+from app.money import to_money
 from app.services.web_service import WebService
 
 router = APIRouter()
 templates = Jinja2Templates(directory="/workspace/bot-empresa/app/templates")
 service = WebService()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _optional(value: str | None, convert):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        return None
+
+
+def _safe_return_to(value: str | None) -> str:
+    # Browsers treat a backslash as "/" and drop tabs and newlines, so "/\evil.com" or
+    # "/<tab>/evil.com" would still leave the site; only a plain same-origin path passes.
+    if not value or not value.startswith("/") or value.startswith("//"):
+        return "/"
+    if "\\" in value or any(ord(char) < 0x20 or ord(char) == 0x7F for char in value):
+        return "/"
+    parts = urlsplit(value)
+    if parts.scheme or parts.netloc:
+        return "/"
+    return value
+
 
 @router.get("/", response_class=HTMLResponse)
-def index(request: Request) -> HTMLResponse:
-    data = service.fetch_dashboard()
+async def index(
+    request: Request,
+    account_id: str | None = None,
+    sheet_owner: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    status: str | None = None,
+    min_amount: str | None = None,
+    max_amount: str | None = None,
+    page_size: str | None = None,
+    txn_cursor: str | None = None,
+    load_cursor: str | None = None,
+) -> HTMLResponse:
+    filters = DashboardFilters(
+        account_id=_optional(account_id, int),
+        sheet_owner=_optional(sheet_owner, str),
+        date_from=_optional(date_from, date.fromisoformat),
+        date_to=_optional(date_to, date.fromisoformat),
+        status=status if status in {"pending", "reconciled"} else None,
+        min_amount=_optional(min_amount, to_money),
+        max_amount=_optional(max_amount, to_money),
+        page_size=min(max(_optional(page_size, int) or DASHBOARD_PAGE_SIZE, 1), 500),
+        txn_cursor=txn_cursor or None,
+        load_cursor=load_cursor or None,
+    )
+    data = await service.fetch_dashboard_async(filters)
+    base_query = {
+        key: value
+        for key, value in request.query_params.items()
+        if value and key not in {"txn_cursor", "load_cursor"}
+    }
+    next_txn_url = None
+    if data.next_txn_cursor:
+        next_txn_url = "/?" + urlencode({**base_query, "txn_cursor": data.next_txn_cursor, "load_cursor": load_cursor or ""})
+    next_load_url = None
+    if data.next_load_cursor:
+        next_load_url = "/?" + urlencode({**base_query, "txn_cursor": txn_cursor or "", "load_cursor": data.next_load_cursor})
     return templates.TemplateResponse(
         "index.html",
         {
@@ -25,6 +94,12 @@ def index(request: Request) -> HTMLResponse:
             "stats": data.stats,
             "reconciled_count": data.reconciled_count,
             "pending_loads": data.pending_loads,
+            "accounts": data.accounts,
+            "filters": filters,
+            "first_page_url": "/?" + urlencode(base_query),
+            "next_txn_url": next_txn_url,
+            "next_load_url": next_load_url,
+            "current_url": str(request.url.path) + (f"?{request.url.query}" if request.url.query else ""),
         },
     )
 
@@ -35,30 +110,74 @@ def reconcile(
     reconciliation_type: str = Form(...),
     notes: str | None = Form(None),
     load_ids: list[int] | None = Form(None),
+    return_to: str | None = Form(None),
 ):
     service.reconcile(bank_transaction_id, reconciliation_type, notes, load_ids)
-    return RedirectResponse("/", status_code=303)
+    return RedirectResponse(_safe_return_to(return_to), status_code=303)
 
 
 @router.post("/api/loads/import-csv")
 async def import_loads_csv(
     file: UploadFile = File(...),
     sheet_owner: str | None = Form(None),
+    dry_run: bool = Form(False),
 ) -> JSONResponse:
-    suffix = Path(file.filename or "loads.csv").suffix or ".csv"
-    with NamedTemporaryFile(mode="wb", suffix=suffix, delete=False) as temp_file:
-        temp_file.write(await file.read())
-        temp_path = Path(temp_file.name)
-
+    file_path = job_file(Path(file.filename or "loads.csv").suffix or ".csv")
     try:
-        imported_count = import_loads(temp_path, sheet_owner=sheet_owner)
-    finally:
-        temp_path.unlink(missing_ok=True)
+        with file_path.open("wb") as job_input:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                job_input.write(chunk)
+        try:
+            check_csv_headers("import_loads", file_path)
+            report = await asyncio.to_thread(dry_run_import, "import_loads", file_path) if dry_run else None
+        except ValueError as exc:
+            file_path.unlink(missing_ok=True)
+            return JSONResponse({"ok": False, "error": str(exc)}, status_code=400)
+        if report is not None:
+            file_path.unlink(missing_ok=True)
+            return JSONResponse({"ok": not report["error_count"], **report})
+        job_id = await asyncio.to_thread(
+            enqueue_job, "import_loads", {"path": str(file_path), "sheet_owner": sheet_owner}
+        )
+    except Exception:
+        file_path.unlink(missing_ok=True)
+        raise
 
     return JSONResponse(
         {
             "ok": True,
-            "imported_count": imported_count,
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}",
             "sheet_owner": sheet_owner,
-        }
+        },
+        status_code=202,
     )
+
+
+@router.get("/api/jobs/metrics")
+def jobs_metrics() -> JSONResponse:
+    return JSONResponse(job_worker_metrics())
+
+
+@router.get("/api/jobs/{job_id}")
+def job_status(job_id: int) -> JSONResponse:
+    job = get_job(job_id)
+    if job is None:
+        return JSONResponse({"ok": False, "error": "Job não encontrado."}, status_code=404)
+    return JSONResponse(jsonable_encoder({"ok": True, **job}))
+
+
+@router.get("/api/db/pool-stats")
+def pool_stats() -> JSONResponse:
+    return JSONResponse(get_pool_stats())
+
+
+@router.get("/api/transactions/{bank_transaction_id}/multi-load-matches")
+def multi_load_matches(bank_transaction_id: int, tolerance: float | None = None) -> JSONResponse:
+    try:
+        result = find_multi_load_matches(bank_transaction_id=bank_transaction_id, tolerance=tolerance)
+    except ValueError as exc:
+        return JSONResponse({"ok": False, "error": str(exc)}, status_code=400)
+    if result["transaction_id"] is None:
+        return JSONResponse({"ok": False, "error": "Crédito não encontrado."}, status_code=404)
+    return JSONResponse(jsonable_encoder({"ok": True, **result}))
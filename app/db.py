@@ -1,26 +1,372 @@
-from pathlib import Path
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Mapping, Sequence
+from contextlib import asynccontextmanager
+from typing import Any
 
+import asyncpg
 import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from psycopg2.extras import RealDictCursor
 
-from app.config import DB_PATH
+from app.config import (
+    ASYNC_DB_POOL_MAX_SIZE,
+    ASYNC_DB_POOL_MIN_SIZE,
+    DB_PATH,
+    DB_POOL_HEALTH_CHECK_SECONDS,
+    DB_POOL_MAX_LIFETIME_SECONDS,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT_SECONDS,
+)
+
+
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+class PooledConnection:
+    """Proxy around a psycopg2 connection; ``close()`` returns it to the pool."""
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float) -> None:
+        self._pool = pool
+        self._raw = raw
+        self.created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._raw, name)
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        # Unlike psycopg2's own ``with connection``, this never commits: callers commit
+        # explicitly, and release() rolls back whatever is left open (the error paths).
+        self.close()
+
+    def __del__(self) -> None:
+        # Repositories use ``with get_connection() as connection``; this is only a last resort.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        url: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 10.0,
+        max_lifetime: float = 1800.0,
+        health_check_after: float = 30.0,
+    ) -> None:
+        self.url = url
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self._idle: deque[tuple] = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+        }
+
+    def _connect(self):
+        raw = psycopg2.connect(self.url, cursor_factory=RealDictCursor)
+        with self._condition:
+            self._stats["created"] += 1
+        return raw
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_lifetime > 0 and now - created_at >= self.max_lifetime
+
+    def _is_healthy(self, raw, idle_since: float, now: float) -> bool:
+        if raw.closed:
+            return False
+        if now - idle_since < self.health_check_after:
+            return True
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            raw.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw) -> None:
+        try:
+            raw.close()
+        except psycopg2.Error:
+            pass
+
+    def _discard(self, raw, reason: str) -> None:
+        self._close_quietly(raw)
+        with self._condition:
+            self._size -= 1
+            self._stats[reason] += 1
+            self._condition.notify()
+
+    def warm_up(self) -> None:
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+            now = time.monotonic()
+            with self._condition:
+                self._idle.append((raw, now, now))
+                self._condition.notify()
+
+    def acquire(self, timeout: float | None = None) -> PooledConnection:
+        wait_limit = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + wait_limit
+        waited = False
+        started = time.monotonic()
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Nenhuma conexão livre no pool após {wait_limit:.1f}s "
+                            f"(max_size={self.max_size})."
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+                if self._idle:
+                    raw, created_at, idle_since = self._idle.pop()
+                else:
+                    raw, created_at, idle_since = None, 0.0, 0.0
+                    self._size += 1
+            now = time.monotonic()
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                created_at = now
+            elif self._is_expired(created_at, now):
+                self._discard(raw, "recycled")
+                continue
+            elif not self._is_healthy(raw, idle_since, now):
+                self._discard(raw, "discarded")
+                continue
+            with self._condition:
+                self._stats["checkouts"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                    self._stats["wait_seconds"] += now - started
+            return PooledConnection(self, raw, created_at)
+
+    def release(self, connection: PooledConnection) -> None:
+        raw = connection._raw
+        now = time.monotonic()
+        if raw.closed:
+            self._discard(raw, "discarded")
+            return
+        try:
+            if raw.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                raw.rollback()
+        except psycopg2.Error:
+            self._discard(raw, "discarded")
+            return
+        if self._is_expired(connection.created_at, now):
+            self._discard(raw, "recycled")
+            return
+        with self._condition:
+            self._idle.append((raw, connection.created_at, now))
+            self._condition.notify()
+
+    def close(self) -> None:
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for raw, _created_at, _idle_since in idle:
+            self._close_quietly(raw)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._condition:
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                **self._stats,
+                "wait_seconds": round(self._stats["wait_seconds"], 3),
+            }
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(db_url: str | None = None) -> ConnectionPool:
+    global _pools_pid
+    url = db_url or DB_PATH
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked worker (uvicorn --workers): never share sockets with the parent.
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(url)
+        if pool is None:
+            pool = ConnectionPool(
+                url,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT_SECONDS,
+                max_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+                health_check_after=DB_POOL_HEALTH_CHECK_SECONDS,
+            )
+            _pools[url] = pool
+    return pool
 
 
 def get_connection(db_url: str | None = None):
+    return get_pool(db_url).acquire()
+
+
+def get_pool_stats() -> dict[str, Any]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {
+        "pid": os.getpid(),
+        "pools": [pool.stats() for pool in pools],
+        "async_pools": [
+            {
+                "min_size": pool.get_min_size(),
+                "max_size": pool.get_max_size(),
+                "size": pool.get_size(),
+                "idle": pool.get_idle_size(),
+            }
+            for pool in list(_async_pools.values())
+        ],
+    }
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+def asyncpg_query(query: str, params: Mapping[str, Any] | Sequence[Any] | None = None) -> tuple[str, list]:
+    """Rewrites a psycopg2 query (%s / %(name)s placeholders) for asyncpg ($1, $2, ...),
+    so the sync and async repositories share the same SQL."""
+    if params is None:
+        return query, []
+    args: list = []
+    named: dict[str, int] = {}
+    positional = iter(params) if not isinstance(params, Mapping) else None
+
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        if token == "%%":
+            return "%"
+        name = match.group(1)
+        if name is None:
+            args.append(next(positional))
+            return f"${len(args)}"
+        if name not in named:
+            args.append(params[name])
+            named[name] = len(args)
+        return f"${named[name]}"
+
+    return _PLACEHOLDER.sub(replace, query), args
+
+
+# One asyncpg pool per URL, created inside the server's event loop on first use. Used by
+# the async routes; the CLI, importers and Telegram workers keep the psycopg2 pool.
+_async_pools: dict[str, asyncpg.Pool] = {}
+_async_pools_lock = asyncio.Lock()
+
+
+async def get_async_pool(db_url: str | None = None) -> asyncpg.Pool:
     url = db_url or DB_PATH
-    connection = psycopg2.connect(url, cursor_factory=RealDictCursor)
-    return connection
+    pool = _async_pools.get(url)
+    if pool is not None:
+        return pool
+    async with _async_pools_lock:
+        pool = _async_pools.get(url)
+        if pool is None:
+            pool = await asyncpg.create_pool(
+                url,
+                min_size=min(ASYNC_DB_POOL_MIN_SIZE, max(1, ASYNC_DB_POOL_MAX_SIZE)),
+                max_size=max(1, ASYNC_DB_POOL_MAX_SIZE),
+                max_inactive_connection_lifetime=DB_POOL_MAX_LIFETIME_SECONDS,
+            )
+            _async_pools[url] = pool
+    return pool
+
+
+@asynccontextmanager
+async def get_async_connection(db_url: str | None = None) -> AsyncIterator[asyncpg.Connection]:
+    pool = await get_async_pool(db_url)
+    try:
+        connection = await pool.acquire(timeout=DB_POOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError as exc:
+        raise PoolTimeoutError(
+            f"Nenhuma conexão livre no pool async após {DB_POOL_TIMEOUT_SECONDS:.1f}s "
+            f"(max_size={pool.get_max_size()})."
+        ) from exc
+    try:
+        yield connection
+    finally:
+        await pool.release(connection)
+
+
+async def close_async_pools() -> None:
+    pools = list(_async_pools.values())
+    _async_pools.clear()
+    for pool in pools:
+        await pool.close()
 
 
 def init_db(db_url: str | None = None) -> None:
-    connection = get_connection(db_url)
-    schema_path = Path(__file__).with_name("schema.sql")
-    with schema_path.open("r", encoding="utf-8") as schema_file:
-        schema_sql = schema_file.read()
-    with connection.cursor() as cursor:
-        for statement in schema_sql.split(";"):
-            stmt = statement.strip()
-            if stmt:
-                cursor.execute(stmt)
-    connection.commit()
-    connection.close()
+    """Kept for compatibility: the schema now lives in app/migrations."""
+    from app.migrations import migrate
+
+    migrate(db_url)
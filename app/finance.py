@@ -1,14 +1,24 @@
+from collections.abc import Iterable
+from decimal import Decimal
+from typing import Any
+
 from app.services.finance_service import FinanceService
+from app.services.reconciliation_service import ReconciliationService
 
 _service = FinanceService()
+_reconciliation_service = ReconciliationService()
+
+
+def ensure_dispatcher_fee_expenses(load_external_ids: Iterable[str | None], connection=None) -> int:
+    return _service.ensure_dispatcher_fee_expenses(load_external_ids, connection=connection)
 
 
 def ensure_dispatcher_fee_expense(load_external_id: str, connection=None) -> None:
     _service.ensure_dispatcher_fee_expense(load_external_id, connection=connection)
 
 
-def close_week(week_reference: str) -> dict[str, float]:
-    return _service.close_week(week_reference)
+def close_week(week_reference: str, before_commit=None) -> dict[str, Decimal | int]:
+    return _service.close_week(week_reference, before_commit)
 
 
 def get_ledger(
@@ -19,23 +29,49 @@ def get_ledger(
     return _service.get_ledger(owner_external_id=owner_external_id, driver_external_id=driver_external_id, limit=limit)
 
 
-def build_summary() -> dict[str, float]:
+def build_summary() -> dict[str, Decimal | int]:
     return _service.build_summary()
 
 
-def suggest_reconciliation_candidates(transaction_external_id: str, limit: int = 5) -> list[dict[str, str | float]]:
+def fold_financial_totals() -> int:
+    return _service.fold_financial_totals()
+
+
+def check_financial_totals(rebuild: bool = False) -> dict:
+    return _service.check_financial_totals(rebuild=rebuild)
+
+
+def suggest_reconciliation_candidates(transaction_external_id: str, limit: int = 5) -> list[dict[str, Any]]:
     return _service.suggest_reconciliation_candidates(transaction_external_id, limit)
 
 
 def get_open_loads_summary(
     owner_external_id: str | None = None,
     driver_external_id: str | None = None,
-) -> dict[str, float | int]:
+) -> dict[str, Decimal | int]:
     return _service.get_open_loads_summary(owner_external_id=owner_external_id, driver_external_id=driver_external_id)
 
 
 def get_payables_receivables(
     owner_external_id: str | None = None,
     driver_external_id: str | None = None,
-) -> dict[str, float]:
+) -> dict[str, Decimal]:
     return _service.get_payables_receivables(owner_external_id=owner_external_id, driver_external_id=driver_external_id)
+
+
+def auto_reconcile(min_score: int | None = None, dry_run: bool = True) -> dict:
+    return _reconciliation_service.auto_reconcile(min_score=min_score, dry_run=dry_run)
+
+
+def find_multi_load_matches(
+    bank_transaction_id: int | None = None,
+    transaction_external_id: str | None = None,
+    tolerance: float | None = None,
+    limit: int = 5,
+) -> dict:
+    return _reconciliation_service.find_multi_load_matches(
+        bank_transaction_id=bank_transaction_id,
+        transaction_external_id=transaction_external_id,
+        tolerance=tolerance,
+        limit=limit,
+    )
@@ -0,0 +1,251 @@
+import csv
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.config import IMPORT_DRY_RUN_MAX_ERRORS
+from app.importers import parse_amount, parse_date
+from app.repositories.entity_resolver import entity_resolver
+from app.repositories.import_repository import ImportRepository
+
+
+PARSE_CACHE_SIZE = 100_000
+
+
+@dataclass
+class ImportSpec:
+    """What an importer reads from each row, checked by the dry-run before anything is written."""
+
+    headers: frozenset[str]
+    key: str | None = None
+    table: str | None = None
+    # Columns whose blank value becomes NULL in a NOT NULL column; each entry is a group of
+    # columns of which at least one must be filled.
+    required: tuple[tuple[str, ...], ...] = ()
+    dates: tuple[str, ...] = ()
+    amounts: tuple[str, ...] = ()
+    choices: dict[str, frozenset[str]] = field(default_factory=dict)
+    references: dict[str, tuple[str, ...]] = field(default_factory=dict)
+
+
+# Keyed like the job kinds (Telegram command without the slash). load_date is required because
+# every load gets a dispatcher fee expense dated on it, and expenses.expense_date is NOT NULL.
+IMPORT_SPECS: dict[str, ImportSpec] = {
+    "import_owners": ImportSpec(
+        frozenset({"owner_id", "name"}),
+        key="owner_id",
+        table="owners",
+    ),
+    "import_drivers": ImportSpec(
+        frozenset({"driver_id", "name"}),
+        key="driver_id",
+        table="drivers",
+        references={"owner": ("owner_id",)},
+    ),
+    "import_trucks": ImportSpec(
+        frozenset({"truck_id", "owner_id"}),
+        key="truck_id",
+        table="trucks",
+        required=(("owner_id",),),
+        references={"owner": ("owner_id",)},
+    ),
+    "import_accounts": ImportSpec(
+        frozenset({"account_id", "label"}),
+        key="account_id",
+        table="bank_accounts",
+        references={"owner": ("owner_id",), "driver": ("driver_id",)},
+    ),
+    "import_loads": ImportSpec(
+        frozenset({"load_id", "amount_gross"}),
+        key="load_id",
+        table="loads",
+        required=(("load_date",),),
+        dates=("load_date",),
+        amounts=("amount_gross",),
+        references={"driver": ("driver_id",), "truck": ("truck_id",)},
+    ),
+    "import_car_loads": ImportSpec(
+        frozenset({"Order ID", "RATE"}),
+        key="Order ID",
+        table="loads",
+        required=(("Delivery Date", "Pickup Date"),),
+        dates=("Delivery Date", "Pickup Date"),
+        amounts=("RATE",),
+    ),
+    "import_bank": ImportSpec(
+        frozenset({"transaction_id", "txn_date", "amount"}),
+        key="transaction_id",
+        table="bank_transactions",
+        required=(("txn_date",),),
+        dates=("txn_date",),
+        amounts=("amount",),
+        choices={"transaction_type": frozenset({"credit", "debit", "transfer"})},
+        references={"bank_account": ("account_id", "related_account_id")},
+    ),
+    "import_expenses": ImportSpec(
+        frozenset({"expense_date", "amount"}),
+        required=(("expense_date",),),
+        dates=("expense_date",),
+        amounts=("amount",),
+        references={"owner": ("owner_id",), "truck": ("truck_id",), "bank_account": ("account_id",)},
+    ),
+}
+
+
+def _spec(kind: str) -> ImportSpec:
+    spec = IMPORT_SPECS.get(kind)
+    if spec is None:
+        raise ValueError(f"Tipo de importação desconhecido: {kind}")
+    return spec
+
+
+def read_csv_headers(path: Path | str) -> list[str]:
+    with open(path, "r", encoding="utf-8-sig", errors="ignore", newline="") as csv_file:
+        first_row = next(csv.reader(csv_file), [])
+    return [item.strip() for item in first_row if item.strip()]
+
+
+def check_csv_headers(kind: str, path: Path | str) -> None:
+    missing = _spec(kind).headers - set(read_csv_headers(path))
+    if missing:
+        raise ValueError(f"CSV inválido para /{kind}. Faltando colunas: {', '.join(sorted(missing))}")
+
+
+class _Report:
+    def __init__(self, max_errors: int) -> None:
+        self.max_errors = max_errors
+        self.errors: list[dict[str, Any]] = []
+        self.error_count = 0
+        self.bad_lines: set[int] = set()
+        self.by_column: dict[str, int] = {}
+
+    def add(self, line: int, column: str, value: str | None, message: str) -> None:
+        self.error_count += 1
+        self.bad_lines.add(line)
+        self.by_column[column] = self.by_column.get(column, 0) + 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "column": column, "value": value, "message": message})
+
+
+def _parse_error(parse, value: str | None, cache: dict[str | None, str | None]) -> str | None:
+    if value in cache:
+        return cache[value]
+    try:
+        parse(value)
+        error = None
+    except ValueError as exc:
+        error = str(exc)
+    if len(cache) < PARSE_CACHE_SIZE:
+        cache[value] = error
+    return error
+
+
+def dry_run_import(
+    kind: str,
+    path: Path | str,
+    options: dict[str, str] | None = None,
+    max_errors: int = IMPORT_DRY_RUN_MAX_ERRORS,
+    repository: ImportRepository | None = None,
+) -> dict[str, Any]:
+    """Streams the whole file through the importer's parsing and reference checks without
+    writing. Referenced ids are collected first and resolved with one lookup per entity type;
+    the key column is checked the same way to project inserts vs updates."""
+    started = time.perf_counter()
+    spec = _spec(kind)
+    options = options or {}
+    check_csv_headers(kind, path)
+    if kind == "import_car_loads":
+        if not options.get("truck_id"):
+            raise ValueError("Informe truck_id para importação de carros.")
+        entity_resolver.require("truck", options["truck_id"])
+
+    report = _Report(max(0, max_errors))
+    # entity -> external_id -> (column, lines): one pass, then one lookup per entity.
+    references: dict[str, dict[str, tuple[str, list[int]]]] = {entity: {} for entity in spec.references}
+    keys: set[str] = set()
+    rows = keyless = duplicates = 0
+    # Dates repeat a lot within a sheet and strptime dominates the pass, so each distinct
+    # value is parsed once.
+    date_errors: dict[str | None, str | None] = {}
+    amount_errors: dict[str | None, str | None] = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            rows += 1
+            line = reader.line_num
+            for group in spec.required:
+                if not any((row.get(column) or "").strip() for column in group):
+                    report.add(line, group[0], None, "obrigatório" if len(group) == 1 else f"preencha {' ou '.join(group)}")
+            for column in spec.dates:
+                error = _parse_error(parse_date, row.get(column), date_errors)
+                if error:
+                    report.add(line, column, row.get(column), error)
+            for column in spec.amounts:
+                error = _parse_error(parse_amount, row.get(column), amount_errors)
+                if error:
+                    report.add(line, column, row.get(column), error)
+            for column, allowed in spec.choices.items():
+                value = row.get(column)
+                if value and value not in allowed:
+                    report.add(line, column, value, f"{value} inválido, use {'/'.join(sorted(allowed))}")
+            for entity, columns in spec.references.items():
+                seen = references[entity]
+                for column in columns:
+                    value = row.get(column)
+                    if value:
+                        seen.setdefault(value, (column, []))[1].append(line)
+            if spec.key:
+                key = row.get(spec.key)
+                if not key:
+                    keyless += 1
+                elif key in keys:
+                    duplicates += 1
+                else:
+                    keys.add(key)
+
+    missing_references: dict[str, list[str]] = {}
+    for entity, seen in references.items():
+        found = entity_resolver.resolve_many(entity, seen.keys())
+        missing = sorted(set(seen) - found.keys())
+        if missing:
+            missing_references[entity] = missing
+        for external_id in missing:
+            column, lines = seen[external_id]
+            for line in lines:
+                report.add(line, column, external_id, f"{entity} {external_id} não encontrado")
+
+    existing = (repository or ImportRepository()).existing_external_ids(spec.table, keys) if spec.table else set()
+    report.errors.sort(key=lambda item: item["line"])
+    return {
+        "kind": kind,
+        "rows": rows,
+        "valid_rows": rows - len(report.bad_lines),
+        "error_rows": len(report.bad_lines),
+        "error_count": report.error_count,
+        "errors": report.errors,
+        "errors_by_column": report.by_column,
+        "missing_references": missing_references,
+        "inserts": len(keys) - len(existing) + keyless if spec.key else rows,
+        "updates": len(existing),
+        "duplicates": duplicates,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def format_dry_run(report: dict[str, Any], limit: int = 20) -> str:
+    status = "OK" if not report["error_count"] else "com erros"
+    lines = [
+        f"Dry-run {status}: {report['rows']} linhas, {report['valid_rows']} válidas, "
+        f"{report['error_rows']} com erro ({report['elapsed_seconds']}s).",
+        f"Projeção: {report['inserts']} inserções, {report['updates']} atualizações"
+        + (f", {report['duplicates']} linhas repetidas (vale a última)." if report["duplicates"] else "."),
+    ]
+    if report["error_count"]:
+        by_column = ", ".join(f"{column} {count}" for column, count in report["errors_by_column"].items())
+        lines.append(f"Erros por coluna: {by_column}")
+        lines.extend(f"linha {item['line']}: {item['column']}: {item['message']}" for item in report["errors"][:limit])
+        extra = report["error_count"] - min(limit, len(report["errors"]))
+        if extra > 0:
+            lines.append(f"... +{extra}")
+    return "\n".join(lines)
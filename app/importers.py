@@ -1,9 +1,23 @@
 import csv
+from collections.abc import Callable, Iterable, Iterator
 from datetime import datetime
+from decimal import Decimal
+from itertools import islice
 from pathlib import Path
 
+import psycopg2
+from psycopg2.extras import execute_values
+
+from app.config import IMPORT_BATCH_SIZE
 from app.db import get_connection
-from app.finance import ensure_dispatcher_fee_expense
+from app.finance import ensure_dispatcher_fee_expenses
+from app.money import to_decimal, to_money
+from app.repositories.entity_resolver import MissingReferenceError, entity_resolver
+from app.repositories.summary_cache import summary_cache
+
+ProgressCallback = Callable[[int], None]
+# Called with the import's connection right before it commits; raising rolls the import back.
+BeforeCommit = Callable[[object], None]
 
 DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"]
 
@@ -19,9 +33,11 @@ def parse_date(value: str | None) -> str | None:
     raise ValueError(f"Data inválida: {value}")
 
 
-def parse_amount(value: str | None) -> float:
+def parse_decimal(value: str | None) -> Decimal:
+    """A number as typed in the sheets: currency symbols and spaces dropped, "1.234,56" and
+    "1,234.56" both read as 1234.56. Fee percentages go through this directly."""
     if value is None:
-        return 0.0
+        return Decimal(0)
     cleaned = (
         value.replace(" ", "")
         .replace("R$", "")
@@ -35,250 +51,536 @@ def parse_amount(value: str | None) -> float:
             cleaned = cleaned.replace(".", "").replace(",", ".")
     elif "," in cleaned:
         cleaned = cleaned.replace(",", ".")
-    if cleaned == "":
-        return 0.0
-    return float(cleaned)
+    return to_decimal(cleaned)
+
+
+def parse_amount(value: str | None) -> Decimal:
+    """Money: rounded to cents and rejected (ValueError) beyond the NUMERIC(14,2) range, so a
+    bad row fails the dry-run on its own line instead of overflowing the batch insert."""
+    return to_money(parse_decimal(value))
 
 
-def _read_csv(path: Path | str) -> list[dict[str, str]]:
-    with open(path, "r", encoding="utf-8-sig") as file:
-        reader = csv.DictReader(file)
-        return list(reader)
+def _iter_csv(path: Path | str) -> Iterator[dict[str, str]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as file:
+        yield from csv.DictReader(file)
 
 
-def import_owners(path: Path | str) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
+def _batched(rows: Iterable[dict[str, str]], size: int) -> Iterator[list[dict[str, str]]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, max(1, size)))
+        if not batch:
+            return
+        yield batch
+
+
+def _last_by_key(rows: list[dict[str, str]], key: str) -> list[dict[str, str]]:
+    # A multi-row upsert cannot touch the same row twice; keep the last occurrence,
+    # which is what the per-row upsert ended up storing.
+    latest: dict[str, dict[str, str]] = {}
+    without_key: list[dict[str, str]] = []
     for row in rows:
-        cursor.execute(
+        value = row.get(key)
+        if value is None:
+            without_key.append(row)
+        else:
+            latest.pop(value, None)
+            latest[value] = row
+    return without_key + list(latest.values())
+
+
+ResolvedIds = dict[str, dict[str, int]]
+
+
+def _resolved(ids: ResolvedIds, entity: str, external_id: str | None) -> int | None:
+    return ids[entity].get(external_id) if external_id else None
+
+
+def _run_import(
+    path: Path | str,
+    write_batch: Callable[[object, list[dict[str, str]], ResolvedIds], None],
+    batch_size: int | None,
+    progress: ProgressCallback | None,
+    before_commit: BeforeCommit | None = None,
+    references: dict[str, tuple[str, ...]] | None = None,
+    creates: str | None = None,
+    changes_summary: bool = False,
+) -> int:
+    total = 0
+    missing: dict[str, set[str]] = {}
+    # Leaving the block without commit (missing references, a failed batch or
+    # before_commit raising) rolls the whole file back when the connection is released.
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        for batch in _batched(_iter_csv(path), batch_size or IMPORT_BATCH_SIZE):
+            ids, batch_missing = entity_resolver.resolve_references(
+                {
+                    entity: {row.get(column) for row in batch for column in columns}
+                    for entity, columns in (references or {}).items()
+                }
+            )
+            for entity, external_ids in batch_missing.items():
+                missing.setdefault(entity, set()).update(external_ids)
+            total += len(batch)
+            # Once a reference is missing nothing more is written: keep scanning only to
+            # report every missing id at once, then roll back.
+            if not missing:
+                write_batch(cursor, batch, ids)
+            if progress:
+                progress(total)
+        if missing:
+            raise MissingReferenceError(missing)
+        if before_commit:
+            before_commit(connection)
+        connection.commit()
+    if creates:
+        entity_resolver.invalidate(creates)
+    if changes_summary:
+        summary_cache.invalidate()
+    return total
+
+
+def import_owners(
+    path: Path | str,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO owners (external_id, name, telegram_chat_id)
-            VALUES (%s, %s, %s)
+            VALUES %s
             ON CONFLICT(external_id) DO UPDATE SET
                 name=excluded.name,
                 telegram_chat_id=excluded.telegram_chat_id
             """,
-            (row.get("owner_id"), row.get("name"), row.get("telegram_chat_id")),
+            [
+                (row.get("owner_id"), row.get("name"), row.get("telegram_chat_id"))
+                for row in _last_by_key(batch, "owner_id")
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
 
+    return _run_import(path, write_batch, batch_size, progress, before_commit, creates="owner")
 
-def import_drivers(path: Path | str) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        owner_id = row.get("owner_id")
-        cursor.execute(
+
+def import_drivers(
+    path: Path | str,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO drivers (external_id, name, owner_id, is_owner_driver)
-            VALUES (%s, %s, (SELECT id FROM owners WHERE external_id = %s), %s)
+            VALUES %s
             ON CONFLICT(external_id) DO UPDATE SET
                 name=excluded.name,
                 owner_id=excluded.owner_id,
                 is_owner_driver=excluded.is_owner_driver
             """,
-            (
-                row.get("driver_id"),
-                row.get("name"),
-                owner_id,
-                1 if row.get("is_owner_driver") == "1" else 0,
-            ),
+            [
+                (
+                    row.get("driver_id"),
+                    row.get("name"),
+                    _resolved(ids, "owner", row.get("owner_id")),
+                    1 if row.get("is_owner_driver") == "1" else 0,
+                )
+                for row in _last_by_key(batch, "driver_id")
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
 
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"owner": ("owner_id",)},
+        creates="driver",
+    )
 
-def import_trucks(path: Path | str) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        cursor.execute(
+
+def import_trucks(
+    path: Path | str,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO trucks (external_id, owner_id, plate)
-            VALUES (%s, (SELECT id FROM owners WHERE external_id = %s), %s)
+            VALUES %s
             ON CONFLICT(external_id) DO UPDATE SET
                 owner_id=excluded.owner_id,
                 plate=excluded.plate
             """,
-            (row.get("truck_id"), row.get("owner_id"), row.get("plate")),
+            [
+                (row.get("truck_id"), _resolved(ids, "owner", row.get("owner_id")), row.get("plate"))
+                for row in _last_by_key(batch, "truck_id")
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
+
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"owner": ("owner_id",)},
+        creates="truck",
+    )
 
 
-def import_bank_accounts(path: Path | str) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        cursor.execute(
+def import_bank_accounts(
+    path: Path | str,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO bank_accounts (external_id, owner_id, driver_id, label)
-            VALUES (
-                %s,
-                (SELECT id FROM owners WHERE external_id = %s),
-                (SELECT id FROM drivers WHERE external_id = %s),
-                %s
-            )
+            VALUES %s
             ON CONFLICT(external_id) DO UPDATE SET
                 owner_id=excluded.owner_id,
                 driver_id=excluded.driver_id,
                 label=excluded.label
             """,
-            (
-                row.get("account_id"),
-                row.get("owner_id"),
-                row.get("driver_id"),
-                row.get("label"),
-            ),
+            [
+                (
+                    row.get("account_id"),
+                    _resolved(ids, "owner", row.get("owner_id")),
+                    _resolved(ids, "driver", row.get("driver_id")),
+                    row.get("label"),
+                )
+                for row in _last_by_key(batch, "account_id")
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
 
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"owner": ("owner_id",), "driver": ("driver_id",)},
+        creates="bank_account",
+    )
 
-def import_loads(path: Path | str, sheet_owner: str | None = None) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        amount_gross = parse_amount(row.get("amount_gross"))
-        cursor.execute(
-            """
-            INSERT INTO loads (
-                external_id,
-                driver_id,
-                truck_id,
-                load_date,
-                description,
-                amount_gross,
-                slv_fee_percent,
-                recife_fee_percent,
-                status,
-                week_reference,
-                sheet_owner,
-                updated_at
-            )
-            VALUES (
-                %s,
-                (SELECT id FROM drivers WHERE external_id = %s),
-                (SELECT id FROM trucks WHERE external_id = %s),
-                %s,
-                %s,
-                %s,
-                %s,
-                %s,
-                COALESCE(%s, 'open'),
-                %s,
-                %s,
-                CURRENT_TIMESTAMP
-            )
-            ON CONFLICT(external_id) DO UPDATE SET
-                driver_id=excluded.driver_id,
-                truck_id=excluded.truck_id,
-                load_date=excluded.load_date,
-                description=excluded.description,
-                amount_gross=excluded.amount_gross,
-                slv_fee_percent=excluded.slv_fee_percent,
-                recife_fee_percent=excluded.recife_fee_percent,
-                status=excluded.status,
-                week_reference=excluded.week_reference,
-                sheet_owner=excluded.sheet_owner,
-                updated_at=CURRENT_TIMESTAMP
-            """,
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopyStream:
+    """File-like object feeding ``COPY ... FROM STDIN`` (text format) from an iterator of tuples."""
+
+    def __init__(self, rows: Iterable[tuple]) -> None:
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.error: Exception | None = None
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._buffer]
+        buffered = len(self._buffer)
+        while size < 0 or buffered < size:
+            try:
+                row = next(self._rows, None)
+            except Exception as exc:
+                self.error = exc
+                raise
+            if row is None:
+                break
+            line = "\t".join(_copy_value(value) for value in row) + "\n"
+            parts.append(line)
+            buffered += len(line)
+        data = "".join(parts)
+        if size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+    readline = read
+
+
+def _copy_rows(cursor, table: str, columns: list[str], rows: Iterable[tuple]) -> None:
+    stream = _CopyStream(rows)
+    try:
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream)
+    except psycopg2.Error:
+        # psycopg2 turns an exception raised while reading the stream into QueryCanceled;
+        # surface the original (an invalid amount or date is a ValueError, not a retryable error).
+        if stream.error is not None:
+            raise stream.error from None
+        raise
+
+
+def _create_load_staging(cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TEMP TABLE staging_loads (
+            row_number INTEGER NOT NULL,
+            external_id TEXT,
+            driver_id INTEGER,
+            truck_id INTEGER,
+            load_date DATE,
+            description TEXT,
+            amount_gross NUMERIC(14, 2),
+            slv_fee_percent NUMERIC(7, 4),
+            recife_fee_percent NUMERIC(7, 4),
+            status TEXT,
+            week_reference TEXT,
+            sheet_owner TEXT
+        ) ON COMMIT DROP
+        """
+    )
+
+
+# Later rows win when a sheet repeats an external_id, like the per-row upsert did;
+# rows without external_id are never deduplicated.
+_STAGING_LOADS_LATEST = """
+    SELECT DISTINCT ON (s.external_id, CASE WHEN s.external_id IS NULL THEN s.row_number END)
+        s.*
+    FROM staging_loads s
+    ORDER BY s.external_id, CASE WHEN s.external_id IS NULL THEN s.row_number END, s.row_number DESC
+"""
+
+
+def _merge_staged_loads(cursor, merge_sql: str, batch_rows: Iterable[tuple], columns: list[str]) -> None:
+    cursor.execute("TRUNCATE staging_loads")
+    _copy_rows(cursor, "staging_loads", columns, batch_rows)
+    cursor.execute(merge_sql)
+    ensure_dispatcher_fee_expenses(
+        [item["external_id"] for item in cursor.fetchall()],
+        connection=cursor.connection,
+    )
+
+
+_LOAD_STAGING_COLUMNS = [
+    "row_number",
+    "external_id",
+    "driver_id",
+    "truck_id",
+    "load_date",
+    "description",
+    "amount_gross",
+    "slv_fee_percent",
+    "recife_fee_percent",
+    "status",
+    "week_reference",
+    "sheet_owner",
+]
+
+_MERGE_LOADS_SQL = f"""
+    INSERT INTO loads (
+        external_id,
+        driver_id,
+        truck_id,
+        load_date,
+        description,
+        amount_gross,
+        slv_fee_percent,
+        recife_fee_percent,
+        status,
+        week_reference,
+        sheet_owner,
+        updated_at
+    )
+    SELECT
+        s.external_id,
+        s.driver_id,
+        s.truck_id,
+        s.load_date,
+        s.description,
+        s.amount_gross,
+        s.slv_fee_percent,
+        s.recife_fee_percent,
+        COALESCE(s.status, 'open'),
+        s.week_reference,
+        s.sheet_owner,
+        CURRENT_TIMESTAMP
+    FROM ({_STAGING_LOADS_LATEST}) s
+    ON CONFLICT(external_id) DO UPDATE SET
+        driver_id=excluded.driver_id,
+        truck_id=excluded.truck_id,
+        load_date=excluded.load_date,
+        description=excluded.description,
+        amount_gross=excluded.amount_gross,
+        slv_fee_percent=excluded.slv_fee_percent,
+        recife_fee_percent=excluded.recife_fee_percent,
+        status=excluded.status,
+        week_reference=excluded.week_reference,
+        sheet_owner=excluded.sheet_owner,
+        updated_at=CURRENT_TIMESTAMP
+    RETURNING external_id
+"""
+
+_CAR_LOAD_STAGING_COLUMNS = [
+    "row_number",
+    "external_id",
+    "truck_id",
+    "load_date",
+    "description",
+    "amount_gross",
+    "recife_fee_percent",
+    "status",
+    "sheet_owner",
+]
+
+_MERGE_CAR_LOADS_SQL = f"""
+    INSERT INTO loads (
+        external_id,
+        truck_id,
+        load_date,
+        description,
+        amount_gross,
+        recife_fee_percent,
+        status,
+        sheet_owner,
+        updated_at
+    )
+    SELECT
+        s.external_id,
+        s.truck_id,
+        s.load_date,
+        s.description,
+        s.amount_gross,
+        s.recife_fee_percent,
+        COALESCE(s.status, 'open'),
+        s.sheet_owner,
+        CURRENT_TIMESTAMP
+    FROM ({_STAGING_LOADS_LATEST}) s
+    ON CONFLICT(external_id) DO UPDATE SET
+        truck_id=excluded.truck_id,
+        load_date=excluded.load_date,
+        description=excluded.description,
+        amount_gross=excluded.amount_gross,
+        recife_fee_percent=excluded.recife_fee_percent,
+        status=excluded.status,
+        sheet_owner=excluded.sheet_owner,
+        updated_at=CURRENT_TIMESTAMP
+    RETURNING external_id
+"""
+
+
+def import_loads(
+    path: Path | str,
+    sheet_owner: str | None = None,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    staged = False
+
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        nonlocal staged
+        if not staged:
+            _create_load_staging(cursor)
+            staged = True
+        _merge_staged_loads(
+            cursor,
+            _MERGE_LOADS_SQL,
             (
-                row.get("load_id"),
-                row.get("driver_id"),
-                row.get("truck_id"),
-                parse_date(row.get("load_date")),
-                row.get("description"),
-                amount_gross,
-                11.0,
-                10.0,
-                row.get("status"),
-                row.get("week_reference"),
-                sheet_owner,
+                (
+                    row_number,
+                    row.get("load_id"),
+                    _resolved(ids, "driver", row.get("driver_id")),
+                    _resolved(ids, "truck", row.get("truck_id")),
+                    parse_date(row.get("load_date")),
+                    row.get("description"),
+                    parse_amount(row.get("amount_gross")),
+                    11.0,
+                    10.0,
+                    row.get("status"),
+                    row.get("week_reference"),
+                    sheet_owner,
+                )
+                for row_number, row in enumerate(batch)
             ),
+            _LOAD_STAGING_COLUMNS,
         )
-        ensure_dispatcher_fee_expense(row.get("load_id"), connection=connection)
-    connection.commit()
-    connection.close()
-    return len(rows)
+
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"driver": ("driver_id",), "truck": ("truck_id",)},
+        changes_summary=True,
+    )
 
 
 def import_car_loads(
     path: Path | str,
     truck_external_id: str,
     sheet_owner: str | None = None,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
 ) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        amount_gross = parse_amount(row.get("RATE"))
-        cursor.execute(
-            """
-            INSERT INTO loads (
-                external_id,
-                truck_id,
-                load_date,
-                description,
-                amount_gross,
-                recife_fee_percent,
-                status,
-                sheet_owner,
-                updated_at
-            )
-            VALUES (
-                %s,
-                (SELECT id FROM trucks WHERE external_id = %s),
-                %s,
-                %s,
-                %s,
-                %s,
-                COALESCE(%s, 'open'),
-                %s,
-                CURRENT_TIMESTAMP
-            )
-            ON CONFLICT(external_id) DO UPDATE SET
-                truck_id=excluded.truck_id,
-                load_date=excluded.load_date,
-                description=excluded.description,
-                amount_gross=excluded.amount_gross,
-                recife_fee_percent=excluded.recife_fee_percent,
-                status=excluded.status,
-                sheet_owner=excluded.sheet_owner,
-                updated_at=CURRENT_TIMESTAMP
-            """,
+    truck_id = entity_resolver.require("truck", truck_external_id)
+    staged = False
+
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        nonlocal staged
+        if not staged:
+            _create_load_staging(cursor)
+            staged = True
+        _merge_staged_loads(
+            cursor,
+            _MERGE_CAR_LOADS_SQL,
             (
-                row.get("Order ID"),
-                truck_external_id,
-                parse_date(row.get("Delivery Date")) or parse_date(row.get("Pickup Date")),
-                row.get("EMPRESA"),
-                amount_gross,
-                10.0,
-                "open",
-                sheet_owner,
+                (
+                    row_number,
+                    row.get("Order ID"),
+                    truck_id,
+                    parse_date(row.get("Delivery Date")) or parse_date(row.get("Pickup Date")),
+                    row.get("EMPRESA"),
+                    parse_amount(row.get("RATE")),
+                    10.0,
+                    "open",
+                    sheet_owner,
+                )
+                for row_number, row in enumerate(batch)
             ),
+            _CAR_LOAD_STAGING_COLUMNS,
         )
-        ensure_dispatcher_fee_expense(row.get("Order ID"), connection=connection)
-    connection.commit()
-    connection.close()
-    return len(rows)
-
-def import_bank_transactions(path: Path | str, sheet_owner: str | None = None) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        cursor.execute(
+
+    return _run_import(path, write_batch, batch_size, progress, before_commit, changes_summary=True)
+
+
+def import_bank_transactions(
+    path: Path | str,
+    sheet_owner: str | None = None,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO bank_transactions (
                 external_id,
@@ -291,17 +593,7 @@ def import_bank_transactions(path: Path | str, sheet_owner: str | None = None) -
                 related_account_id,
                 sheet_owner
             )
-            VALUES (
-                %s,
-                (SELECT id FROM bank_accounts WHERE external_id = %s),
-                %s,
-                %s,
-                %s,
-                %s,
-                %s,
-                (SELECT id FROM bank_accounts WHERE external_id = %s),
-                %s
-            )
+            VALUES %s
             ON CONFLICT(external_id) DO UPDATE SET
                 account_id=excluded.account_id,
                 txn_date=excluded.txn_date,
@@ -312,29 +604,43 @@ def import_bank_transactions(path: Path | str, sheet_owner: str | None = None) -
                 related_account_id=excluded.related_account_id,
                 sheet_owner=excluded.sheet_owner
             """,
-            (
-                row.get("transaction_id"),
-                row.get("account_id"),
-                parse_date(row.get("txn_date")) or row.get("txn_date"),
-                row.get("description"),
-                parse_amount(row.get("amount")),
-                row.get("transaction_type") or "credit",
-                row.get("category"),
-                row.get("related_account_id"),
-                sheet_owner,
-            ),
+            [
+                (
+                    row.get("transaction_id"),
+                    _resolved(ids, "bank_account", row.get("account_id")),
+                    parse_date(row.get("txn_date")) or row.get("txn_date"),
+                    row.get("description"),
+                    parse_amount(row.get("amount")),
+                    row.get("transaction_type") or "credit",
+                    row.get("category"),
+                    _resolved(ids, "bank_account", row.get("related_account_id")),
+                    sheet_owner,
+                )
+                for row in _last_by_key(batch, "transaction_id")
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
 
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"bank_account": ("account_id", "related_account_id")},
+        changes_summary=True,
+    )
 
-def import_expenses(path: Path | str) -> int:
-    rows = _read_csv(path)
-    connection = get_connection()
-    cursor = connection.cursor()
-    for row in rows:
-        cursor.execute(
+
+def import_expenses(
+    path: Path | str,
+    batch_size: int | None = None,
+    progress: ProgressCallback | None = None,
+    before_commit: BeforeCommit | None = None,
+) -> int:
+    def write_batch(cursor, batch: list[dict[str, str]], ids: ResolvedIds) -> None:
+        execute_values(
+            cursor,
             """
             INSERT INTO expenses (
                 owner_id,
@@ -346,28 +652,30 @@ def import_expenses(path: Path | str) -> int:
                 category,
                 cost_center
             )
-            VALUES (
-                (SELECT id FROM owners WHERE external_id = %s),
-                (SELECT id FROM trucks WHERE external_id = %s),
-                (SELECT id FROM bank_accounts WHERE external_id = %s),
-                %s,
-                %s,
-                %s,
-                %s,
-                %s
-            )
+            VALUES %s
             """,
-            (
-                row.get("owner_id"),
-                row.get("truck_id"),
-                row.get("account_id"),
-                parse_date(row.get("expense_date")) or row.get("expense_date"),
-                parse_amount(row.get("amount")),
-                row.get("description"),
-                row.get("category"),
-                row.get("cost_center"),
-            ),
+            [
+                (
+                    _resolved(ids, "owner", row.get("owner_id")),
+                    _resolved(ids, "truck", row.get("truck_id")),
+                    _resolved(ids, "bank_account", row.get("account_id")),
+                    parse_date(row.get("expense_date")) or row.get("expense_date"),
+                    parse_amount(row.get("amount")),
+                    row.get("description"),
+                    row.get("category"),
+                    row.get("cost_center"),
+                )
+                for row in batch
+            ],
+            page_size=len(batch),
         )
-    connection.commit()
-    connection.close()
-    return len(rows)
+
+    return _run_import(
+        path,
+        write_batch,
+        batch_size,
+        progress,
+        before_commit,
+        references={"owner": ("owner_id",), "truck": ("truck_id",), "bank_account": ("account_id",)},
+        changes_summary=True,
+    )
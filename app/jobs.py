@@ -0,0 +1,34 @@
+from pathlib import Path
+from typing import Any
+
+from app.services.job_service import JobService, new_job_file
+from app.services.job_worker import JobWorkerPool
+
+_service = JobService()
+_workers = JobWorkerPool(_service)
+
+
+def enqueue_job(kind: str, args: dict[str, Any], chat_id: str | None = None, message_id: int | None = None) -> int:
+    job_id = _service.enqueue(kind, args, chat_id=chat_id, message_id=message_id)
+    _workers.wake()
+    return job_id
+
+
+def get_job(job_id: int) -> dict | None:
+    return _service.get(job_id)
+
+
+def job_file(suffix: str = ".csv") -> Path:
+    return new_job_file(suffix)
+
+
+def start_job_workers(workers: int | None = None) -> None:
+    _workers.start(workers)
+
+
+def stop_job_workers(timeout: float = 10.0) -> None:
+    _workers.stop(timeout)
+
+
+def job_worker_metrics() -> dict[str, Any]:
+    return _workers.metrics()
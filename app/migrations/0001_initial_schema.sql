@@ -106,10 +106,12 @@ CREATE TABLE IF NOT EXISTS expenses (
     description TEXT,
     category TEXT,
     cost_center TEXT,
+    load_id INTEGER,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (owner_id) REFERENCES owners(id),
     FOREIGN KEY (truck_id) REFERENCES trucks(id),
-    FOREIGN KEY (bank_account_id) REFERENCES bank_accounts(id)
+    FOREIGN KEY (bank_account_id) REFERENCES bank_accounts(id),
+    FOREIGN KEY (load_id) REFERENCES loads(id)
 );
 
 CREATE TABLE IF NOT EXISTS ledger_entries (
@@ -120,6 +122,7 @@ CREATE TABLE IF NOT EXISTS ledger_entries (
     entry_type TEXT NOT NULL,
     amount REAL NOT NULL,
     description TEXT,
+    week_reference TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (owner_id) REFERENCES owners(id),
     FOREIGN KEY (driver_id) REFERENCES drivers(id)
@@ -156,3 +159,60 @@ CREATE INDEX IF NOT EXISTS idx_bank_txn_date ON bank_transactions(txn_date);
 CREATE INDEX IF NOT EXISTS idx_expenses_owner_id ON expenses(owner_id);
 CREATE INDEX IF NOT EXISTS idx_ledger_owner_driver_date ON ledger_entries(owner_id, driver_id, entry_date);
 CREATE INDEX IF NOT EXISTS idx_summary_subscriptions_created_at ON summary_subscriptions(created_at);
+
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS load_id INTEGER REFERENCES loads(id);
+
+UPDATE expenses e
+SET load_id = matched.load_id
+FROM (
+    SELECT DISTINCT ON (l.id) x.id AS expense_id, l.id AS load_id
+    FROM expenses x
+    JOIN loads l ON x.description = 'Dispatcher fee load ' || l.external_id
+    WHERE x.category = 'dispatcher'
+      AND NOT EXISTS (
+          SELECT 1 FROM expenses linked
+          WHERE linked.load_id = l.id AND linked.category = 'dispatcher'
+      )
+    ORDER BY l.id, x.id
+) matched
+WHERE e.id = matched.expense_id AND e.load_id IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_expenses_dispatcher_load ON expenses(load_id) WHERE category = 'dispatcher';
+
+ALTER TABLE ledger_entries ADD COLUMN IF NOT EXISTS week_reference TEXT;
+
+UPDATE ledger_entries
+SET week_reference = SUBSTRING(description FROM CHAR_LENGTH('Fechamento semana ') + 1)
+WHERE entry_type = 'weekly_commission'
+  AND week_reference IS NULL
+  AND description LIKE 'Fechamento semana %';
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ledger_weekly_driver ON ledger_entries(driver_id, week_reference)
+    WHERE entry_type = 'weekly_commission' AND driver_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ledger_weekly_owner ON ledger_entries(owner_id, week_reference)
+    WHERE entry_type = 'weekly_commission' AND owner_id IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_loads_open_amount ON loads(amount_gross) WHERE status != 'paid';
+
+DROP INDEX IF EXISTS idx_loads_open_date;
+
+CREATE INDEX IF NOT EXISTS idx_bank_txn_date_id ON bank_transactions(txn_date, id);
+CREATE INDEX IF NOT EXISTS idx_bank_txn_account_date_id ON bank_transactions(account_id, txn_date, id);
+CREATE INDEX IF NOT EXISTS idx_bank_txn_sheet_owner_date_id ON bank_transactions(sheet_owner, txn_date, id);
+CREATE INDEX IF NOT EXISTS idx_loads_open_date_id ON loads(load_date, id) WHERE status != 'paid';
+CREATE INDEX IF NOT EXISTS idx_loads_open_sheet_owner_date_id ON loads(sheet_owner, load_date, id) WHERE status != 'paid';
+
+CREATE TABLE IF NOT EXISTS pending_confirmations (
+    chat_id TEXT PRIMARY KEY,
+    action TEXT NOT NULL,
+    args JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_confirmations_expires_at ON pending_confirmations(expires_at);
+
+CREATE TABLE IF NOT EXISTS processed_updates (
+    update_id BIGINT PRIMARY KEY,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_processed_updates_processed_at ON processed_updates(processed_at);
@@ -0,0 +1,287 @@
+-- Running totals maintained by statement-level triggers.
+--
+-- scope/scope_key: ('all', ''), ('owner', owners.id), ('driver', drivers.id),
+-- ('account', bank_accounts.id), ('sheet_owner', sheet_owner).
+-- REAL amounts go through ::text::numeric so the totals match the values the app reads.
+
+CREATE TABLE IF NOT EXISTS financial_totals (
+    scope TEXT NOT NULL,
+    scope_key TEXT NOT NULL,
+    credit_total NUMERIC NOT NULL DEFAULT 0,
+    debit_total NUMERIC NOT NULL DEFAULT 0,
+    transaction_count BIGINT NOT NULL DEFAULT 0,
+    expense_total NUMERIC NOT NULL DEFAULT 0,
+    open_load_count BIGINT NOT NULL DEFAULT 0,
+    open_gross_total NUMERIC NOT NULL DEFAULT 0,
+    open_slv_fee_total NUMERIC NOT NULL DEFAULT 0,
+    open_recife_fee_total NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, scope_key)
+);
+
+CREATE OR REPLACE VIEW financial_totals_live AS
+WITH txn AS (
+    SELECT
+        bt.account_id,
+        bt.sheet_owner,
+        CASE WHEN bt.transaction_type = 'credit' THEN bt.amount::text::numeric ELSE 0 END AS credit,
+        CASE WHEN bt.transaction_type = 'debit' THEN bt.amount::text::numeric ELSE 0 END AS debit
+    FROM bank_transactions bt
+),
+expense AS (
+    SELECT e.owner_id, e.bank_account_id, e.amount::text::numeric AS amount
+    FROM expenses e
+),
+open_load AS (
+    SELECT
+        l.driver_id,
+        t.owner_id,
+        l.sheet_owner,
+        l.amount_gross::text::numeric AS gross,
+        l.amount_gross::text::numeric * COALESCE(l.slv_fee_percent, 0)::text::numeric / 100 AS slv_fee,
+        l.amount_gross::text::numeric * COALESCE(l.recife_fee_percent, 0)::text::numeric / 100 AS recife_fee
+    FROM loads l
+    LEFT JOIN trucks t ON t.id = l.truck_id
+    WHERE l.status != 'paid'
+),
+contributions AS (
+    SELECT d.scope, d.scope_key, txn.credit, txn.debit, 1 AS txn_count,
+           0::numeric AS expense, 0 AS load_count, 0::numeric AS gross, 0::numeric AS slv_fee, 0::numeric AS recife_fee
+    FROM txn
+    CROSS JOIN LATERAL (VALUES ('account', txn.account_id::text), ('sheet_owner', txn.sheet_owner)) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+    UNION ALL
+    SELECT d.scope, d.scope_key, 0, 0, 0, expense.amount, 0, 0, 0, 0
+    FROM expense
+    CROSS JOIN LATERAL (VALUES ('owner', expense.owner_id::text), ('account', expense.bank_account_id::text)) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+    UNION ALL
+    SELECT d.scope, d.scope_key, 0, 0, 0, 0, 1, open_load.gross, open_load.slv_fee, open_load.recife_fee
+    FROM open_load
+    CROSS JOIN LATERAL (
+        VALUES ('owner', open_load.owner_id::text), ('driver', open_load.driver_id::text), ('sheet_owner', open_load.sheet_owner)
+    ) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+)
+SELECT
+    'all'::text AS scope,
+    ''::text AS scope_key,
+    COALESCE((SELECT SUM(credit) FROM txn), 0) AS credit_total,
+    COALESCE((SELECT SUM(debit) FROM txn), 0) AS debit_total,
+    (SELECT COUNT(*) FROM txn) AS transaction_count,
+    COALESCE((SELECT SUM(amount) FROM expense), 0) AS expense_total,
+    (SELECT COUNT(*) FROM open_load) AS open_load_count,
+    COALESCE((SELECT SUM(gross) FROM open_load), 0) AS open_gross_total,
+    COALESCE((SELECT SUM(slv_fee) FROM open_load), 0) AS open_slv_fee_total,
+    COALESCE((SELECT SUM(recife_fee) FROM open_load), 0) AS open_recife_fee_total
+UNION ALL
+SELECT
+    scope,
+    scope_key,
+    SUM(credit),
+    SUM(debit),
+    SUM(txn_count),
+    SUM(expense),
+    SUM(load_count),
+    SUM(gross),
+    SUM(slv_fee),
+    SUM(recife_fee)
+FROM contributions
+GROUP BY scope, scope_key;
+
+-- Builds the upsert that adds the signed rows of ``changed`` to the totals. Scopes whose
+-- deltas are all zero are skipped, so updates that do not touch amounts, status or keys
+-- do not lock the shared 'all' row. The trigger functions EXECUTE the result themselves:
+-- transition tables are only visible to queries run by the trigger function.
+CREATE OR REPLACE FUNCTION financial_totals_delta_sql(changed TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        INSERT INTO financial_totals AS ft (
+            scope, scope_key, credit_total, debit_total, transaction_count, expense_total,
+            open_load_count, open_gross_total, open_slv_fee_total, open_recife_fee_total
+        )
+        SELECT
+            d.scope, d.scope_key,
+            SUM(c.credit), SUM(c.debit), SUM(c.txn_count), SUM(c.expense),
+            SUM(c.load_count), SUM(c.gross), SUM(c.slv_fee), SUM(c.recife_fee)
+        FROM (%s) c
+        CROSS JOIN LATERAL (
+            VALUES ('all', ''), ('owner', c.owner_id::text), ('driver', c.driver_id::text),
+                   ('account', c.account_id::text), ('sheet_owner', c.sheet_owner)
+        ) AS d(scope, scope_key)
+        WHERE d.scope_key IS NOT NULL
+        GROUP BY d.scope, d.scope_key
+        HAVING SUM(c.credit) <> 0 OR SUM(c.debit) <> 0 OR SUM(c.txn_count) <> 0 OR SUM(c.expense) <> 0
+            OR SUM(c.load_count) <> 0 OR SUM(c.gross) <> 0 OR SUM(c.slv_fee) <> 0 OR SUM(c.recife_fee) <> 0
+        ON CONFLICT (scope, scope_key) DO UPDATE SET
+            credit_total = ft.credit_total + excluded.credit_total,
+            debit_total = ft.debit_total + excluded.debit_total,
+            transaction_count = ft.transaction_count + excluded.transaction_count,
+            expense_total = ft.expense_total + excluded.expense_total,
+            open_load_count = ft.open_load_count + excluded.open_load_count,
+            open_gross_total = ft.open_gross_total + excluded.open_gross_total,
+            open_slv_fee_total = ft.open_slv_fee_total + excluded.open_slv_fee_total,
+            open_recife_fee_total = ft.open_recife_fee_total + excluded.open_recife_fee_total
+    $sql$, changed)
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_signed_rows(source TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE
+        WHEN source = 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN source = 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1 AS sign, * FROM old_rows'
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_bank_transactions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            NULL::integer AS owner_id,
+            NULL::integer AS driver_id,
+            r.account_id,
+            r.sheet_owner,
+            CASE WHEN r.transaction_type = 'credit' THEN r.sign * r.amount::text::numeric ELSE 0 END AS credit,
+            CASE WHEN r.transaction_type = 'debit' THEN r.sign * r.amount::text::numeric ELSE 0 END AS debit,
+            r.sign AS txn_count,
+            0::numeric AS expense,
+            0 AS load_count,
+            0::numeric AS gross,
+            0::numeric AS slv_fee,
+            0::numeric AS recife_fee
+        FROM (%s) r
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_expenses() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            r.owner_id,
+            NULL::integer AS driver_id,
+            r.bank_account_id AS account_id,
+            NULL::text AS sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            r.sign * r.amount::text::numeric AS expense,
+            0 AS load_count,
+            0::numeric AS gross,
+            0::numeric AS slv_fee,
+            0::numeric AS recife_fee
+        FROM (%s) r
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_loads() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            t.owner_id,
+            r.driver_id,
+            NULL::integer AS account_id,
+            r.sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            0::numeric AS expense,
+            r.sign AS load_count,
+            r.sign * r.amount_gross::text::numeric AS gross,
+            r.sign * r.amount_gross::text::numeric * COALESCE(r.slv_fee_percent, 0)::text::numeric / 100 AS slv_fee,
+            r.sign * r.amount_gross::text::numeric * COALESCE(r.recife_fee_percent, 0)::text::numeric / 100 AS recife_fee
+        FROM (%s) r
+        LEFT JOIN trucks t ON t.id = r.truck_id
+        WHERE r.status != 'paid'
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+-- Open loads are counted under the owner of their truck: moving a truck to another
+-- owner moves its open-load totals too.
+CREATE OR REPLACE FUNCTION financial_totals_trucks() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql($sql$
+        SELECT
+            moved.owner_id,
+            NULL::integer AS driver_id,
+            NULL::integer AS account_id,
+            NULL::text AS sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            0::numeric AS expense,
+            moved.sign AS load_count,
+            moved.sign * l.amount_gross::text::numeric AS gross,
+            moved.sign * l.amount_gross::text::numeric * COALESCE(l.slv_fee_percent, 0)::text::numeric / 100 AS slv_fee,
+            moved.sign * l.amount_gross::text::numeric * COALESCE(l.recife_fee_percent, 0)::text::numeric / 100 AS recife_fee
+        FROM (
+            SELECT n.id, n.owner_id, 1 AS sign
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.owner_id IS DISTINCT FROM o.owner_id
+            UNION ALL
+            SELECT o.id, o.owner_id, -1
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.owner_id IS DISTINCT FROM o.owner_id
+        ) moved
+        JOIN loads l ON l.truck_id = moved.id
+        WHERE l.status != 'paid'
+    $sql$);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS financial_totals_bank_transactions_insert ON bank_transactions;
+DROP TRIGGER IF EXISTS financial_totals_bank_transactions_update ON bank_transactions;
+DROP TRIGGER IF EXISTS financial_totals_bank_transactions_delete ON bank_transactions;
+CREATE TRIGGER financial_totals_bank_transactions_insert AFTER INSERT ON bank_transactions
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_bank_transactions();
+CREATE TRIGGER financial_totals_bank_transactions_update AFTER UPDATE ON bank_transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_bank_transactions();
+CREATE TRIGGER financial_totals_bank_transactions_delete AFTER DELETE ON bank_transactions
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_bank_transactions();
+
+DROP TRIGGER IF EXISTS financial_totals_expenses_insert ON expenses;
+DROP TRIGGER IF EXISTS financial_totals_expenses_update ON expenses;
+DROP TRIGGER IF EXISTS financial_totals_expenses_delete ON expenses;
+CREATE TRIGGER financial_totals_expenses_insert AFTER INSERT ON expenses
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_expenses();
+CREATE TRIGGER financial_totals_expenses_update AFTER UPDATE ON expenses
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_expenses();
+CREATE TRIGGER financial_totals_expenses_delete AFTER DELETE ON expenses
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_expenses();
+
+DROP TRIGGER IF EXISTS financial_totals_loads_insert ON loads;
+DROP TRIGGER IF EXISTS financial_totals_loads_update ON loads;
+DROP TRIGGER IF EXISTS financial_totals_loads_delete ON loads;
+CREATE TRIGGER financial_totals_loads_insert AFTER INSERT ON loads
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_loads();
+CREATE TRIGGER financial_totals_loads_update AFTER UPDATE ON loads
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_loads();
+CREATE TRIGGER financial_totals_loads_delete AFTER DELETE ON loads
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_loads();
+
+DROP TRIGGER IF EXISTS financial_totals_trucks_update ON trucks;
+CREATE TRIGGER financial_totals_trucks_update AFTER UPDATE ON trucks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION financial_totals_trucks();
+
+-- Recomputes every row from the live tables. Writers are blocked meanwhile so no delta
+-- is lost between the delete and the insert.
+CREATE OR REPLACE FUNCTION rebuild_financial_totals() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    LOCK TABLE bank_transactions, expenses, loads, trucks IN SHARE MODE;
+    DELETE FROM financial_totals;
+    INSERT INTO financial_totals SELECT * FROM financial_totals_live;
+END;
+$$;
+
+SELECT rebuild_financial_totals();
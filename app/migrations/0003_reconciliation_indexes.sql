@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- "Is this transaction reconciled?" lookups (NOT EXISTS on payments / bank_reconciliations)
+-- and payment_loads by load. Built CONCURRENTLY so writes keep flowing on large tables.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payments_bank_transaction_id
+    ON payments(bank_transaction_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_bank_reconciliations_bank_transaction_id
+    ON bank_reconciliations(bank_transaction_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_payment_loads_load_id
+    ON payment_loads(load_id);
@@ -0,0 +1,201 @@
+-- Money columns move from REAL to NUMERIC(14,2) and fee percentages to NUMERIC(7,4).
+-- REAL goes through ::text first: a direct REAL -> NUMERIC cast keeps only 6 digits.
+-- financial_totals_live depends on these columns, so it is dropped and recreated, and the
+-- trigger functions lose the ::text::numeric casts they needed for REAL.
+
+DROP VIEW IF EXISTS financial_totals_live;
+
+ALTER TABLE loads
+    ALTER COLUMN amount_gross TYPE NUMERIC(14, 2) USING ROUND(amount_gross::text::numeric, 2),
+    ALTER COLUMN slv_fee_percent TYPE NUMERIC(7, 4) USING ROUND(slv_fee_percent::text::numeric, 4),
+    ALTER COLUMN recife_fee_percent TYPE NUMERIC(7, 4) USING ROUND(recife_fee_percent::text::numeric, 4);
+
+ALTER TABLE bank_transactions
+    ALTER COLUMN amount TYPE NUMERIC(14, 2) USING ROUND(amount::text::numeric, 2);
+
+ALTER TABLE expenses
+    ALTER COLUMN amount TYPE NUMERIC(14, 2) USING ROUND(amount::text::numeric, 2);
+
+ALTER TABLE ledger_entries
+    ALTER COLUMN amount TYPE NUMERIC(14, 2) USING ROUND(amount::text::numeric, 2);
+
+ALTER TABLE payments
+    ALTER COLUMN total_amount TYPE NUMERIC(14, 2) USING ROUND(total_amount::text::numeric, 2);
+
+CREATE OR REPLACE VIEW financial_totals_live AS
+WITH txn AS (
+    SELECT
+        bt.account_id,
+        bt.sheet_owner,
+        CASE WHEN bt.transaction_type = 'credit' THEN bt.amount ELSE 0 END AS credit,
+        CASE WHEN bt.transaction_type = 'debit' THEN bt.amount ELSE 0 END AS debit
+    FROM bank_transactions bt
+),
+expense AS (
+    SELECT e.owner_id, e.bank_account_id, e.amount AS amount
+    FROM expenses e
+),
+open_load AS (
+    SELECT
+        l.driver_id,
+        t.owner_id,
+        l.sheet_owner,
+        l.amount_gross AS gross,
+        l.amount_gross * COALESCE(l.slv_fee_percent, 0) / 100 AS slv_fee,
+        l.amount_gross * COALESCE(l.recife_fee_percent, 0) / 100 AS recife_fee
+    FROM loads l
+    LEFT JOIN trucks t ON t.id = l.truck_id
+    WHERE l.status != 'paid'
+),
+contributions AS (
+    SELECT d.scope, d.scope_key, txn.credit, txn.debit, 1 AS txn_count,
+           0::numeric AS expense, 0 AS load_count, 0::numeric AS gross, 0::numeric AS slv_fee, 0::numeric AS recife_fee
+    FROM txn
+    CROSS JOIN LATERAL (VALUES ('account', txn.account_id::text), ('sheet_owner', txn.sheet_owner)) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+    UNION ALL
+    SELECT d.scope, d.scope_key, 0, 0, 0, expense.amount, 0, 0, 0, 0
+    FROM expense
+    CROSS JOIN LATERAL (VALUES ('owner', expense.owner_id::text), ('account', expense.bank_account_id::text)) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+    UNION ALL
+    SELECT d.scope, d.scope_key, 0, 0, 0, 0, 1, open_load.gross, open_load.slv_fee, open_load.recife_fee
+    FROM open_load
+    CROSS JOIN LATERAL (
+        VALUES ('owner', open_load.owner_id::text), ('driver', open_load.driver_id::text), ('sheet_owner', open_load.sheet_owner)
+    ) AS d(scope, scope_key)
+    WHERE d.scope_key IS NOT NULL
+)
+SELECT
+    'all'::text AS scope,
+    ''::text AS scope_key,
+    COALESCE((SELECT SUM(credit) FROM txn), 0) AS credit_total,
+    COALESCE((SELECT SUM(debit) FROM txn), 0) AS debit_total,
+    (SELECT COUNT(*) FROM txn) AS transaction_count,
+    COALESCE((SELECT SUM(amount) FROM expense), 0) AS expense_total,
+    (SELECT COUNT(*) FROM open_load) AS open_load_count,
+    COALESCE((SELECT SUM(gross) FROM open_load), 0) AS open_gross_total,
+    COALESCE((SELECT SUM(slv_fee) FROM open_load), 0) AS open_slv_fee_total,
+    COALESCE((SELECT SUM(recife_fee) FROM open_load), 0) AS open_recife_fee_total
+UNION ALL
+SELECT
+    scope,
+    scope_key,
+    SUM(credit),
+    SUM(debit),
+    SUM(txn_count),
+    SUM(expense),
+    SUM(load_count),
+    SUM(gross),
+    SUM(slv_fee),
+    SUM(recife_fee)
+FROM contributions
+GROUP BY scope, scope_key;
+
+CREATE OR REPLACE FUNCTION financial_totals_bank_transactions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            NULL::integer AS owner_id,
+            NULL::integer AS driver_id,
+            r.account_id,
+            r.sheet_owner,
+            CASE WHEN r.transaction_type = 'credit' THEN r.sign * r.amount ELSE 0 END AS credit,
+            CASE WHEN r.transaction_type = 'debit' THEN r.sign * r.amount ELSE 0 END AS debit,
+            r.sign AS txn_count,
+            0::numeric AS expense,
+            0 AS load_count,
+            0::numeric AS gross,
+            0::numeric AS slv_fee,
+            0::numeric AS recife_fee
+        FROM (%s) r
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_expenses() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            r.owner_id,
+            NULL::integer AS driver_id,
+            r.bank_account_id AS account_id,
+            NULL::text AS sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            r.sign * r.amount AS expense,
+            0 AS load_count,
+            0::numeric AS gross,
+            0::numeric AS slv_fee,
+            0::numeric AS recife_fee
+        FROM (%s) r
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION financial_totals_loads() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql(format($sql$
+        SELECT
+            t.owner_id,
+            r.driver_id,
+            NULL::integer AS account_id,
+            r.sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            0::numeric AS expense,
+            r.sign AS load_count,
+            r.sign * r.amount_gross AS gross,
+            r.sign * r.amount_gross * COALESCE(r.slv_fee_percent, 0) / 100 AS slv_fee,
+            r.sign * r.amount_gross * COALESCE(r.recife_fee_percent, 0) / 100 AS recife_fee
+        FROM (%s) r
+        LEFT JOIN trucks t ON t.id = r.truck_id
+        WHERE r.status != 'paid'
+    $sql$, financial_totals_signed_rows(TG_OP)));
+    RETURN NULL;
+END;
+$$;
+
+-- Open loads are counted under the owner of their truck: moving a truck to another
+-- owner moves its open-load totals too.
+CREATE OR REPLACE FUNCTION financial_totals_trucks() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    EXECUTE financial_totals_delta_sql($sql$
+        SELECT
+            moved.owner_id,
+            NULL::integer AS driver_id,
+            NULL::integer AS account_id,
+            NULL::text AS sheet_owner,
+            0::numeric AS credit,
+            0::numeric AS debit,
+            0 AS txn_count,
+            0::numeric AS expense,
+            moved.sign AS load_count,
+            moved.sign * l.amount_gross AS gross,
+            moved.sign * l.amount_gross * COALESCE(l.slv_fee_percent, 0) / 100 AS slv_fee,
+            moved.sign * l.amount_gross * COALESCE(l.recife_fee_percent, 0) / 100 AS recife_fee
+        FROM (
+            SELECT n.id, n.owner_id, 1 AS sign
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.owner_id IS DISTINCT FROM o.owner_id
+            UNION ALL
+            SELECT o.id, o.owner_id, -1
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.owner_id IS DISTINCT FROM o.owner_id
+        ) moved
+        JOIN loads l ON l.truck_id = moved.id
+        WHERE l.status != 'paid'
+    $sql$);
+    RETURN NULL;
+END;
+$$;
+
+SELECT rebuild_financial_totals();
@@ -0,0 +1,27 @@
+-- Background jobs (CSV imports, weekly close). Workers claim with FOR UPDATE SKIP LOCKED,
+-- so several threads/processes share the queue without blocking on each other.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    args JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    result JSONB,
+    error TEXT,
+    chat_id TEXT,
+    message_id BIGINT,
+    worker TEXT,
+    run_after TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    duration_ms INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(run_after, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(heartbeat_at) WHERE status = 'running';
@@ -0,0 +1,126 @@
+-- The triggers used to upsert financial_totals directly. Every writer touched the shared
+-- ('all', '') row and kept it locked until commit, so a large import (one transaction per
+-- file) blocked every other money write, and two writers locking scopes in hash order could
+-- deadlock.
+--
+-- Triggers now append their per-statement deltas to financial_totals_deltas, which takes no
+-- lock on any existing row. fold_financial_totals() moves committed deltas into
+-- financial_totals in key order, and readers use financial_totals_current: the folded row
+-- plus the deltas still pending for the same scope.
+
+CREATE TABLE IF NOT EXISTS financial_totals_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    scope TEXT NOT NULL,
+    scope_key TEXT NOT NULL,
+    credit_total NUMERIC NOT NULL DEFAULT 0,
+    debit_total NUMERIC NOT NULL DEFAULT 0,
+    transaction_count BIGINT NOT NULL DEFAULT 0,
+    expense_total NUMERIC NOT NULL DEFAULT 0,
+    open_load_count BIGINT NOT NULL DEFAULT 0,
+    open_gross_total NUMERIC NOT NULL DEFAULT 0,
+    open_slv_fee_total NUMERIC NOT NULL DEFAULT 0,
+    open_recife_fee_total NUMERIC NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_financial_totals_deltas_scope ON financial_totals_deltas (scope, scope_key);
+
+CREATE OR REPLACE VIEW financial_totals_current AS
+SELECT
+    scope,
+    scope_key,
+    SUM(credit_total) AS credit_total,
+    SUM(debit_total) AS debit_total,
+    SUM(transaction_count)::bigint AS transaction_count,
+    SUM(expense_total) AS expense_total,
+    SUM(open_load_count)::bigint AS open_load_count,
+    SUM(open_gross_total) AS open_gross_total,
+    SUM(open_slv_fee_total) AS open_slv_fee_total,
+    SUM(open_recife_fee_total) AS open_recife_fee_total
+FROM (
+    SELECT
+        scope, scope_key, credit_total, debit_total, transaction_count, expense_total,
+        open_load_count, open_gross_total, open_slv_fee_total, open_recife_fee_total
+    FROM financial_totals
+    UNION ALL
+    SELECT
+        scope, scope_key, credit_total, debit_total, transaction_count, expense_total,
+        open_load_count, open_gross_total, open_slv_fee_total, open_recife_fee_total
+    FROM financial_totals_deltas
+) totals
+GROUP BY scope, scope_key;
+
+-- Same signature as before, so the trigger functions pick it up unchanged.
+CREATE OR REPLACE FUNCTION financial_totals_delta_sql(changed TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT format($sql$
+        INSERT INTO financial_totals_deltas (
+            scope, scope_key, credit_total, debit_total, transaction_count, expense_total,
+            open_load_count, open_gross_total, open_slv_fee_total, open_recife_fee_total
+        )
+        SELECT
+            d.scope, d.scope_key,
+            SUM(c.credit), SUM(c.debit), SUM(c.txn_count), SUM(c.expense),
+            SUM(c.load_count), SUM(c.gross), SUM(c.slv_fee), SUM(c.recife_fee)
+        FROM (%s) c
+        CROSS JOIN LATERAL (
+            VALUES ('all', ''), ('owner', c.owner_id::text), ('driver', c.driver_id::text),
+                   ('account', c.account_id::text), ('sheet_owner', c.sheet_owner)
+        ) AS d(scope, scope_key)
+        WHERE d.scope_key IS NOT NULL
+        GROUP BY d.scope, d.scope_key
+        HAVING SUM(c.credit) <> 0 OR SUM(c.debit) <> 0 OR SUM(c.txn_count) <> 0 OR SUM(c.expense) <> 0
+            OR SUM(c.load_count) <> 0 OR SUM(c.gross) <> 0 OR SUM(c.slv_fee) <> 0 OR SUM(c.recife_fee) <> 0
+    $sql$, changed)
+$$;
+
+-- Deltas of transactions still running are invisible here and wait for the next fold. The
+-- advisory lock keeps a single folder (or rebuild) at a time; a busy fold is skipped, not
+-- waited on. Returns the number of delta rows folded.
+CREATE OR REPLACE FUNCTION fold_financial_totals() RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    folded integer;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(7246102) THEN
+        RETURN 0;
+    END IF;
+    WITH moved AS (
+        DELETE FROM financial_totals_deltas RETURNING *
+    ),
+    merged AS (
+        INSERT INTO financial_totals AS ft (
+            scope, scope_key, credit_total, debit_total, transaction_count, expense_total,
+            open_load_count, open_gross_total, open_slv_fee_total, open_recife_fee_total
+        )
+        SELECT
+            scope, scope_key,
+            SUM(credit_total), SUM(debit_total), SUM(transaction_count), SUM(expense_total),
+            SUM(open_load_count), SUM(open_gross_total), SUM(open_slv_fee_total), SUM(open_recife_fee_total)
+        FROM moved
+        GROUP BY scope, scope_key
+        ORDER BY scope, scope_key
+        ON CONFLICT (scope, scope_key) DO UPDATE SET
+            credit_total = ft.credit_total + excluded.credit_total,
+            debit_total = ft.debit_total + excluded.debit_total,
+            transaction_count = ft.transaction_count + excluded.transaction_count,
+            expense_total = ft.expense_total + excluded.expense_total,
+            open_load_count = ft.open_load_count + excluded.open_load_count,
+            open_gross_total = ft.open_gross_total + excluded.open_gross_total,
+            open_slv_fee_total = ft.open_slv_fee_total + excluded.open_slv_fee_total,
+            open_recife_fee_total = ft.open_recife_fee_total + excluded.open_recife_fee_total
+    )
+    SELECT COUNT(*) INTO folded FROM moved;
+    RETURN folded;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION rebuild_financial_totals() RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(7246102);
+    LOCK TABLE bank_transactions, expenses, loads, trucks IN SHARE MODE;
+    DELETE FROM financial_totals_deltas;
+    DELETE FROM financial_totals;
+    INSERT INTO financial_totals SELECT * FROM financial_totals_live;
+END;
+$$;
@@ -0,0 +1,38 @@
+-- The summary cache (app/repositories/summary_cache.py) is per process. Any write to a table
+-- behind the cached aggregates now sends NOTIFY summary_cache, and every process LISTENs on
+-- it, so a write made by another uvicorn worker, the job worker or the CLI invalidates them
+-- all. Notifications go out on commit and repeats within one transaction are collapsed into
+-- one, so a large import costs a single message.
+
+CREATE OR REPLACE FUNCTION notify_summary_cache() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('summary_cache', '');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS summary_cache_notify ON bank_transactions;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON bank_transactions
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
+
+DROP TRIGGER IF EXISTS summary_cache_notify ON expenses;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON expenses
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
+
+DROP TRIGGER IF EXISTS summary_cache_notify ON loads;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON loads
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
+
+DROP TRIGGER IF EXISTS summary_cache_notify ON payments;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON payments
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
+
+DROP TRIGGER IF EXISTS summary_cache_notify ON bank_reconciliations;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON bank_reconciliations
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
+
+-- rebuild_financial_totals() rewrites the totals without touching the tables above.
+DROP TRIGGER IF EXISTS summary_cache_notify ON financial_totals;
+CREATE TRIGGER summary_cache_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON financial_totals
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_summary_cache();
@@ -0,0 +1,5 @@
+"""Numbered SQL migrations (``NNNN_name.sql``) and the runner that applies them."""
+
+from app.migrations.runner import MigrationError, migrate, migration_status
+
+__all__ = ["MigrationError", "migrate", "migration_status"]
@@ -0,0 +1,286 @@
+import hashlib
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app.config import DB_PATH
+
+MIGRATIONS_DIR = Path(__file__).parent
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+NO_TRANSACTION_MARKER = re.compile(r"^\s*--\s*migrate:\s*no-transaction\s*$", re.MULTILINE)
+# Arbitrary constant shared by every process running migrations against the same database.
+MIGRATION_LOCK_KEY = 7_246_101
+LOCK_POLL_SECONDS = 0.5
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: Path
+    sql: str
+    checksum: str
+    transactional: bool
+
+
+def split_sql_statements(sql: str) -> list[str]:
+    """Splits a script on top-level ';', ignoring those inside quotes, dollar-quoted
+    bodies and comments. Comment-only chunks are dropped."""
+    statements: list[str] = []
+    current: list[str] = []
+    has_code = False
+    index = 0
+    length = len(sql)
+    while index < length:
+        char = sql[index]
+        if char == "-" and sql.startswith("--", index):
+            end = sql.find("\n", index)
+            end = length if end == -1 else end + 1
+            current.append(sql[index:end])
+            index = end
+            continue
+        if char == "/" and sql.startswith("/*", index):
+            end = sql.find("*/", index + 2)
+            end = length if end == -1 else end + 2
+            current.append(sql[index:end])
+            index = end
+            continue
+        if char in ("'", '"'):
+            end = index + 1
+            while end < length:
+                if sql[end] == char:
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[index : end + 1])
+            has_code = True
+            index = end + 1
+            continue
+        if char == "$":
+            match = re.match(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$", sql[index:])
+            if match:
+                tag = match.group(0)
+                end = sql.find(tag, index + len(tag))
+                end = length if end == -1 else end + len(tag)
+                current.append(sql[index:end])
+                has_code = True
+                index = end
+                continue
+        if char == ";":
+            if has_code:
+                statements.append("".join(current).strip())
+            current = []
+            has_code = False
+            index += 1
+            continue
+        if not char.isspace():
+            has_code = True
+        current.append(char)
+        index += 1
+    if has_code:
+        statements.append("".join(current).strip())
+    return statements
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations: list[Migration] = []
+    seen: dict[int, str] = {}
+    for path in sorted(directory.glob("*.sql")):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            raise MigrationError(f"Nome de migração inválido: {path.name} (use 0001_nome.sql).")
+        version = int(match.group(1))
+        if version in seen:
+            raise MigrationError(f"Versão {version} duplicada: {seen[version]} e {path.name}.")
+        seen[version] = path.name
+        sql = path.read_text(encoding="utf-8")
+        migrations.append(
+            Migration(
+                version=version,
+                name=match.group(2),
+                path=path,
+                sql=sql,
+                checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+                transactional=not NO_TRANSACTION_MARKER.search(sql),
+            )
+        )
+    return sorted(migrations, key=lambda item: item.version)
+
+
+def _connect(db_url: str | None):
+    connection = psycopg2.connect(db_url or DB_PATH, cursor_factory=RealDictCursor)
+    connection.autocommit = True
+    return connection
+
+
+def _ensure_table(cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+        """
+    )
+
+
+def _applied(cursor) -> dict[int, dict]:
+    cursor.execute("SELECT version, name, checksum, applied_at, duration_ms FROM schema_migrations")
+    return {row["version"]: row for row in cursor.fetchall()}
+
+
+def _apply(connection, migration: Migration) -> int:
+    started = time.perf_counter()
+    statements = split_sql_statements(migration.sql)
+    connection.autocommit = not migration.transactional
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except psycopg2.Error as exc:
+                    hint = ""
+                    if not migration.transactional:
+                        hint = (
+                            "\nMigração sem transação: os comandos anteriores já foram aplicados; "
+                            "índices CONCURRENTLY interrompidos ficam INVALID e precisam de DROP INDEX antes de rodar de novo."
+                        )
+                    raise MigrationError(
+                        f"Falha na migração {migration.version:04d}_{migration.name}: {exc.pgerror or exc}"
+                        f"\nComando: {statement[:200]}{hint}"
+                    ) from exc
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            cursor.execute(
+                """
+                INSERT INTO schema_migrations (version, name, checksum, duration_ms)
+                VALUES (%s, %s, %s, %s)
+                """,
+                (migration.version, migration.name, migration.checksum, duration_ms),
+            )
+        if migration.transactional:
+            connection.commit()
+    except Exception:
+        if migration.transactional:
+            connection.rollback()
+        raise
+    finally:
+        connection.autocommit = True
+    return duration_ms
+
+
+def _acquire_lock(connection, timeout: float) -> None:
+    # Polls pg_try_advisory_lock instead of blocking in pg_advisory_lock: a waiter blocked
+    # inside a statement holds a transaction open, and CREATE INDEX CONCURRENTLY in the
+    # lock holder waits for every open transaction, which would deadlock.
+    deadline = time.monotonic() + timeout
+    with connection.cursor() as cursor:
+        while True:
+            cursor.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MIGRATION_LOCK_KEY,))
+            if cursor.fetchone()["locked"]:
+                return
+            if time.monotonic() >= deadline:
+                raise MigrationError(f"Outra migração está em andamento há mais de {timeout:.0f}s.")
+            time.sleep(LOCK_POLL_SECONDS)
+
+
+def migrate(
+    db_url: str | None = None,
+    target: int | None = None,
+    lock_timeout: float = 600.0,
+    directory: Path = MIGRATIONS_DIR,
+) -> list[dict]:
+    """Applies pending migrations in order and returns what was applied.
+
+    A session advisory lock serializes concurrent runners (several workers starting
+    at once): the others wait, then find nothing left to apply. Nothing is applied while
+    an already applied file differs from what was recorded.
+    """
+    migrations = load_migrations(directory)
+    connection = _connect(db_url)
+    applied_now: list[dict] = []
+    try:
+        _acquire_lock(connection, lock_timeout)
+        try:
+            with connection.cursor() as cursor:
+                _ensure_table(cursor)
+                applied = _applied(cursor)
+            changed = [
+                f"{migration.version:04d}_{migration.name}"
+                for migration in migrations
+                if migration.version in applied and applied[migration.version]["checksum"] != migration.checksum
+            ]
+            if changed:
+                raise MigrationError(
+                    f"Migrações já aplicadas foram alteradas: {', '.join(changed)}. "
+                    "Restaure o arquivo original e coloque a mudança numa nova migração."
+                )
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in applied:
+                    continue
+                duration_ms = _apply(connection, migration)
+                applied_now.append(
+                    {"version": migration.version, "name": migration.name, "duration_ms": duration_ms}
+                )
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+    finally:
+        connection.close()
+    return applied_now
+
+
+def migration_status(db_url: str | None = None, directory: Path = MIGRATIONS_DIR) -> list[dict]:
+    migrations = load_migrations(directory)
+    connection = _connect(db_url)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS present")
+            applied = _applied(cursor) if cursor.fetchone()["present"] else {}
+    finally:
+        connection.close()
+    status: list[dict] = []
+    for migration in migrations:
+        row = applied.pop(migration.version, None)
+        if row is None:
+            state = "pending"
+        elif row["checksum"] != migration.checksum:
+            state = "changed"
+        else:
+            state = "applied"
+        status.append(
+            {
+                "version": migration.version,
+                "name": migration.name,
+                "state": state,
+                "transactional": migration.transactional,
+                "applied_at": row["applied_at"] if row else None,
+                "duration_ms": row["duration_ms"] if row else None,
+            }
+        )
+    for version, row in sorted(applied.items()):
+        status.append(
+            {
+                "version": version,
+                "name": row["name"],
+                "state": "missing",
+                "transactional": None,
+                "applied_at": row["applied_at"],
+                "duration_ms": row["duration_ms"],
+            }
+        )
+    return status
@@ -1,7 +1,23 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
 from typing import Any
 
 
+@dataclass
+class DashboardFilters:
+    account_id: int | None = None
+    sheet_owner: str | None = None
+    date_from: date | None = None
+    date_to: date | None = None
+    status: str | None = None
+    min_amount: Decimal | None = None
+    max_amount: Decimal | None = None
+    page_size: int = 50
+    txn_cursor: str | None = None
+    load_cursor: str | None = None
+
+
 @dataclass
 class DashboardData:
     bank_transactions: list[dict[str, Any]]
@@ -9,3 +25,6 @@ class DashboardData:
     stats: dict[str, Any] | None
     reconciled_count: dict[str, Any] | None
     pending_loads: dict[str, Any] | None
+    accounts: list[dict[str, Any]] = field(default_factory=list)
+    next_txn_cursor: str | None = None
+    next_load_cursor: str | None = None
@@ -0,0 +1,49 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# Money is a Decimal with two places, matching the NUMERIC(14,2) columns. ROUND_HALF_UP
+# rounds half away from zero, like PostgreSQL's ROUND(numeric).
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+# Largest value NUMERIC(14,2) holds.
+MAX_MONEY = Decimal("999999999999.99")
+
+
+def to_decimal(value) -> Decimal:
+    if value is None or value == "":
+        return Decimal(0)
+    if isinstance(value, Decimal):
+        result = value
+    elif isinstance(value, float):
+        # str() gives the shortest repr (0.1 -> "0.1"), not the binary expansion.
+        result = Decimal(str(value))
+    else:
+        try:
+            result = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Valor inválido: {value}") from None
+    if not result.is_finite():
+        raise ValueError(f"Valor inválido: {value}")
+    return result
+
+
+def to_money(value) -> Decimal:
+    try:
+        result = to_decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        # quantize() raises when the value has more digits than the context precision (1e30).
+        raise ValueError(f"Valor inválido: {value}") from None
+    if abs(result) > MAX_MONEY:
+        raise ValueError(f"Valor fora do limite de ±{MAX_MONEY}: {value}")
+    return result
+
+
+def percent_of(amount, percent) -> Decimal:
+    return to_money(to_decimal(amount) * to_decimal(percent) / 100)
+
+
+def to_cents(value) -> int:
+    return int(to_money(value) * 100)
+
+
+def from_cents(cents: int) -> Decimal:
+    return (Decimal(cents) / 100).quantize(CENT)
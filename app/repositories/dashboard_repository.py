@@ -1,67 +1,204 @@
-from app.db import get_connection
-from app.models.dashboard import DashboardData
+from datetime import date
 
+from app.db import asyncpg_query, get_async_connection, get_connection
+from app.models.dashboard import DashboardData, DashboardFilters
+from app.repositories.summary_cache import summary_cache
 
-class DashboardRepository:
-    def fetch_dashboard(self) -> DashboardData:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN transaction_type = 'credit' THEN amount ELSE 0 END) AS total_credit,
-                    SUM(CASE WHEN transaction_type = 'debit' THEN amount ELSE 0 END) AS total_debit,
-                    COUNT(*) AS total_transactions
-                FROM bank_transactions
-                """
-            )
-            stats = cursor.fetchone()
-            cursor.execute(
-                """
-                SELECT COUNT(*)
-                FROM bank_transactions bt
-                LEFT JOIN payments p ON p.bank_transaction_id = bt.id
-                LEFT JOIN bank_reconciliations br ON br.bank_transaction_id = bt.id
-                WHERE p.id IS NOT NULL OR br.id IS NOT NULL
-                """
-            )
-            reconciled_count = cursor.fetchone()
-            cursor.execute("SELECT COUNT(*) FROM loads WHERE status != 'paid'")
-            pending_loads = cursor.fetchone()
-            cursor.execute(
-                """
-                SELECT
-                    bt.*,
-                    p.id AS payment_id,
-                    br.reconciliation_type,
-                    br.notes,
-                    ba.label AS account_label
-                FROM bank_transactions bt
-                LEFT JOIN payments p ON p.bank_transaction_id = bt.id
-                LEFT JOIN bank_reconciliations br ON br.bank_transaction_id = bt.id
-                LEFT JOIN bank_accounts ba ON ba.id = bt.account_id
-                ORDER BY bt.txn_date DESC
-                """
+
+def _encode_cursor(row_date: date | None, row_id: int) -> str:
+    return f"{row_date.isoformat() if row_date else ''}:{row_id}"
+
+
+def _decode_cursor(cursor: str | None) -> tuple[date | None, int] | None:
+    if not cursor or ":" not in cursor:
+        return None
+    raw_date, raw_id = cursor.rsplit(":", 1)
+    try:
+        return (date.fromisoformat(raw_date) if raw_date else None), int(raw_id)
+    except ValueError:
+        return None
+
+
+def _transactions_query(filters: DashboardFilters) -> tuple[str, dict]:
+    conditions = ["TRUE"]
+    params: dict = {"limit": filters.page_size + 1}
+    if filters.account_id:
+        conditions.append("bt.account_id = %(account_id)s")
+        params["account_id"] = filters.account_id
+    if filters.sheet_owner:
+        conditions.append("bt.sheet_owner = %(sheet_owner)s")
+        params["sheet_owner"] = filters.sheet_owner
+    if filters.date_from:
+        conditions.append("bt.txn_date >= %(date_from)s")
+        params["date_from"] = filters.date_from
+    if filters.date_to:
+        conditions.append("bt.txn_date <= %(date_to)s")
+        params["date_to"] = filters.date_to
+    if filters.min_amount is not None:
+        conditions.append("bt.amount >= %(min_amount)s")
+        params["min_amount"] = filters.min_amount
+    if filters.max_amount is not None:
+        conditions.append("bt.amount <= %(max_amount)s")
+        params["max_amount"] = filters.max_amount
+    if filters.status == "pending":
+        conditions.append("p.id IS NULL AND br.id IS NULL")
+    elif filters.status == "reconciled":
+        conditions.append("(p.id IS NOT NULL OR br.id IS NOT NULL)")
+    position = _decode_cursor(filters.txn_cursor)
+    if position and position[0]:
+        conditions.append("(bt.txn_date, bt.id) < (%(cursor_date)s, %(cursor_id)s)")
+        params["cursor_date"], params["cursor_id"] = position
+    query = f"""
+        SELECT
+            bt.*,
+            p.id AS payment_id,
+            br.reconciliation_type,
+            br.notes,
+            ba.label AS account_label
+        FROM bank_transactions bt
+        LEFT JOIN payments p ON p.bank_transaction_id = bt.id
+        LEFT JOIN bank_reconciliations br ON br.bank_transaction_id = bt.id
+        LEFT JOIN bank_accounts ba ON ba.id = bt.account_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bt.txn_date DESC, bt.id DESC
+        LIMIT %(limit)s
+    """
+    return query, params
+
+
+def _loads_query(filters: DashboardFilters) -> tuple[str, dict]:
+    # Order is load_date DESC NULLS LAST, id DESC. Dated and undated loads are read by two
+    # branches so each keeps a plain row comparison that the (load_date, id) index can seek to.
+    conditions = ["l.status != 'paid'"]
+    params: dict = {"limit": filters.page_size + 1}
+    if filters.sheet_owner:
+        conditions.append("l.sheet_owner = %(sheet_owner)s")
+        params["sheet_owner"] = filters.sheet_owner
+    if filters.date_from:
+        conditions.append("l.load_date >= %(date_from)s")
+        params["date_from"] = filters.date_from
+    if filters.date_to:
+        conditions.append("l.load_date <= %(date_to)s")
+        params["date_to"] = filters.date_to
+    if filters.min_amount is not None:
+        conditions.append("l.amount_gross >= %(min_amount)s")
+        params["min_amount"] = filters.min_amount
+    if filters.max_amount is not None:
+        conditions.append("l.amount_gross <= %(max_amount)s")
+        params["max_amount"] = filters.max_amount
+    dated = ["l.load_date IS NOT NULL"]
+    undated = ["l.load_date IS NULL"]
+    position = _decode_cursor(filters.load_cursor)
+    if position:
+        params["cursor_date"], params["cursor_id"] = position
+        if position[0]:
+            dated.append("(l.load_date, l.id) < (%(cursor_date)s, %(cursor_id)s)")
+        else:
+            dated.append("FALSE")
+            undated.append("l.id < %(cursor_id)s")
+    if filters.date_from or filters.date_to:
+        undated.append("FALSE")
+    where = " AND ".join(conditions)
+    query = f"""
+        WITH page AS (
+            (
+                SELECT l.*
+                FROM loads l
+                WHERE {where} AND {" AND ".join(dated)}
+                ORDER BY l.load_date DESC, l.id DESC
+                LIMIT %(limit)s
             )
-            bank_transactions = cursor.fetchall()
-            cursor.execute(
-                """
-                SELECT l.*, d.name AS driver_name, t.plate AS truck_plate
+            UNION ALL
+            (
+                SELECT l.*
                 FROM loads l
-                LEFT JOIN drivers d ON d.id = l.driver_id
-                LEFT JOIN trucks t ON t.id = l.truck_id
-                WHERE l.status != 'paid'
-                ORDER BY l.load_date DESC
-                """
+                WHERE {where} AND {" AND ".join(undated)}
+                ORDER BY l.id DESC
+                LIMIT %(limit)s
             )
-            loads = cursor.fetchall()
-        connection.close()
+        )
+        SELECT page.*, d.name AS driver_name, t.plate AS truck_plate
+        FROM page
+        LEFT JOIN drivers d ON d.id = page.driver_id
+        LEFT JOIN trucks t ON t.id = page.truck_id
+        ORDER BY page.load_date DESC NULLS LAST, page.id DESC
+        LIMIT %(limit)s
+    """
+    return query, params
+
+
+_TOTALS_SQL = """
+    SELECT
+        COALESCE(ft.credit_total, 0) AS total_credit,
+        COALESCE(ft.debit_total, 0) AS total_debit,
+        COALESCE(ft.transaction_count, 0) AS total_transactions,
+        COALESCE(ft.open_load_count, 0) AS pending_count
+    FROM (VALUES (1)) AS one
+    LEFT JOIN financial_totals_current ft ON ft.scope = 'all' AND ft.scope_key = ''
+"""
+
+_RECONCILED_SQL = """
+    SELECT COUNT(*)
+    FROM bank_transactions bt
+    LEFT JOIN payments p ON p.bank_transaction_id = bt.id
+    LEFT JOIN bank_reconciliations br ON br.bank_transaction_id = bt.id
+    WHERE p.id IS NOT NULL OR br.id IS NOT NULL
+"""
+
+_ACCOUNTS_SQL = "SELECT id, label FROM bank_accounts ORDER BY label"
+
+
+def _page(rows: list[dict], filters: DashboardFilters, date_key: str) -> tuple[list[dict], str | None]:
+    if len(rows) <= filters.page_size:
+        return rows, None
+    rows = rows[: filters.page_size]
+    return rows, _encode_cursor(rows[-1][date_key], rows[-1]["id"])
+
+
+def _stats(totals: dict, reconciled_count: dict) -> tuple[dict, dict, dict]:
+    stats = {
+        "total_credit": totals["total_credit"],
+        "total_debit": totals["total_debit"],
+        "total_transactions": totals["total_transactions"],
+    }
+    return stats, reconciled_count, {"count": totals["pending_count"]}
+
+
+class DashboardRepository:
+    def _fetch_transactions(self, cursor, filters: DashboardFilters) -> tuple[list[dict], str | None]:
+        cursor.execute(*_transactions_query(filters))
+        return _page(cursor.fetchall(), filters, "txn_date")
+
+    def _fetch_loads(self, cursor, filters: DashboardFilters) -> tuple[list[dict], str | None]:
+        cursor.execute(*_loads_query(filters))
+        return _page(cursor.fetchall(), filters, "load_date")
+
+    def _fetch_stats(self, cursor) -> tuple[dict, dict, dict]:
+        cursor.execute(_TOTALS_SQL)
+        totals = cursor.fetchone()
+        cursor.execute(_RECONCILED_SQL)
+        return _stats(totals, cursor.fetchone())
+
+    def fetch_dashboard(self, filters: DashboardFilters | None = None) -> DashboardData:
+        filters = filters or DashboardFilters()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                stats, reconciled_count, pending_loads = summary_cache.get(
+                    "dashboard_stats", lambda: self._fetch_stats(cursor)
+                )
+                cursor.execute(_ACCOUNTS_SQL)
+                accounts = cursor.fetchall()
+                bank_transactions, next_txn_cursor = self._fetch_transactions(cursor, filters)
+                loads, next_load_cursor = self._fetch_loads(cursor, filters)
         return DashboardData(
             bank_transactions=bank_transactions,
             loads=loads,
             stats=stats,
             reconciled_count=reconciled_count,
             pending_loads=pending_loads,
+            accounts=accounts,
+            next_txn_cursor=next_txn_cursor,
+            next_load_cursor=next_load_cursor,
         )
 
     def reconcile(
@@ -71,37 +208,73 @@ class DashboardRepository:
         notes: str | None,
         load_ids: list[int] | None,
     ) -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                "SELECT amount FROM bank_transactions WHERE id = %s",
-                (bank_transaction_id,),
-            )
-            txn = cursor.fetchone()
-            total_amount = txn["amount"] if txn else 0.0
-            if reconciliation_type == "loads":
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
                 cursor.execute(
-                    "INSERT INTO payments (bank_transaction_id, total_amount) VALUES (%s, %s)",
-                    (bank_transaction_id, total_amount),
+                    "SELECT amount FROM bank_transactions WHERE id = %s",
+                    (bank_transaction_id,),
                 )
-                cursor.execute("SELECT LASTVAL() AS id")
-                payment_id = cursor.fetchone()["id"]
-                selected_loads = load_ids or []
-                if selected_loads:
-                    cursor.executemany(
-                        "INSERT INTO payment_loads (payment_id, load_id) VALUES (%s, %s)",
-                        [(payment_id, load_id) for load_id in selected_loads],
+                txn = cursor.fetchone()
+                total_amount = txn["amount"] if txn else 0.0
+                if reconciliation_type == "loads":
+                    cursor.execute(
+                        "INSERT INTO payments (bank_transaction_id, total_amount) VALUES (%s, %s)",
+                        (bank_transaction_id, total_amount),
                     )
-                    cursor.executemany(
-                        "UPDATE loads SET status = 'paid' WHERE id = %s",
-                        [(load_id,) for load_id in selected_loads],
-                    )
-            cursor.execute(
-                """
-                INSERT INTO bank_reconciliations (bank_transaction_id, reconciliation_type, notes)
-                VALUES (%s, %s, %s)
-                """,
-                (bank_transaction_id, reconciliation_type, notes),
+                    cursor.execute("SELECT LASTVAL() AS id")
+                    payment_id = cursor.fetchone()["id"]
+                    selected_loads = load_ids or []
+                    if selected_loads:
+                        cursor.executemany(
+                            "INSERT INTO payment_loads (payment_id, load_id) VALUES (%s, %s)",
+                            [(payment_id, load_id) for load_id in selected_loads],
+                        )
+                        cursor.executemany(
+                            "UPDATE loads SET status = 'paid' WHERE id = %s",
+                            [(load_id,) for load_id in selected_loads],
+                        )
+                cursor.execute(
+                    """
+                    INSERT INTO bank_reconciliations (bank_transaction_id, reconciliation_type, notes)
+                    VALUES (%s, %s, %s)
+                    """,
+                    (bank_transaction_id, reconciliation_type, notes),
+                )
+            connection.commit()
+        summary_cache.invalidate()
+
+
+class AsyncDashboardRepository:
+    """asyncpg version of DashboardRepository.fetch_dashboard for the async web route."""
+
+    @staticmethod
+    async def _fetch(connection, query: tuple[str, dict]) -> list[dict]:
+        sql, args = asyncpg_query(*query)
+        return [dict(row) for row in await connection.fetch(sql, *args)]
+
+    async def _fetch_stats(self, connection) -> tuple[dict, dict, dict]:
+        totals = await connection.fetchrow(_TOTALS_SQL)
+        reconciled_count = await connection.fetchrow(_RECONCILED_SQL)
+        return _stats(dict(totals), dict(reconciled_count))
+
+    async def fetch_dashboard(self, filters: DashboardFilters | None = None) -> DashboardData:
+        filters = filters or DashboardFilters()
+        async with get_async_connection() as connection:
+            stats, reconciled_count, pending_loads = await summary_cache.aget(
+                "dashboard_stats", lambda: self._fetch_stats(connection)
             )
-        connection.commit()
-        connection.close()
+            accounts = [dict(row) for row in await connection.fetch(_ACCOUNTS_SQL)]
+            bank_transactions, next_txn_cursor = _page(
+                await self._fetch(connection, _transactions_query(filters)), filters, "txn_date"
+            )
+            loads, next_load_cursor = _page(await self._fetch(connection, _loads_query(filters)), filters, "load_date")
+        return DashboardData(
+            bank_transactions=bank_transactions,
+            loads=loads,
+            stats=stats,
+            reconciled_count=reconciled_count,
+            pending_loads=pending_loads,
+            accounts=accounts,
+            next_txn_cursor=next_txn_cursor,
+            next_load_cursor=next_load_cursor,
+        )
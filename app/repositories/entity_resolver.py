@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from app.config import ENTITY_CACHE_SIZE
+from app.db import get_connection
+
+ENTITY_TABLES = {
+    "owner": "owners",
+    "driver": "drivers",
+    "truck": "trucks",
+    "bank_account": "bank_accounts",
+}
+
+
+class MissingReferenceError(ValueError):
+    def __init__(self, missing: dict[str, Iterable[str]]) -> None:
+        self.missing = {entity: sorted(ids) for entity, ids in missing.items() if ids}
+        details = []
+        for entity, ids in self.missing.items():
+            shown = ", ".join(ids[:10])
+            extra = f" (+{len(ids) - 10})" if len(ids) > 10 else ""
+            details.append(f"{entity}: {shown}{extra}")
+        super().__init__("Referências não encontradas: " + "; ".join(details))
+
+
+class EntityIdResolver:
+    """Bounded LRU cache of external_id -> id for the registration tables.
+
+    Only ids that exist are cached, so entities created by another worker are
+    picked up on the next lookup instead of staying "missing".
+    """
+
+    def __init__(self, max_size_per_entity: int = ENTITY_CACHE_SIZE) -> None:
+        self.max_size_per_entity = max(1, max_size_per_entity)
+        self._caches: dict[str, OrderedDict[str, int]] = {entity: OrderedDict() for entity in ENTITY_TABLES}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "queries": 0, "evictions": 0}
+
+    def resolve_many(self, entity: str, external_ids: Iterable[str | None]) -> dict[str, int]:
+        table = ENTITY_TABLES[entity]
+        wanted = {item for item in external_ids if item}
+        found: dict[str, int] = {}
+        pending: list[str] = []
+        with self._lock:
+            cache = self._caches[entity]
+            for external_id in wanted:
+                entity_id = cache.get(external_id)
+                if entity_id is None:
+                    pending.append(external_id)
+                else:
+                    cache.move_to_end(external_id)
+                    found[external_id] = entity_id
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(pending)
+        if not pending:
+            return found
+
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT external_id, id FROM {table} WHERE external_id = ANY(%s)",
+                    (pending,),
+                )
+                rows = cursor.fetchall()
+
+        with self._lock:
+            self._stats["queries"] += 1
+            cache = self._caches[entity]
+            for row in rows:
+                found[row["external_id"]] = row["id"]
+                cache[row["external_id"]] = row["id"]
+                cache.move_to_end(row["external_id"])
+            while len(cache) > self.max_size_per_entity:
+                cache.popitem(last=False)
+                self._stats["evictions"] += 1
+        return found
+
+    def resolve_references(
+        self,
+        references: dict[str, Iterable[str | None]],
+    ) -> tuple[dict[str, dict[str, int]], dict[str, set[str]]]:
+        resolved: dict[str, dict[str, int]] = {}
+        missing: dict[str, set[str]] = {}
+        for entity, external_ids in references.items():
+            wanted = {item for item in external_ids if item}
+            resolved[entity] = self.resolve_many(entity, wanted)
+            absent = wanted - resolved[entity].keys()
+            if absent:
+                missing[entity] = absent
+        return resolved, missing
+
+    def require(self, entity: str, external_id: str | None) -> int | None:
+        if not external_id:
+            return None
+        resolved = self.resolve_many(entity, [external_id])
+        if external_id not in resolved:
+            raise MissingReferenceError({entity: [external_id]})
+        return resolved[external_id]
+
+    def invalidate(self, entity: str | None = None, external_id: str | None = None) -> None:
+        with self._lock:
+            entities = [entity] if entity else list(self._caches)
+            for name in entities:
+                if external_id is None:
+                    self._caches[name].clear()
+                else:
+                    self._caches[name].pop(external_id, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                **{f"cached_{entity}": len(cache) for entity, cache in self._caches.items()},
+            }
+
+
+entity_resolver = EntityIdResolver()
@@ -1,51 +1,20 @@
+from decimal import Decimal
+
 from app.db import get_connection
+from app.repositories.summary_cache import summary_cache
 
 
 class FinanceRepository:
-    def get_load_for_dispatcher_fee(self, load_external_id: str, connection=None):
-        should_close = False
-        if connection is None:
-            connection = get_connection()
-            should_close = True
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT l.id, l.external_id, l.load_date, l.amount_gross, l.recife_fee_percent,
-                       t.owner_id
-                FROM loads l
-                LEFT JOIN trucks t ON t.id = l.truck_id
-                WHERE l.external_id = %s
-                """,
-                (load_external_id,),
-            )
-            row = cursor.fetchone()
-        if should_close:
-            connection.close()
-        return row
+    def insert_missing_dispatcher_fees(self, load_external_ids: list[str], connection=None) -> int:
+        if connection is not None:
+            return self._insert_missing_dispatcher_fees(load_external_ids, connection)
+        with get_connection() as connection:
+            count = self._insert_missing_dispatcher_fees(load_external_ids, connection)
+            connection.commit()
+        summary_cache.invalidate()
+        return count
 
-    def dispatcher_fee_exists(self, description: str, amount: float, expense_date, connection=None) -> bool:
-        should_close = False
-        if connection is None:
-            connection = get_connection()
-            should_close = True
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id FROM expenses
-                WHERE description = %s AND amount = %s AND expense_date = %s
-                """,
-                (description, amount, expense_date),
-            )
-            row = cursor.fetchone()
-        if should_close:
-            connection.close()
-        return bool(row)
-
-    def insert_dispatcher_fee_expense(self, owner_id, expense_date, fee_amount: float, description: str, connection=None) -> None:
-        should_close = False
-        if connection is None:
-            connection = get_connection()
-            should_close = True
+    def _insert_missing_dispatcher_fees(self, load_external_ids: list[str], connection) -> int:
         with connection.cursor() as cursor:
             cursor.execute(
                 """
@@ -57,186 +26,276 @@ class FinanceRepository:
                     amount,
                     description,
                     category,
-                    cost_center
+                    cost_center,
+                    load_id
                 )
-                VALUES (%s, %s, NULL, %s, %s, %s, 'dispatcher', 'Dispatcher fee')
-                """,
-                (owner_id, None, expense_date, fee_amount, description),
-            )
-        connection.commit()
-        if should_close:
-            connection.close()
-
-    def get_week_loads(self, week_reference: str):
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
                 SELECT
-                    l.id,
-                    l.amount_gross,
-                    l.slv_fee_percent,
-                    l.recife_fee_percent,
-                    l.week_reference,
-                    l.driver_id,
-                    t.owner_id
+                    t.owner_id,
+                    NULL,
+                    NULL,
+                    l.load_date,
+                    ROUND(l.amount_gross * l.recife_fee_percent / 100, 2),
+                    'Dispatcher fee load ' || l.external_id,
+                    'dispatcher',
+                    'Dispatcher fee',
+                    l.id
                 FROM loads l
                 LEFT JOIN trucks t ON t.id = l.truck_id
-                WHERE l.week_reference = %s
+                WHERE l.external_id = ANY(%s)
+                  AND COALESCE(l.recife_fee_percent, 0) > 0
+                ON CONFLICT (load_id) WHERE category = 'dispatcher' DO NOTHING
                 """,
-                (week_reference,),
+                (list(load_external_ids),),
             )
-            rows = cursor.fetchall()
-        connection.close()
-        return rows
+            return cursor.rowcount
 
-    def ledger_entry_exists(self, owner_id, driver_id, description: str) -> bool:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            if driver_id is not None:
-                cursor.execute(
-                    """
-                    SELECT id FROM ledger_entries
-                    WHERE driver_id = %s AND entry_type = 'weekly_commission' AND description = %s
-                    """,
-                    (driver_id, description),
-                )
-            else:
+    def close_week(self, week_reference: str, entry_date: str, description: str, before_commit=None):
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
                 cursor.execute(
                     """
-                    SELECT id FROM ledger_entries
-                    WHERE owner_id = %s AND entry_type = 'weekly_commission' AND description = %s
+                    WITH week_amounts AS (
+                        SELECT
+                            l.driver_id,
+                            t.owner_id,
+                            l.amount_gross AS amount,
+                            COALESCE(l.slv_fee_percent, 0) AS slv_fee_percent,
+                            COALESCE(l.recife_fee_percent, 0) AS recife_fee_percent
+                        FROM loads l
+                        LEFT JOIN trucks t ON t.id = l.truck_id
+                        WHERE l.week_reference = %(week_reference)s
+                    ),
+                    week_loads AS (
+                        SELECT
+                            driver_id,
+                            owner_id,
+                            amount
+                            - ROUND(amount * slv_fee_percent / 100, 2)
+                            - ROUND(amount * recife_fee_percent / 100, 2) AS net_amount
+                        FROM week_amounts
+                    ),
+                    party_totals AS (
+                        SELECT driver_id, NULL::integer AS owner_id, SUM(net_amount) AS total
+                        FROM week_loads
+                        WHERE driver_id IS NOT NULL
+                        GROUP BY driver_id
+                        UNION ALL
+                        SELECT NULL::integer, owner_id, SUM(net_amount)
+                        FROM week_loads
+                        WHERE owner_id IS NOT NULL
+                        GROUP BY owner_id
+                    ),
+                    inserted AS (
+                        INSERT INTO ledger_entries (
+                            owner_id,
+                            driver_id,
+                            entry_date,
+                            entry_type,
+                            amount,
+                            description,
+                            week_reference
+                        )
+                        SELECT owner_id, driver_id, %(entry_date)s, 'weekly_commission', total, %(description)s, %(week_reference)s
+                        FROM party_totals
+                        ON CONFLICT DO NOTHING
+                        RETURNING id
+                    )
+                    SELECT
+                        (SELECT COUNT(*) FROM week_loads) AS loads,
+                        (SELECT COALESCE(SUM(total), 0) FROM party_totals WHERE driver_id IS NOT NULL) AS drivers,
+                        (SELECT COALESCE(SUM(total), 0) FROM party_totals WHERE owner_id IS NOT NULL) AS owners,
+                        (SELECT COUNT(*) FROM inserted) AS inserted_entries
                     """,
-                    (owner_id, description),
+                    {
+                        "week_reference": week_reference,
+                        "entry_date": entry_date,
+                        "description": description,
+                    },
                 )
-            row = cursor.fetchone()
-        connection.close()
-        return bool(row)
-
-    def insert_ledger_entry(self, owner_id, driver_id, entry_date: str, amount: float, description: str) -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO ledger_entries (
-                    owner_id,
-                    driver_id,
-                    entry_date,
-                    entry_type,
-                    amount,
-                    description
-                )
-                VALUES (%s, %s, %s, 'weekly_commission', %s, %s)
-                """,
-                (owner_id, driver_id, entry_date, amount, description),
-            )
-        connection.commit()
-        connection.close()
+                row = cursor.fetchone()
+            if before_commit:
+                before_commit(connection)
+            connection.commit()
+        return row
 
     def get_ledger_rows(self, owner_external_id: str | None, driver_external_id: str | None, limit: int):
-        connection = get_connection()
-        params: list = []
-        where_clause = ""
-        if owner_external_id:
-            where_clause = "WHERE owner_id = (SELECT id FROM owners WHERE external_id = %s)"
-            params.append(owner_external_id)
-        elif driver_external_id:
-            where_clause = "WHERE driver_id = (SELECT id FROM drivers WHERE external_id = %s)"
-            params.append(driver_external_id)
-        query = f"""
-            SELECT entry_date, entry_type, amount, description
-            FROM ledger_entries
-            {where_clause}
-            ORDER BY entry_date DESC, id DESC
-            LIMIT %s
-        """
-        params.append(limit)
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-        connection.close()
+        with get_connection() as connection:
+            params: list = []
+            where_clause = ""
+            if owner_external_id:
+                where_clause = "WHERE owner_id = (SELECT id FROM owners WHERE external_id = %s)"
+                params.append(owner_external_id)
+            elif driver_external_id:
+                where_clause = "WHERE driver_id = (SELECT id FROM drivers WHERE external_id = %s)"
+                params.append(driver_external_id)
+            query = f"""
+                SELECT entry_date, entry_type, amount, description
+                FROM ledger_entries
+                {where_clause}
+                ORDER BY entry_date DESC, id DESC
+                LIMIT %s
+            """
+            params.append(limit)
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
         return rows
 
     def get_summary_stats(self):
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    SUM(CASE WHEN transaction_type = 'credit' THEN amount ELSE 0 END) AS total_credit,
-                    SUM(CASE WHEN transaction_type = 'debit' THEN amount ELSE 0 END) AS total_debit
-                FROM bank_transactions
-                """
-            )
-            stats = cursor.fetchone()
-            cursor.execute("SELECT SUM(amount) AS total_expenses FROM expenses")
-            expenses = cursor.fetchone()
-            cursor.execute("SELECT COUNT(*) AS pending_count FROM loads WHERE status != 'paid'")
-            pending = cursor.fetchone()
-        connection.close()
-        return stats, expenses, pending
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT
+                        ft.credit_total AS total_credit,
+                        ft.debit_total AS total_debit,
+                        ft.expense_total AS total_expenses,
+                        ft.open_load_count AS pending_count
+                    FROM (VALUES (1)) AS one
+                    LEFT JOIN financial_totals_current ft ON ft.scope = 'all' AND ft.scope_key = ''
+                    """
+                )
+                row = cursor.fetchone()
+        return row
 
     def get_transaction_by_external_id(self, transaction_external_id: str):
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT id, external_id, txn_date, amount
-                FROM bank_transactions
-                WHERE external_id = %s
-                """,
-                (transaction_external_id,),
-            )
-            row = cursor.fetchone()
-        connection.close()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT id, external_id, txn_date, amount
+                    FROM bank_transactions
+                    WHERE external_id = %s
+                    """,
+                    (transaction_external_id,),
+                )
+                row = cursor.fetchone()
         return row
 
-    def list_open_load_candidates(self, amount: float, txn_date, limit: int):
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT
-                    l.external_id,
-                    l.load_date,
-                    l.amount_gross,
-                    ABS(l.amount_gross - %s) AS amount_gap,
-                    ABS(l.load_date - %s) AS day_gap
-                FROM loads l
-                WHERE l.status != 'paid'
-                ORDER BY amount_gap ASC, day_gap ASC
-                LIMIT %s
-                """,
-                (amount, txn_date, limit),
-            )
-            rows = cursor.fetchall()
-        connection.close()
+    def list_open_load_candidates(self, amount: Decimal, txn_date, limit: int):
+        # Ranking is amount gap first, so the answer lies within the k nearest amounts on
+        # either side of the target. Two ordered scans on idx_loads_open_amount find the
+        # k-th smallest gap; a bounded range scan then resolves day_gap ties at that gap.
+        with get_connection() as connection:
+            params = {"amount": amount, "txn_date": txn_date, "limit": limit}
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT MAX(amount_gap) AS max_gap, COUNT(*) AS found
+                    FROM (
+                        SELECT amount_gap
+                        FROM (
+                            (
+                                SELECT l.amount_gross - %(amount)s AS amount_gap
+                                FROM loads l
+                                WHERE l.status != 'paid' AND l.amount_gross >= %(amount)s
+                                ORDER BY l.amount_gross ASC
+                                LIMIT %(limit)s
+                            )
+                            UNION ALL
+                            (
+                                SELECT %(amount)s - l.amount_gross AS amount_gap
+                                FROM loads l
+                                WHERE l.status != 'paid' AND l.amount_gross < %(amount)s
+                                ORDER BY l.amount_gross DESC
+                                LIMIT %(limit)s
+                            )
+                        ) nearest
+                        ORDER BY amount_gap ASC
+                        LIMIT %(limit)s
+                    ) top_k
+                    """,
+                    params,
+                )
+                bound = cursor.fetchone()
+                if not bound or not bound["found"]:
+                    return []
+                max_gap = bound["max_gap"]
+                cursor.execute(
+                    """
+                    SELECT
+                        l.external_id,
+                        l.load_date,
+                        l.amount_gross,
+                        ABS(l.amount_gross - %(amount)s) AS amount_gap,
+                        ABS(l.load_date - %(txn_date)s) AS day_gap
+                    FROM loads l
+                    WHERE l.status != 'paid'
+                      AND l.amount_gross BETWEEN %(low)s AND %(high)s
+                    ORDER BY amount_gap ASC, day_gap ASC
+                    LIMIT %(limit)s
+                    """,
+                    {**params, "low": amount - max_gap, "high": amount + max_gap},
+                )
+                rows = cursor.fetchall()
         return rows
 
     def get_open_loads_aggregate(self, owner_external_id: str | None, driver_external_id: str | None):
-        connection = get_connection()
-        where_clause = "WHERE l.status != 'paid'"
-        params: list[str] = []
         if owner_external_id:
-            where_clause += " AND t.owner_id = (SELECT id FROM owners WHERE external_id = %s)"
-            params.append(owner_external_id)
+            scope, scope_key = "owner", "(SELECT id::text FROM owners WHERE external_id = %s)"
+            params: list[str] = [owner_external_id]
         elif driver_external_id:
-            where_clause += " AND l.driver_id = (SELECT id FROM drivers WHERE external_id = %s)"
-            params.append(driver_external_id)
-        with connection.cursor() as cursor:
-            cursor.execute(
-                f"""
-                SELECT
-                    COUNT(*) AS open_count,
-                    SUM(l.amount_gross) AS gross_total,
-                    SUM(l.amount_gross * (l.slv_fee_percent / 100.0)) AS slv_fee_total,
-                    SUM(l.amount_gross * (l.recife_fee_percent / 100.0)) AS recife_fee_total
-                FROM loads l
-                LEFT JOIN trucks t ON t.id = l.truck_id
-                {where_clause}
-                """,
-                params,
-            )
-            row = cursor.fetchone()
-        connection.close()
+            scope, scope_key = "driver", "(SELECT id::text FROM drivers WHERE external_id = %s)"
+            params = [driver_external_id]
+        else:
+            scope, scope_key, params = "all", "''", []
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT
+                        COALESCE(ft.open_load_count, 0) AS open_count,
+                        ft.open_gross_total AS gross_total,
+                        ft.open_slv_fee_total AS slv_fee_total,
+                        ft.open_recife_fee_total AS recife_fee_total
+                    FROM (VALUES (1)) AS one
+                    LEFT JOIN financial_totals_current ft ON ft.scope = '{scope}' AND ft.scope_key = {scope_key}
+                    """,
+                    params,
+                )
+                row = cursor.fetchone()
         return row
+
+    def diff_financial_totals(self) -> list[dict]:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT
+                        COALESCE(stored.scope, live.scope) AS scope,
+                        COALESCE(stored.scope_key, live.scope_key) AS scope_key,
+                        to_jsonb(stored) - 'scope' - 'scope_key' AS stored,
+                        to_jsonb(live) - 'scope' - 'scope_key' AS live
+                    FROM financial_totals_current stored
+                    FULL JOIN financial_totals_live live
+                      ON live.scope = stored.scope AND live.scope_key = stored.scope_key
+                    WHERE (
+                        COALESCE(stored.credit_total, 0), COALESCE(stored.debit_total, 0),
+                        COALESCE(stored.transaction_count, 0), COALESCE(stored.expense_total, 0),
+                        COALESCE(stored.open_load_count, 0), COALESCE(stored.open_gross_total, 0),
+                        COALESCE(stored.open_slv_fee_total, 0), COALESCE(stored.open_recife_fee_total, 0)
+                    ) IS DISTINCT FROM (
+                        COALESCE(live.credit_total, 0), COALESCE(live.debit_total, 0),
+                        COALESCE(live.transaction_count, 0), COALESCE(live.expense_total, 0),
+                        COALESCE(live.open_load_count, 0), COALESCE(live.open_gross_total, 0),
+                        COALESCE(live.open_slv_fee_total, 0), COALESCE(live.open_recife_fee_total, 0)
+                    )
+                    ORDER BY 1, 2
+                    """
+                )
+                rows = cursor.fetchall()
+        return rows
+
+    def fold_financial_totals(self) -> int:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT fold_financial_totals() AS folded")
+                folded = cursor.fetchone()["folded"]
+            connection.commit()
+        return folded
+
+    def rebuild_financial_totals(self) -> None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT rebuild_financial_totals()")
+            connection.commit()
@@ -0,0 +1,19 @@
+from collections.abc import Iterable
+
+from app.db import get_connection
+
+IMPORT_TABLES = {"owners", "drivers", "trucks", "bank_accounts", "loads", "bank_transactions"}
+
+
+class ImportRepository:
+    def existing_external_ids(self, table: str, external_ids: Iterable[str]) -> set[str]:
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"Tabela de importação inválida: {table}")
+        wanted = list(external_ids)
+        if not wanted:
+            return set()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT external_id FROM {table} WHERE external_id = ANY(%s)", (wanted,))
+                rows = cursor.fetchall()
+        return {row["external_id"] for row in rows}
@@ -0,0 +1,181 @@
+from psycopg2.extras import Json
+
+from app.db import get_connection
+
+_JOB_COLUMNS = """
+    id, kind, args, status, attempts, max_attempts, progress, total, result, error,
+    chat_id, message_id, worker, run_after, created_at, started_at, finished_at, duration_ms
+"""
+
+# A worker only writes to its own attempt: once requeue_stale hands the job to someone else,
+# the old worker's progress, result or failure must not land on the new run.
+_OWNED = "id = %s AND worker = %s AND attempts = %s AND status = 'running'"
+
+
+class JobRepository:
+    def enqueue(
+        self,
+        kind: str,
+        args: dict,
+        chat_id: str | None,
+        message_id: int | None,
+        max_attempts: int,
+    ) -> int:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO jobs (kind, args, chat_id, message_id, max_attempts)
+                    VALUES (%s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (kind, Json(args), chat_id, message_id, max_attempts),
+                )
+                job_id = cursor.fetchone()["id"]
+            connection.commit()
+        return job_id
+
+    def claim_next(self, worker: str) -> dict | None:
+        # SKIP LOCKED: concurrent workers each take a different queued row instead of
+        # waiting on the one another worker is claiming.
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE jobs SET
+                        status = 'running',
+                        attempts = attempts + 1,
+                        worker = %s,
+                        progress = 0,
+                        started_at = CURRENT_TIMESTAMP,
+                        heartbeat_at = CURRENT_TIMESTAMP,
+                        finished_at = NULL
+                    WHERE id = (
+                        SELECT id FROM jobs
+                        WHERE status = 'queued' AND run_after <= CURRENT_TIMESTAMP
+                        ORDER BY run_after, id
+                        LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING {_JOB_COLUMNS}
+                    """,
+                    (worker,),
+                )
+                row = cursor.fetchone()
+            connection.commit()
+        return dict(row) if row else None
+
+    def update_progress(
+        self, job_id: int, worker: str, attempts: int, progress: int | None = None, total: int | None = None
+    ) -> bool:
+        """Also the heartbeat. Returns False once the job is no longer this worker's attempt
+        (requeued as stale and claimed again, or finished)."""
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE jobs
+                    SET progress = COALESCE(%s, progress), total = COALESCE(%s, total), heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE {_OWNED}
+                    """,
+                    (progress, total, job_id, worker, attempts),
+                )
+                owned = cursor.rowcount == 1
+            connection.commit()
+        return owned
+
+    def lock_owned(self, job_id: int, worker: str, attempts: int, connection) -> bool:
+        """Runs inside the caller's transaction, right before it commits: locks the jobs row
+        so requeue_stale cannot take the job between this check and that commit."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                WHERE {_OWNED}
+                """,
+                (job_id, worker, attempts),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, attempts: int, result: dict, progress: int, duration_ms: int) -> bool:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE jobs SET
+                        status = 'succeeded',
+                        result = %s,
+                        progress = %s,
+                        error = NULL,
+                        heartbeat_at = NULL,
+                        finished_at = CURRENT_TIMESTAMP,
+                        duration_ms = %s
+                    WHERE {_OWNED}
+                    """,
+                    (Json(result), progress, duration_ms, job_id, worker, attempts),
+                )
+                owned = cursor.rowcount == 1
+            connection.commit()
+        return owned
+
+    def fail(
+        self, job_id: int, worker: str, attempts: int, error: str, duration_ms: int, retry_in: float | None
+    ) -> str | None:
+        """Requeues the job ``retry_in`` seconds ahead while attempts remain; returns the new
+        status, or None when the job is no longer this worker's attempt."""
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs SET
+                        status = CASE WHEN %(retry)s AND attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                        run_after = CURRENT_TIMESTAMP + make_interval(secs => %(retry_in)s),
+                        error = %(error)s,
+                        heartbeat_at = NULL,
+                        finished_at = CURRENT_TIMESTAMP,
+                        duration_ms = %(duration_ms)s
+                    WHERE id = %(job_id)s AND worker = %(worker)s AND attempts = %(attempts)s AND status = 'running'
+                    RETURNING status
+                    """,
+                    {
+                        "retry": retry_in is not None,
+                        "retry_in": retry_in or 0,
+                        "error": error,
+                        "duration_ms": duration_ms,
+                        "job_id": job_id,
+                        "worker": worker,
+                        "attempts": attempts,
+                    },
+                )
+                row = cursor.fetchone()
+            connection.commit()
+        return row["status"] if row else None
+
+    def requeue_stale(self, stale_seconds: float) -> list[dict]:
+        """Jobs whose worker stopped heartbeating (process killed mid-job) go back to the queue."""
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE jobs SET
+                        status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                        run_after = CURRENT_TIMESTAMP,
+                        error = 'Worker interrompido durante a execução.',
+                        heartbeat_at = NULL,
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE status = 'running'
+                      AND heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                    RETURNING id, status, args
+                    """,
+                    (stale_seconds,),
+                )
+                rows = cursor.fetchall()
+            connection.commit()
+        return [dict(row) for row in rows]
+
+    def get(self, job_id: int) -> dict | None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = %s", (job_id,))
+                row = cursor.fetchone()
+        return dict(row) if row else None
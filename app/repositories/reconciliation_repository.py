@@ -0,0 +1,165 @@
+from decimal import Decimal
+
+from psycopg2.extras import execute_values
+
+from app.db import get_connection
+from app.repositories.summary_cache import summary_cache
+
+
+class ConcurrentReconciliationError(RuntimeError):
+    pass
+
+
+class ReconciliationRepository:
+    def list_unreconciled_credits(self):
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT bt.id, bt.external_id, bt.txn_date, bt.amount
+                    FROM bank_transactions bt
+                    WHERE bt.transaction_type = 'credit'
+                      AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.bank_transaction_id = bt.id)
+                      AND NOT EXISTS (SELECT 1 FROM bank_reconciliations br WHERE br.bank_transaction_id = bt.id)
+                    """
+                )
+                rows = cursor.fetchall()
+        return rows
+
+    def list_open_loads(self):
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT l.id, l.external_id, l.load_date, l.amount_gross
+                    FROM loads l
+                    WHERE l.status != 'paid' AND l.load_date IS NOT NULL
+                    """
+                )
+                rows = cursor.fetchall()
+        return rows
+
+    def get_credit(self, bank_transaction_id: int | None = None, external_id: str | None = None):
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT bt.id, bt.external_id, bt.txn_date, bt.amount
+                    FROM bank_transactions bt
+                    WHERE bt.transaction_type = 'credit'
+                      AND (bt.id = %s OR bt.external_id = %s)
+                    """,
+                    (bank_transaction_id, external_id),
+                )
+                row = cursor.fetchone()
+        return row
+
+    def list_open_loads_between(self, date_from, date_to, max_amount: Decimal):
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    WITH window_loads AS (
+                        SELECT
+                            l.id,
+                            l.external_id,
+                            l.load_date,
+                            l.amount_gross,
+                            l.driver_id,
+                            l.truck_id,
+                            l.sheet_owner,
+                            COALESCE(l.slv_fee_percent, 0) AS slv_fee_percent,
+                            COALESCE(l.recife_fee_percent, 0) AS recife_fee_percent
+                        FROM loads l
+                        WHERE l.status != 'paid'
+                          AND l.load_date BETWEEN %s AND %s
+                          AND l.amount_gross <= %s
+                    )
+                    SELECT
+                        w.id,
+                        w.external_id,
+                        w.load_date,
+                        w.amount_gross,
+                        w.sheet_owner,
+                        d.external_id AS driver_external_id,
+                        t.external_id AS truck_external_id,
+                        (w.amount_gross * 100)::bigint AS gross_cents,
+                        ROUND(
+                            (
+                                w.amount_gross
+                                - ROUND(w.amount_gross * w.slv_fee_percent / 100, 2)
+                                - ROUND(w.amount_gross * w.recife_fee_percent / 100, 2)
+                            ) * 100
+                        )::bigint AS net_cents
+                    FROM window_loads w
+                    LEFT JOIN drivers d ON d.id = w.driver_id
+                    LEFT JOIN trucks t ON t.id = w.truck_id
+                    ORDER BY w.load_date DESC, w.id
+                    """,
+                    (date_from, date_to, max_amount),
+                )
+                rows = cursor.fetchall()
+        return rows
+
+    def apply_load_matches(self, matches: list[dict]) -> int:
+        if not matches:
+            return 0
+        transaction_ids = [match["bank_transaction_id"] for match in matches]
+        load_ids = [match["load_id"] for match in matches]
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE loads SET status = 'paid', updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ANY(%s) AND status != 'paid'
+                    RETURNING id
+                    """,
+                    (load_ids,),
+                )
+                if len(cursor.fetchall()) != len(load_ids):
+                    raise ConcurrentReconciliationError("Loads alterados durante a conciliação. Rode novamente.")
+                cursor.execute(
+                    """
+                    SELECT bt.id
+                    FROM bank_transactions bt
+                    WHERE bt.id = ANY(%s)
+                      AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.bank_transaction_id = bt.id)
+                      AND NOT EXISTS (SELECT 1 FROM bank_reconciliations br WHERE br.bank_transaction_id = bt.id)
+                    FOR UPDATE
+                    """,
+                    (transaction_ids,),
+                )
+                if len(cursor.fetchall()) != len(transaction_ids):
+                    raise ConcurrentReconciliationError("Transações conciliadas durante o processo. Rode novamente.")
+                payments = execute_values(
+                    cursor,
+                    """
+                    INSERT INTO payments (bank_transaction_id, total_amount)
+                    SELECT bt.id, bt.amount
+                    FROM (VALUES %s) AS v(bank_transaction_id)
+                    JOIN bank_transactions bt ON bt.id = v.bank_transaction_id
+                    RETURNING id, bank_transaction_id
+                    """,
+                    [(transaction_id,) for transaction_id in transaction_ids],
+                    page_size=len(transaction_ids),
+                    fetch=True,
+                )
+                payment_by_transaction = {row["bank_transaction_id"]: row["id"] for row in payments}
+                execute_values(
+                    cursor,
+                    "INSERT INTO payment_loads (payment_id, load_id) VALUES %s",
+                    [(payment_by_transaction[match["bank_transaction_id"]], match["load_id"]) for match in matches],
+                    page_size=len(matches),
+                )
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO bank_reconciliations (bank_transaction_id, reconciliation_type, notes)
+                    VALUES %s
+                    """,
+                    [(match["bank_transaction_id"], "loads", match["notes"]) for match in matches],
+                    page_size=len(matches),
+                )
+            connection.commit()
+        summary_cache.invalidate()
+        return len(matches)
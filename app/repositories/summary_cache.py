@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+import select
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from typing import Any
+
+import psycopg2
+
+from app.config import DB_PATH, SUMMARY_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_CHANNEL = "summary_cache"
+
+
+class InvalidationListener:
+    """LISTENs on a NOTIFY channel over a dedicated connection and calls ``on_change`` for
+    every notification. Started lazily, once per process (forked workers start their own);
+    reconnects after errors and calls ``on_change`` again on every (re)connect, since
+    notifications sent while it was down are lost."""
+
+    def __init__(
+        self,
+        channel: str,
+        on_change: Callable[[], None],
+        url: str | None = None,
+        retry_seconds: float = 5.0,
+    ) -> None:
+        self.channel = channel
+        self.on_change = on_change
+        self.url = url or DB_PATH
+        self.retry_seconds = retry_seconds
+        self.listening = False
+        self.notifications = 0
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> bool:
+        """Returns whether notifications are being received right now."""
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self.listening = False
+                self._thread = threading.Thread(target=self._run, name=f"listen-{self.channel}", daemon=True)
+                self._thread.start()
+        return self.listening
+
+    def _run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(self.url)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self.listening = True
+                self.on_change()
+                while True:
+                    select.select([connection], [], [], 60)
+                    connection.poll()
+                    if connection.notifies:
+                        self.notifications += len(connection.notifies)
+                        connection.notifies.clear()
+                        self.on_change()
+            except Exception as exc:
+                logger.warning("LISTEN %s interrompido: %s", self.channel, exc)
+            finally:
+                self.listening = False
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+            # Whatever was cached may have missed a notification.
+            self.on_change()
+            time.sleep(self.retry_seconds)
+
+
+class SummaryCache:
+    """Memoized aggregates (summary, dashboard stats) shared by the whole process.
+
+    Repositories call ``invalidate()`` after committing writes to bank_transactions,
+    expenses or loads. Concurrent misses for the same key share one computation
+    (single-flight). A computation that overlaps an invalidation still answers its
+    callers but is not stored, and callers arriving after the invalidation start a
+    fresh one. Writes made by other processes arrive through ``listener`` (NOTIFY from
+    the triggers in migration 0007); while it is not connected the cache is bypassed.
+    """
+
+    def __init__(self, ttl_seconds: float = SUMMARY_CACHE_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._values: dict[str, tuple[float, Any]] = {}
+        self._inflight: dict[str, Future] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+        self.listener: InvalidationListener | None = None
+
+    def _enabled(self) -> bool:
+        if self.ttl_seconds <= 0:
+            return False
+        return self.listener is None or self.listener.ensure_started()
+
+    def _begin(self, key: str) -> tuple[bool, Any, Future | None, int | None]:
+        """Returns (hit, value, future, generation); generation is None unless this caller leads."""
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._stats["hits"] += 1
+                return True, entry[1], None, None
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return False, None, future, None
+            self._stats["misses"] += 1
+            future = self._inflight[key] = Future()
+            return False, None, future, self._generation
+
+    def _fail(self, key: str, future: Future, exc: BaseException) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        future.set_exception(exc)
+
+    def _finish(self, key: str, future: Future, generation: int, value: Any) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if generation == self._generation:
+                self._values[key] = (time.monotonic() + self.ttl_seconds, value)
+        future.set_result(value)
+
+    def get(self, key: str, compute: Callable[[], Any]) -> Any:
+        if not self._enabled():
+            return compute()
+        hit, value, future, generation = self._begin(key)
+        if hit:
+            return value
+        if generation is None:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as exc:
+            self._fail(key, future, exc)
+            raise
+        self._finish(key, future, generation, value)
+        return value
+
+    async def aget(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Same as ``get`` for the async routes; shares entries and in-flight computations."""
+        if not self._enabled():
+            return await compute()
+        hit, value, future, generation = self._begin(key)
+        if hit:
+            return value
+        if generation is None:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await compute()
+        except BaseException as exc:
+            self._fail(key, future, exc)
+            raise
+        self._finish(key, future, generation, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._values.clear()
+            self._inflight.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            stats = {**self._stats, "cached": len(self._values)}
+        if self.listener is not None:
+            stats["listening"] = int(self.listener.listening)
+            stats["notifications"] = self.listener.notifications
+        return stats
+
+
+summary_cache = SummaryCache()
+summary_cache.listener = InvalidationListener(SUMMARY_CACHE_CHANNEL, summary_cache.invalidate)
@@ -1,83 +1,184 @@
-from app.db import get_connection
+from psycopg2.extras import Json, execute_values
+
+from app.db import asyncpg_query, get_async_connection, get_connection
+
+_CLAIM_UPDATE_SQL = """
+    INSERT INTO processed_updates (update_id)
+    VALUES (%s)
+    ON CONFLICT (update_id) DO NOTHING
+    RETURNING update_id
+"""
+_RELEASE_UPDATE_SQL = "DELETE FROM processed_updates WHERE update_id = %s"
+_PURGE_UPDATES_SQL = (
+    "DELETE FROM processed_updates WHERE processed_at < CURRENT_TIMESTAMP - make_interval(hours => %s)"
+)
+_LIST_SUBSCRIBERS_SQL = "SELECT chat_id FROM summary_subscriptions"
+_DELETE_SUBSCRIPTIONS_SQL = "DELETE FROM summary_subscriptions WHERE chat_id = ANY(%s)"
 
 
 class TelegramRepository:
     def upsert_authorized_user(self, chat_id: str, username: str | None, role: str = "operator") -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO authorized_telegram_users (chat_id, username, role)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (chat_id) DO UPDATE SET username=excluded.username, role=excluded.role
-                """,
-                (chat_id, username, role),
-            )
-        connection.commit()
-        connection.close()
-
-    def get_role(self, chat_id: str) -> str | None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT role FROM authorized_telegram_users WHERE chat_id = %s", (chat_id,))
-            row = cursor.fetchone()
-        connection.close()
-        return row["role"] if row else None
-
-    def is_authorized(self, chat_id: str) -> bool:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1 FROM authorized_telegram_users WHERE chat_id = %s", (chat_id,))
-            row = cursor.fetchone()
-        connection.close()
-        return bool(row)
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO authorized_telegram_users (chat_id, username, role)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (chat_id) DO UPDATE SET username=excluded.username, role=excluded.role
+                    """,
+                    (chat_id, username, role),
+                )
+            connection.commit()
+
+    def get_authorized_user(self, chat_id: str) -> dict | None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT chat_id, username, role FROM authorized_telegram_users WHERE chat_id = %s",
+                    (chat_id,),
+                )
+                row = cursor.fetchone()
+        return dict(row) if row else None
 
     def delete_subscription(self, chat_id: str) -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("DELETE FROM summary_subscriptions WHERE chat_id = %s", (chat_id,))
-        connection.commit()
-        connection.close()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM summary_subscriptions WHERE chat_id = %s", (chat_id,))
+            connection.commit()
+
+    def delete_subscriptions(self, chat_ids: list[str]) -> int:
+        if not chat_ids:
+            return 0
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(_DELETE_SUBSCRIPTIONS_SQL, (chat_ids,))
+                deleted = cursor.rowcount
+            connection.commit()
+        return deleted
 
     def upsert_summary_subscription(self, chat_id: str) -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO summary_subscriptions (chat_id)
-                VALUES (%s)
-                ON CONFLICT (chat_id) DO NOTHING
-                """,
-                (chat_id,),
-            )
-        connection.commit()
-        connection.close()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO summary_subscriptions (chat_id)
+                    VALUES (%s)
+                    ON CONFLICT (chat_id) DO NOTHING
+                    """,
+                    (chat_id,),
+                )
+            connection.commit()
 
     def list_summary_subscribers(self) -> list[dict]:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT chat_id FROM summary_subscriptions")
-            rows = cursor.fetchall()
-        connection.close()
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(_LIST_SUBSCRIBERS_SQL)
+                rows = cursor.fetchall()
         return rows
 
-    def create_audit_log(
-        self,
-        chat_id: str,
-        username: str | None,
-        command: str,
-        payload: str,
-        status: str,
-        error: str | None,
-    ) -> None:
-        connection = get_connection()
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO audit_log (chat_id, username, command, payload, status, error_message)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (chat_id, username, command, payload, status, error),
-            )
-        connection.commit()
-        connection.close()
+    def save_pending_confirmation(self, chat_id: str, action: str, args: dict, ttl_seconds: int) -> None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM pending_confirmations WHERE expires_at < CURRENT_TIMESTAMP")
+                cursor.execute(
+                    """
+                    INSERT INTO pending_confirmations (chat_id, action, args, expires_at)
+                    VALUES (%s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+                    ON CONFLICT (chat_id) DO UPDATE SET
+                        action = excluded.action,
+                        args = excluded.args,
+                        created_at = CURRENT_TIMESTAMP,
+                        expires_at = excluded.expires_at
+                    """,
+                    (chat_id, action, Json(args), ttl_seconds),
+                )
+            connection.commit()
+
+    def claim_pending_confirmation(self, chat_id: str) -> dict | None:
+        # DELETE ... RETURNING makes the claim single-use even with several workers.
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM pending_confirmations
+                    WHERE chat_id = %s
+                    RETURNING action, args, expires_at >= CURRENT_TIMESTAMP AS valid
+                    """,
+                    (chat_id,),
+                )
+                row = cursor.fetchone()
+            connection.commit()
+        if not row or not row["valid"]:
+            return None
+        return {"action": row["action"], "args": row["args"]}
+
+    def delete_pending_confirmation(self, chat_id: str) -> None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM pending_confirmations WHERE chat_id = %s", (chat_id,))
+            connection.commit()
+
+    def claim_update(self, update_id: int) -> bool:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(_CLAIM_UPDATE_SQL, (update_id,))
+                claimed = cursor.fetchone() is not None
+            connection.commit()
+        return claimed
+
+    def purge_processed_updates(self, retention_hours: int) -> int:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(_PURGE_UPDATES_SQL, (retention_hours,))
+                deleted = cursor.rowcount
+            connection.commit()
+        return deleted
+
+    def create_audit_logs(self, entries: list[tuple]) -> None:
+        with get_connection() as connection:
+            with connection.cursor() as cursor:
+                execute_values(
+                    cursor,
+                    """
+                    INSERT INTO audit_log (chat_id, username, command, payload, status, error_message, created_at)
+                    VALUES %s
+                    """,
+                    entries,
+                    page_size=len(entries),
+                )
+            connection.commit()
+
+
+def _affected_rows(status: str) -> int:
+    # asyncpg returns the command tag, e.g. "DELETE 3".
+    return int(status.rsplit(" ", 1)[-1])
+
+
+class AsyncTelegramRepository:
+    """asyncpg versions of the queries run on the event loop (webhook route, summary loop)."""
+
+    async def claim_update(self, update_id: int) -> bool:
+        sql, args = asyncpg_query(_CLAIM_UPDATE_SQL, (update_id,))
+        async with get_async_connection() as connection:
+            return await connection.fetchval(sql, *args) is not None
+
+    async def release_update(self, update_id: int) -> None:
+        sql, args = asyncpg_query(_RELEASE_UPDATE_SQL, (update_id,))
+        async with get_async_connection() as connection:
+            await connection.execute(sql, *args)
+
+    async def purge_processed_updates(self, retention_hours: int) -> int:
+        sql, args = asyncpg_query(_PURGE_UPDATES_SQL, (retention_hours,))
+        async with get_async_connection() as connection:
+            return _affected_rows(await connection.execute(sql, *args))
+
+    async def list_summary_subscribers(self) -> list[dict]:
+        async with get_async_connection() as connection:
+            return [dict(row) for row in await connection.fetch(_LIST_SUBSCRIBERS_SQL)]
+
+    async def delete_subscriptions(self, chat_ids: list[str]) -> int:
+        if not chat_ids:
+            return 0
+        sql, args = asyncpg_query(_DELETE_SUBSCRIPTIONS_SQL, (chat_ids,))
+        async with get_async_connection() as connection:
+            return _affected_rows(await connection.execute(sql, *args))
@@ -1,11 +1,17 @@
 import asyncio
+import logging
 
 from fastapi import FastAPI
 
+from app.clients.telegram_client import close_async_telegram_client, close_telegram_client
 from app.config import SUMMARY_SCHEDULE_ENABLED, SUMMARY_SCHEDULE_INTERVAL_MINUTES
 from app.controllers.telegram_controller import router as telegram_router
-from app.controllers.telegram_controller import send_scheduled_summary
+from app.controllers.telegram_controller import send_scheduled_summary, start_dispatcher, stop_dispatcher
 from app.controllers.web_controller import router as web_router
+from app.db import close_async_pools, close_pools, get_async_pool, get_pool
+from app.jobs import start_job_workers, stop_job_workers
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 app.include_router(web_router)
@@ -14,15 +20,30 @@ app.include_router(telegram_router)
 
 @app.on_event("startup")
 async def startup_jobs() -> None:
+    await asyncio.to_thread(get_pool().warm_up)
+    await get_async_pool()
+    start_dispatcher()
+    start_job_workers()
     if not SUMMARY_SCHEDULE_ENABLED:
         return
 
     async def _summary_loop() -> None:
         while True:
             try:
-                send_scheduled_summary()
+                report = await send_scheduled_summary()
+                logger.info("Resumo agendado: %s", report)
             except Exception:
-                pass
+                logger.exception("Falha no resumo agendado")
             await asyncio.sleep(max(1, SUMMARY_SCHEDULE_INTERVAL_MINUTES) * 60)
 
     asyncio.create_task(_summary_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown_jobs() -> None:
+    await asyncio.to_thread(stop_dispatcher)
+    await asyncio.to_thread(stop_job_workers)
+    close_telegram_client()
+    await close_async_telegram_client()
+    close_pools()
+    await close_async_pools()
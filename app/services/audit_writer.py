@@ -0,0 +1,131 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any
+
+from app.config import AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_FLUSH_SIZE, AUDIT_MAX_BUFFER
+from app.repositories.telegram_repository import TelegramRepository
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriteError(RuntimeError):
+    pass
+
+
+class AuditLogWriter:
+    """Buffers audit_log rows and writes them in multi-row inserts.
+
+    A background thread flushes every ``flush_interval`` seconds or as soon as
+    ``flush_size`` rows are waiting. ``write(..., sync=True)`` flushes before returning,
+    for commands whose audit trail must not be lost, and raises AuditWriteError when the
+    insert fails. When the database is unavailable rows are kept up to ``max_buffer`` and
+    retried by the thread; beyond that new rows are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        repository: TelegramRepository | None = None,
+        flush_size: int = AUDIT_FLUSH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        max_buffer: int = AUDIT_MAX_BUFFER,
+    ) -> None:
+        self.repository = repository or TelegramRepository()
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = max(0.1, flush_interval)
+        self.max_buffer = max(self.flush_size, max_buffer)
+        self._buffer: list[tuple] = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._stats = {"written": 0, "flushed": 0, "batches": 0, "dropped": 0, "flush_errors": 0}
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(
+        self,
+        chat_id: str,
+        username: str | None,
+        command: str,
+        payload: str,
+        status: str,
+        error: str | None = None,
+        sync: bool = False,
+    ) -> None:
+        # Taken at write time since the row may be flushed later. Aware UTC is converted to the
+        # session time zone like the column's CURRENT_TIMESTAMP default.
+        entry = (chat_id, username, command, payload, status, error, datetime.now(timezone.utc))
+        with self._condition:
+            if len(self._buffer) >= self.max_buffer:
+                self._stats["dropped"] += 1
+                if sync:
+                    raise AuditWriteError("Fila de auditoria cheia; registro descartado.")
+                return
+            self._buffer.append(entry)
+            self._stats["written"] += 1
+            if not self._closed:
+                # Also for sync writes: rows put back after a failed flush are retried by the thread.
+                self._ensure_started()
+            if not sync:
+                if len(self._buffer) >= self.flush_size:
+                    self._condition.notify()
+                return
+        if self._flush() < 0:
+            raise AuditWriteError("Registro de auditoria não gravado; fica na fila para nova tentativa.")
+
+    def flush(self) -> int:
+        return max(0, self._flush())
+
+    def _flush(self) -> int:
+        """Returns rows written, or -1 when the insert failed and rows were put back."""
+        # One flush at a time keeps rows in insertion order.
+        with self._flush_lock:
+            with self._condition:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return 0
+            try:
+                self.repository.create_audit_logs(entries)
+            except Exception:
+                logger.exception("Falha ao gravar %s registros de auditoria", len(entries))
+                with self._condition:
+                    self._stats["flush_errors"] += 1
+                    keep = max(0, self.max_buffer - len(self._buffer))
+                    self._stats["dropped"] += len(entries) - min(keep, len(entries))
+                    self._buffer = entries[:keep] + self._buffer
+                return -1
+            with self._condition:
+                self._stats["flushed"] += len(entries)
+                self._stats["batches"] += 1
+            return len(entries)
+
+    def _run(self) -> None:
+        failed = False
+        while True:
+            with self._condition:
+                if not self._closed and (failed or len(self._buffer) < self.flush_size):
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            failed = self._flush() < 0
+            if closed:
+                return
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> dict[str, Any]:
+        with self._condition:
+            return {**self._stats, "buffered": len(self._buffer)}
@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Any
+
+from app.config import AUTH_CACHE_TTL_SECONDS
+
+
+class AuthorizationCache:
+    """chat_id -> authorized user row (or None when not authorized), kept for a TTL.
+
+    Unauthorized chats are cached too, so repeated messages from strangers do not hit
+    the database. Writes through TelegramService invalidate the entry right away; the
+    TTL bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_size: int = 10000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: dict[str, tuple[float, dict[str, Any] | None]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, chat_id: str) -> tuple[bool, dict[str, Any] | None]:
+        with self._lock:
+            entry = self._entries.get(chat_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._stats["misses"] += 1
+                return False, None
+            self._stats["hits"] += 1
+            return True, entry[1]
+
+    def set(self, chat_id: str, user: dict[str, Any] | None) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                now = time.monotonic()
+                self._entries = {key: value for key, value in self._entries.items() if value[0] >= now}
+                if len(self._entries) >= self.max_size:
+                    self._entries.clear()
+            self._entries[chat_id] = (time.monotonic() + self.ttl_seconds, user)
+
+    def invalidate(self, chat_id: str | None = None) -> None:
+        with self._lock:
+            if chat_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(chat_id, None)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
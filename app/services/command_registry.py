@@ -0,0 +1,134 @@
+import logging
+import math
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from app.config import COMMAND_METRICS_SAMPLES, COMMAND_SLOW_MS
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class CommandContext:
+    chat_id: str
+    username: str | None
+    command: str
+    payload: str
+    args: dict[str, str]
+    document: dict | None = None
+
+
+@dataclass
+class Confirmation:
+    """Returned by a handler to park the command's confirmation action until /confirm."""
+
+    args: dict[str, str]
+    prompt: str
+
+
+@dataclass
+class CommandSpec:
+    name: str
+    handler: Callable[..., Any]
+    required: tuple[str, ...] = ()
+    roles: frozenset[str] | None = None
+    public: bool = False
+    confirmation: str | None = None
+
+
+class CommandRegistry:
+    """Command name -> handler plus its validation, role and confirmation policy."""
+
+    def __init__(self) -> None:
+        self._specs: dict[str, CommandSpec] = {}
+
+    def command(
+        self,
+        *names: str,
+        required: Iterable[str] = (),
+        roles: Iterable[str] | None = None,
+        public: bool = False,
+        confirmation: str | None = None,
+    ) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def decorator(handler: Callable[..., Any]) -> Callable[..., Any]:
+            for name in names:
+                self.add(
+                    CommandSpec(
+                        name=name,
+                        handler=handler,
+                        required=tuple(required),
+                        roles=frozenset(roles) if roles is not None else None,
+                        public=public,
+                        confirmation=confirmation,
+                    )
+                )
+            return handler
+
+        return decorator
+
+    def add(self, spec: CommandSpec) -> None:
+        if spec.name in self._specs:
+            raise ValueError(f"Comando duplicado: {spec.name}")
+        self._specs[spec.name] = spec
+
+    def get(self, name: str) -> CommandSpec | None:
+        return self._specs.get(name)
+
+    def names(self) -> list[str]:
+        return sorted(self._specs)
+
+
+class CommandMetrics:
+    """Per-command call/error counters and a bounded window of latencies."""
+
+    def __init__(self, samples: int = COMMAND_METRICS_SAMPLES, slow_ms: float = COMMAND_SLOW_MS) -> None:
+        self.samples = max(1, samples)
+        self.slow_ms = slow_ms
+        self._commands: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, command: str, elapsed: float, failed: bool) -> None:
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            entry = self._commands.get(command)
+            if entry is None:
+                entry = self._commands[command] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "slow": 0,
+                    "max_ms": 0.0,
+                    "latencies": deque(maxlen=self.samples),
+                }
+            entry["calls"] += 1
+            entry["errors"] += int(failed)
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["latencies"].append(elapsed_ms)
+            slow = self.slow_ms > 0 and elapsed_ms >= self.slow_ms
+            if slow:
+                entry["slow"] += 1
+        if slow:
+            logger.warning("Comando lento: %s levou %.1f ms", command, elapsed_ms)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            entries = {command: {**entry, "latencies": list(entry["latencies"])} for command, entry in self._commands.items()}
+        result = {}
+        for command, entry in sorted(entries.items()):
+            latencies = sorted(entry.pop("latencies"))
+            result[command] = {
+                **entry,
+                "max_ms": round(entry["max_ms"], 1),
+                "p50_ms": round(percentile(latencies, 0.50), 1),
+                "p95_ms": round(percentile(latencies, 0.95), 1),
+            }
+        return result
@@ -0,0 +1,57 @@
+import threading
+import time
+from typing import Any
+
+from app.config import CONFIRMATION_BACKEND, CONFIRMATION_TTL_SECONDS
+from app.repositories.telegram_repository import TelegramRepository
+
+
+class MemoryConfirmationStore:
+    """In-process store: no database round trip, but only valid with a single worker."""
+
+    def __init__(self, ttl_seconds: int = CONFIRMATION_TTL_SECONDS) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[str, tuple[float, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, chat_id: str, action: str, args: dict[str, str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries = {key: value for key, value in self._entries.items() if value[0] >= now}
+            self._entries[chat_id] = (now + self.ttl_seconds, {"action": action, "args": args})
+
+    def claim(self, chat_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.pop(chat_id, None)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def discard(self, chat_id: str) -> None:
+        with self._lock:
+            self._entries.pop(chat_id, None)
+
+
+class PostgresConfirmationStore:
+    """Shared store in pending_confirmations, safe across workers and hosts."""
+
+    def __init__(self, repository: TelegramRepository | None = None, ttl_seconds: int = CONFIRMATION_TTL_SECONDS) -> None:
+        self.repository = repository or TelegramRepository()
+        self.ttl_seconds = ttl_seconds
+
+    def put(self, chat_id: str, action: str, args: dict[str, str]) -> None:
+        self.repository.save_pending_confirmation(chat_id, action, args, self.ttl_seconds)
+
+    def claim(self, chat_id: str) -> dict[str, Any] | None:
+        return self.repository.claim_pending_confirmation(chat_id)
+
+    def discard(self, chat_id: str) -> None:
+        self.repository.delete_pending_confirmation(chat_id)
+
+
+def build_confirmation_store(
+    repository: TelegramRepository | None = None,
+) -> MemoryConfirmationStore | PostgresConfirmationStore:
+    if CONFIRMATION_BACKEND == "memory":
+        return MemoryConfirmationStore()
+    return PostgresConfirmationStore(repository)
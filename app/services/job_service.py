@@ -0,0 +1,339 @@
+import csv
+import logging
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import psycopg2
+
+from app.clients.telegram_client import get_telegram_client
+from app.config import (
+    JOB_HEARTBEAT_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_PROGRESS_INTERVAL_SECONDS,
+    JOB_RETRY_BACKOFF_SECONDS,
+    JOB_STALE_SECONDS,
+    JOBS_DIR,
+)
+from app.finance import close_week
+from app.import_validation import check_csv_headers
+from app.importers import (
+    import_bank_accounts,
+    import_bank_transactions,
+    import_car_loads,
+    import_drivers,
+    import_expenses,
+    import_loads,
+    import_owners,
+    import_trucks,
+)
+from app.repositories.job_repository import JobRepository
+
+logger = logging.getLogger(__name__)
+
+# Bad input fails the same way on every attempt, so these are not retried.
+PERMANENT_ERRORS = (ValueError, LookupError, FileNotFoundError, csv.Error, psycopg2.DataError, psycopg2.IntegrityError)
+
+
+class JobLostError(RuntimeError):
+    """The job was requeued (stale heartbeat) and is no longer this worker's attempt."""
+
+    def __init__(self, job_id: int) -> None:
+        super().__init__(f"Job {job_id} foi devolvido à fila e pertence a outra execução.")
+
+
+def new_job_file(suffix: str = ".csv") -> Path:
+    """Path under JOBS_DIR for a file a job will read; the job deletes it once finished."""
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+    return JOBS_DIR / f"{uuid4().hex}{suffix}"
+
+
+def count_csv_rows(path: Path) -> int:
+    # Counts newlines instead of parsing: cells with embedded newlines make it an
+    # overestimate, which is fine for a progress total.
+    lines = 0
+    last = b"\n"
+    with path.open("rb") as csv_file:
+        while chunk := csv_file.read(1024 * 1024):
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(0, lines - 1)
+
+
+class JobProgress:
+    """Progress callback handed to the importers. Writes to the jobs row and edits the Telegram
+    message at most every JOB_PROGRESS_INTERVAL_SECONDS; a background thread refreshes the
+    heartbeat every JOB_HEARTBEAT_SECONDS even when no progress is reported (one long batch,
+    close_week). check_owner is the handlers' before_commit hook."""
+
+    def __init__(
+        self,
+        service: "JobService",
+        job: dict,
+        interval: float = JOB_PROGRESS_INTERVAL_SECONDS,
+        heartbeat: float = JOB_HEARTBEAT_SECONDS,
+    ) -> None:
+        self.service = service
+        self.job = job
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.rows = 0
+        self.total: int | None = None
+        self.lost = False
+        self._flushed_at = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self.heartbeat > 0:
+            self._thread = threading.Thread(
+                target=self._beat, name=f"job-{self.job['id']}-heartbeat", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.heartbeat):
+            try:
+                self._update()
+            except Exception as exc:
+                # A missed beat only matters after JOB_STALE_SECONDS; keep trying.
+                logger.warning("Heartbeat do job %s falhou: %s", self.job["id"], exc)
+            if self.lost:
+                return
+
+    def _update(self, progress: int | None = None, total: int | None = None) -> None:
+        owned = self.service.repository.update_progress(
+            self.job["id"], self.job["worker"], self.job["attempts"], progress, total
+        )
+        if not owned:
+            self.lost = True
+
+    def check_owner(self, connection) -> None:
+        if self.lost or not self.service.repository.lock_owned(
+            self.job["id"], self.job["worker"], self.job["attempts"], connection
+        ):
+            self.lost = True
+            raise JobLostError(self.job["id"])
+
+    def set_total(self, total: int) -> None:
+        self.total = total
+        self._flush()
+
+    def __call__(self, rows: int) -> None:
+        self.rows = rows
+        if self.lost:
+            raise JobLostError(self.job["id"])
+        if time.monotonic() - self._flushed_at >= self.interval:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        self._update(self.rows, self.total)
+        if self.lost:
+            return
+        total = f"/{self.total}" if self.total is not None else ""
+        self.service.notify(self.job, f"{job_label(self.job['kind'])} (job {self.job['id']}): {self.rows}{total} linhas...")
+
+
+JobHandler = Callable[[dict[str, Any], JobProgress], dict[str, Any]]
+CsvImporter = Callable[[Path, dict[str, Any], JobProgress], int]
+
+
+def _import_car_loads(path: Path, args: dict[str, Any], progress: JobProgress) -> int:
+    truck_id = args.get("truck_id")
+    if not truck_id:
+        raise ValueError("Informe truck_id para importação de carros.")
+    return import_car_loads(
+        path,
+        truck_external_id=truck_id,
+        sheet_owner=args.get("sheet_owner"),
+        progress=progress,
+        before_commit=progress.check_owner,
+    )
+
+
+CSV_IMPORT_JOBS: dict[str, CsvImporter] = {
+    "import_owners": lambda path, args, progress: import_owners(
+        path, progress=progress, before_commit=progress.check_owner
+    ),
+    "import_drivers": lambda path, args, progress: import_drivers(
+        path, progress=progress, before_commit=progress.check_owner
+    ),
+    "import_trucks": lambda path, args, progress: import_trucks(
+        path, progress=progress, before_commit=progress.check_owner
+    ),
+    "import_accounts": lambda path, args, progress: import_bank_accounts(
+        path, progress=progress, before_commit=progress.check_owner
+    ),
+    "import_loads": lambda path, args, progress: import_loads(
+        path, sheet_owner=args.get("sheet_owner"), progress=progress, before_commit=progress.check_owner
+    ),
+    "import_bank": lambda path, args, progress: import_bank_transactions(
+        path, sheet_owner=args.get("sheet_owner"), progress=progress, before_commit=progress.check_owner
+    ),
+    "import_expenses": lambda path, args, progress: import_expenses(
+        path, progress=progress, before_commit=progress.check_owner
+    ),
+    "import_car_loads": _import_car_loads,
+}
+
+
+def _csv_import_job(kind: str, importer: CsvImporter) -> JobHandler:
+    def run(args: dict[str, Any], progress: JobProgress) -> dict[str, Any]:
+        path = Path(args["path"])
+        check_csv_headers(kind, path)
+        progress.set_total(count_csv_rows(path))
+        return {"imported": importer(path, args, progress)}
+
+    return run
+
+
+def _close_week_job(args: dict[str, Any], progress: JobProgress) -> dict[str, Any]:
+    result = close_week(args["week_reference"], before_commit=progress.check_owner)
+    return {
+        "week_reference": args["week_reference"],
+        "loads": result["loads"],
+        "drivers": str(result["drivers"]),
+        "owners": str(result["owners"]),
+    }
+
+
+JOB_HANDLERS: dict[str, JobHandler] = {
+    **{kind: _csv_import_job(kind, importer) for kind, importer in CSV_IMPORT_JOBS.items()},
+    "close_week": _close_week_job,
+}
+
+
+def job_label(kind: str) -> str:
+    return "Fechamento" if kind == "close_week" else "Importação"
+
+
+def format_job_result(job: dict, result: dict[str, Any], duration_ms: int) -> str:
+    if job["kind"] == "close_week":
+        return (
+            "Fechamento concluído:\n"
+            f"Semana: {result['week_reference']}\n"
+            f"Loads: {result['loads']}\n"
+            f"Total motoristas: {result['drivers']}\n"
+            f"Total donos: {result['owners']}"
+        )
+    if job["kind"] in CSV_IMPORT_JOBS:
+        return f"Importação concluída ({result['imported']} registros) em {duration_ms / 1000:.1f}s. Job {job['id']}."
+    return f"Job {job['id']} concluído em {duration_ms / 1000:.1f}s."
+
+
+class JobService:
+    def __init__(
+        self,
+        repository: JobRepository | None = None,
+        handlers: dict[str, JobHandler] | None = None,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retry_backoff: float = JOB_RETRY_BACKOFF_SECONDS,
+    ) -> None:
+        self.repository = repository or JobRepository()
+        self.handlers = handlers if handlers is not None else JOB_HANDLERS
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+
+    def enqueue(self, kind: str, args: dict[str, Any], chat_id: str | None = None, message_id: int | None = None) -> int:
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        return self.repository.enqueue(kind, args, chat_id, message_id, self.max_attempts)
+
+    def get(self, job_id: int) -> dict | None:
+        job = self.repository.get(job_id)
+        if job is None:
+            return None
+        # The file path is local to the worker host; callers only need the options.
+        job["args"] = {key: value for key, value in job["args"].items() if key != "path"}
+        return job
+
+    def notify(self, job: dict, text: str) -> None:
+        chat_id = job.get("chat_id")
+        if not chat_id:
+            return
+        client = get_telegram_client()
+        try:
+            if job.get("message_id"):
+                client.edit_message(chat_id, job["message_id"], text)
+            else:
+                client.send_message(chat_id, text)
+        except Exception as exc:
+            # Progress is best effort; the jobs row stays the source of truth.
+            logger.warning("Aviso do job %s não enviado: %s", job["id"], exc)
+
+    @staticmethod
+    def _cleanup(args: dict[str, Any]) -> None:
+        if args.get("path"):
+            Path(args["path"]).unlink(missing_ok=True)
+
+    def run_next(self, worker: str) -> bool:
+        """Claims and runs one job; returns False when nothing is due."""
+        job = self.repository.claim_next(worker)
+        if job is None:
+            return False
+        started = time.perf_counter()
+        progress = JobProgress(self, job)
+        progress.start()
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise ValueError(f"Tipo de job desconhecido: {job['kind']}")
+            result = handler(job["args"], progress)
+        except JobLostError as exc:
+            # Nothing was committed; the new owner reruns it with the same file.
+            logger.warning("Job %s (%s) abandonado: %s", job["id"], job["kind"], exc)
+            return True
+        except Exception as exc:
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            retry_in = None
+            if not isinstance(exc, PERMANENT_ERRORS):
+                retry_in = self.retry_backoff * 2 ** (job["attempts"] - 1)
+            status = self.repository.fail(job["id"], job["worker"], job["attempts"], str(exc), duration_ms, retry_in)
+            if status is None:
+                logger.warning("Job %s (%s) falhou depois de voltar à fila: %s", job["id"], job["kind"], exc)
+            elif status == "queued":
+                logger.warning("Job %s (%s) falhou, nova tentativa em %ss: %s", job["id"], job["kind"], retry_in, exc)
+                self.notify(
+                    job,
+                    f"{job_label(job['kind'])} (job {job['id']}) falhou na tentativa {job['attempts']}/"
+                    f"{job['max_attempts']}: {exc}. Nova tentativa em {retry_in:.0f}s.",
+                )
+            else:
+                logger.warning(
+                    "Job %s (%s) falhou: %s", job["id"], job["kind"], exc, exc_info=not isinstance(exc, PERMANENT_ERRORS)
+                )
+                self._cleanup(job["args"])
+                self.notify(job, f"Erro no job {job['id']} ({job_label(job['kind']).lower()}): {exc}")
+            return True
+        finally:
+            progress.stop()
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        if not self.repository.complete(job["id"], job["worker"], job["attempts"], result, progress.rows, duration_ms):
+            # The handler's commit held the jobs row, so this only happens if the job went
+            # stale between that commit and now.
+            logger.warning("Job %s (%s) concluído, mas já pertence a outra execução.", job["id"], job["kind"])
+            return True
+        self._cleanup(job["args"])
+        logger.info("Job %s (%s) concluído em %s ms", job["id"], job["kind"], duration_ms)
+        self.notify(job, format_job_result(job, result, duration_ms))
+        return True
+
+    def requeue_stale(self, stale_seconds: float = JOB_STALE_SECONDS) -> int:
+        rows = self.repository.requeue_stale(stale_seconds)
+        for row in rows:
+            logger.warning("Job %s sem heartbeat há mais de %ss: %s", row["id"], stale_seconds, row["status"])
+            if row["status"] == "failed":
+                self._cleanup(row["args"])
+        return len(rows)
@@ -0,0 +1,124 @@
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any
+
+from app.config import FINANCIAL_TOTALS_FOLD_SECONDS, JOB_POLL_SECONDS, JOB_WORKERS
+from app.finance import fold_financial_totals
+from app.services.job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+STALE_CHECK_SECONDS = 60.0
+
+
+class JobWorkerPool:
+    """Worker threads draining the jobs table.
+
+    Each loop claims one due job (FOR UPDATE SKIP LOCKED), so pools in several processes
+    share the queue. An idle worker sleeps ``poll_seconds`` or until ``wake()`` is called
+    after a local enqueue. Between jobs the workers also requeue stale jobs and fold the
+    pending financial_totals deltas every ``fold_seconds`` (0 disables it).
+    """
+
+    def __init__(
+        self,
+        service: JobService,
+        workers: int = JOB_WORKERS,
+        poll_seconds: float = JOB_POLL_SECONDS,
+        fold_seconds: float = FINANCIAL_TOTALS_FOLD_SECONDS,
+    ) -> None:
+        self.service = service
+        self.workers = workers
+        self.poll_seconds = max(0.1, poll_seconds)
+        self.fold_seconds = fold_seconds
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        self._busy = 0
+        self._stale_checked_at = 0.0
+        self._folded_at = 0.0
+        self._stats = {"runs": 0, "errors": 0, "run_seconds_total": 0.0, "run_seconds_max": 0.0}
+
+    def start(self, workers: int | None = None) -> None:
+        count = self.workers if workers is None else workers
+        with self._condition:
+            if self._threads or count < 1:
+                return
+            self._stopping = False
+            prefix = f"{socket.gethostname()}:{os.getpid()}"
+            for index in range(count):
+                name = f"{prefix}:job-worker-{index}"
+                thread = threading.Thread(target=self._run, args=(name,), name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        # A running import is not interrupted; if it outlives the timeout the process exits
+        # under it and the job is requeued once its heartbeat goes stale.
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads = self._threads
+            self._threads = []
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def wake(self) -> None:
+        with self._condition:
+            self._condition.notify()
+
+    def _maintenance(self) -> None:
+        with self._condition:
+            now = time.monotonic()
+            requeue = now - self._stale_checked_at >= STALE_CHECK_SECONDS
+            fold = self.fold_seconds > 0 and now - self._folded_at >= self.fold_seconds
+            if requeue:
+                self._stale_checked_at = now
+            if fold:
+                self._folded_at = now
+        if requeue:
+            self.service.requeue_stale()
+        if fold:
+            fold_financial_totals()
+
+    def _run(self, name: str) -> None:
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                self._busy += 1
+            started = time.monotonic()
+            ran = False
+            failed = False
+            try:
+                self._maintenance()
+                ran = self.service.run_next(name)
+            except Exception:
+                failed = True
+                logger.exception("Falha no worker de jobs %s", name)
+            elapsed = time.monotonic() - started
+            with self._condition:
+                self._busy -= 1
+                if ran or failed:
+                    self._stats["errors" if failed else "runs"] += 1
+                    self._stats["run_seconds_total"] += elapsed
+                    self._stats["run_seconds_max"] = max(self._stats["run_seconds_max"], elapsed)
+                # A failure here is the database or the queue itself, so back off like an empty queue.
+                if not ran and not self._stopping:
+                    self._condition.wait(self.poll_seconds)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._condition:
+            finished = self._stats["runs"] + self._stats["errors"]
+            return {
+                "workers": len(self._threads),
+                "busy": self._busy,
+                "runs": self._stats["runs"],
+                "errors": self._stats["errors"],
+                "avg_run_ms": round(self._stats["run_seconds_total"] * 1000 / finished, 1) if finished else 0.0,
+                "max_run_ms": round(self._stats["run_seconds_max"] * 1000, 1),
+            }
@@ -0,0 +1,360 @@
+import math
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from app.config import (
+    AUTO_RECONCILE_EXACT_CELLS,
+    AUTO_RECONCILE_MIN_SCORE,
+    MULTI_MATCH_MAX_LOADS,
+    MULTI_MATCH_MAX_TOLERANCE,
+    MULTI_MATCH_TIME_BUDGET_MS,
+    MULTI_MATCH_TOLERANCE,
+    MULTI_MATCH_WINDOW_DAYS,
+)
+from app.money import from_cents, to_cents
+from app.repositories.reconciliation_repository import ReconciliationRepository
+
+FORBIDDEN_COST = 10**6
+MAX_SUBSET_STATES = 200_000
+MULTI_MATCH_GROUPS = (
+    ("driver", "driver_external_id"),
+    ("truck", "truck_external_id"),
+    ("sheet_owner", "sheet_owner"),
+)
+
+
+def reconciliation_score(amount_gap, day_gap: int) -> int:
+    return _score_cents(to_cents(amount_gap), int(day_gap))
+
+
+def _score_cents(gap_cents: int, day_gap: int) -> int:
+    # 100 - 2 points per unit of amount gap - 3 points per day, in integer cents.
+    return max(0, 100 - (2 * gap_cents + 300 * day_gap) // 100)
+
+
+def _hungarian(cost: list[list[int]]) -> list[int]:
+    """Minimum-cost assignment for an n x m matrix with n <= m (row -> column index)."""
+    rows = len(cost)
+    columns = len(cost[0])
+    infinity = float("inf")
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    owner = [0] * (columns + 1)
+    way = [0] * (columns + 1)
+    for row in range(1, rows + 1):
+        owner[0] = row
+        column = 0
+        min_values = [infinity] * (columns + 1)
+        used = [False] * (columns + 1)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            row_cost = cost[current_row - 1]
+            delta = infinity
+            next_column = 0
+            for candidate in range(1, columns + 1):
+                if used[candidate]:
+                    continue
+                reduced = row_cost[candidate - 1] - u[current_row] - v[candidate]
+                if reduced < min_values[candidate]:
+                    min_values[candidate] = reduced
+                    way[candidate] = column
+                if min_values[candidate] < delta:
+                    delta = min_values[candidate]
+                    next_column = candidate
+            for candidate in range(columns + 1):
+                if used[candidate]:
+                    u[owner[candidate]] += delta
+                    v[candidate] -= delta
+                else:
+                    min_values[candidate] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    assignment = [-1] * rows
+    for column in range(1, columns + 1):
+        if owner[column]:
+            assignment[owner[column] - 1] = column - 1
+    return assignment
+
+
+def _subset_sums(
+    amounts: list[int],
+    target: int,
+    tolerance: int,
+    max_items: int,
+    deadline: float,
+) -> tuple[list[tuple[int, list[int]]], bool]:
+    """Integer-cents subset sum: returns (total, item indexes) for every reachable total
+    within target +/- tolerance using 2..max_items items, and whether the deadline hit."""
+    upper = target + tolerance
+    # total -> (last item index, previous total, item count); the first path to a total is kept.
+    states: dict[int, tuple[int, int, int]] = {0: (-1, 0, 0)}
+    timed_out = False
+    for index, amount in enumerate(amounts):
+        if time.perf_counter() > deadline:
+            timed_out = True
+            break
+        if amount <= 0 or amount > upper:
+            continue
+        additions: dict[int, tuple[int, int, int]] = {}
+        for total, (_, _, count) in states.items():
+            new_total = total + amount
+            if count >= max_items or new_total > upper or new_total in states or new_total in additions:
+                continue
+            additions[new_total] = (index, total, count + 1)
+            if len(states) + len(additions) >= MAX_SUBSET_STATES:
+                break
+        states.update(additions)
+
+    # states is bounded by MAX_SUBSET_STATES; the tolerance window is not.
+    lower = max(1, target - tolerance)
+    found = []
+    for total, state in sorted(states.items()):
+        if total < lower or state[2] < 2:
+            continue
+        indexes = []
+        current = total
+        while current:
+            index, previous, _ = states[current]
+            indexes.append(index)
+            current = previous
+        found.append((total, sorted(indexes)))
+    return found, timed_out
+
+
+class ReconciliationService:
+    def __init__(self, repository: ReconciliationRepository | None = None) -> None:
+        self.repository = repository or ReconciliationRepository()
+
+    @staticmethod
+    def _candidate_edges(credits: list[dict], loads: list[dict], min_score: int) -> list[tuple[int, int, int, int, int]]:
+        # Only pairs with 2*gap_cents + 300*day_gap < budget can reach min_score, so loads are
+        # bucketed by date and each bucket is sorted by amount: a credit only visits the few
+        # dates in range and bisects the amount window inside each one.
+        budget = (101 - min_score) * 100
+        max_days = (budget - 1) // 300
+        buckets: dict = {}
+        for index, load in enumerate(loads):
+            buckets.setdefault(load["load_date"], []).append((to_cents(load["amount_gross"]), index))
+        sorted_buckets = {}
+        for load_date, items in buckets.items():
+            items.sort()
+            sorted_buckets[load_date] = ([amount for amount, _ in items], [index for _, index in items])
+
+        edges: list[tuple[int, int, int, int, int]] = []
+        for credit_index, credit in enumerate(credits):
+            amount = to_cents(credit["amount"])
+            for offset in range(-max_days, max_days + 1):
+                bucket = sorted_buckets.get(credit["txn_date"] + timedelta(days=offset))
+                if not bucket:
+                    continue
+                day_gap = abs(offset)
+                gap_limit = (budget - 1 - 300 * day_gap) // 2
+                amounts, indexes = bucket
+                start = bisect_left(amounts, amount - gap_limit)
+                end = bisect_right(amounts, amount + gap_limit)
+                for position in range(start, end):
+                    gap = abs(amounts[position] - amount)
+                    edges.append((credit_index, indexes[position], _score_cents(gap, day_gap), gap, day_gap))
+        return edges
+
+    @staticmethod
+    def _components(edges: list[tuple[int, int, int, int, int]], credit_count: int) -> list[list[tuple]]:
+        parent: dict[int, int] = {}
+
+        def find(node: int) -> int:
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for credit_index, load_index, *_ in edges:
+            left = find(credit_index)
+            right = find(credit_count + load_index)
+            if left != right:
+                parent[right] = left
+        grouped: dict[int, list[tuple]] = {}
+        for edge in edges:
+            grouped.setdefault(find(edge[0]), []).append(edge)
+        return list(grouped.values())
+
+    @staticmethod
+    def _greedy(edges: list[tuple]) -> list[tuple]:
+        chosen = []
+        used_credits: set[int] = set()
+        used_loads: set[int] = set()
+        for edge in sorted(edges, key=lambda item: (-item[2], item[3], item[4], item[0], item[1])):
+            if edge[0] in used_credits or edge[1] in used_loads:
+                continue
+            used_credits.add(edge[0])
+            used_loads.add(edge[1])
+            chosen.append(edge)
+        return chosen
+
+    @staticmethod
+    def _optimal(edges: list[tuple]) -> list[tuple]:
+        credit_nodes = sorted({edge[0] for edge in edges})
+        load_nodes = sorted({edge[1] for edge in edges})
+        transpose = len(credit_nodes) > len(load_nodes)
+        rows, columns = (load_nodes, credit_nodes) if transpose else (credit_nodes, load_nodes)
+        row_index = {node: index for index, node in enumerate(rows)}
+        column_index = {node: index for index, node in enumerate(columns)}
+        cost = [[FORBIDDEN_COST] * len(columns) for _ in rows]
+        by_pair: dict[tuple[int, int], tuple] = {}
+        for edge in edges:
+            row_node, column_node = (edge[1], edge[0]) if transpose else (edge[0], edge[1])
+            cost[row_index[row_node]][column_index[column_node]] = -edge[2]
+            by_pair[(row_node, column_node)] = edge
+        chosen = []
+        for row_position, column_position in enumerate(_hungarian(cost)):
+            if column_position < 0:
+                continue
+            edge = by_pair.get((rows[row_position], columns[column_position]))
+            if edge is not None:
+                chosen.append(edge)
+        return chosen
+
+    def auto_reconcile(self, min_score: int | None = None, dry_run: bool = True) -> dict:
+        started = time.perf_counter()
+        threshold = min(100, max(1, AUTO_RECONCILE_MIN_SCORE if min_score is None else min_score))
+        credits = self.repository.list_unreconciled_credits()
+        loads = self.repository.list_open_loads()
+        edges = self._candidate_edges(credits, loads, threshold)
+
+        chosen: list[tuple] = []
+        components = self._components(edges, len(credits))
+        greedy_components = 0
+        for component in components:
+            credit_count = len({edge[0] for edge in component})
+            load_count = len({edge[1] for edge in component})
+            if credit_count == 1 or load_count == 1:
+                chosen.extend(self._greedy(component))
+            elif credit_count * load_count <= AUTO_RECONCILE_EXACT_CELLS:
+                chosen.extend(self._optimal(component))
+            else:
+                greedy_components += 1
+                chosen.extend(self._greedy(component))
+
+        chosen.sort(key=lambda edge: (-edge[2], credits[edge[0]]["txn_date"], credits[edge[0]]["id"]))
+        matches = [
+            {
+                "bank_transaction_id": credits[credit_index]["id"],
+                "transaction_id": credits[credit_index]["external_id"],
+                "load_id": loads[load_index]["id"],
+                "load_external_id": loads[load_index]["external_id"],
+                "amount": credits[credit_index]["amount"],
+                "amount_gross": loads[load_index]["amount_gross"],
+                "amount_gap": from_cents(gap),
+                "day_gap": day_gap,
+                "score": score,
+                "notes": f"Conciliação automática (score {score})",
+            }
+            for credit_index, load_index, score, gap, day_gap in chosen
+        ]
+        applied = 0 if dry_run else self.repository.apply_load_matches(matches)
+        return {
+            "dry_run": dry_run,
+            "min_score": threshold,
+            "credits": len(credits),
+            "open_loads": len(loads),
+            "candidate_pairs": len(edges),
+            "components": len(components),
+            "greedy_components": greedy_components,
+            "matched": len(matches),
+            "applied": applied,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "matches": matches,
+        }
+
+    def find_multi_load_matches(
+        self,
+        bank_transaction_id: int | None = None,
+        transaction_external_id: str | None = None,
+        tolerance: float | None = None,
+        limit: int = 5,
+    ) -> dict:
+        started = time.perf_counter()
+        if tolerance is None:
+            tolerance = MULTI_MATCH_TOLERANCE
+        if not math.isfinite(tolerance) or tolerance < 0:
+            raise ValueError(f"Tolerância inválida: {tolerance}")
+        tolerance_cents = to_cents(min(tolerance, MULTI_MATCH_MAX_TOLERANCE))
+        txn = self.repository.get_credit(bank_transaction_id, transaction_external_id)
+        if not txn:
+            return {"transaction_id": None, "amount": None, "matches": [], "groups": 0, "timed_out": False}
+        target = to_cents(txn["amount"])
+        deadline = started + MULTI_MATCH_TIME_BUDGET_MS / 1000
+        loads = self.repository.list_open_loads_between(
+            txn["txn_date"] - timedelta(days=MULTI_MATCH_WINDOW_DAYS),
+            txn["txn_date"],
+            from_cents(target + tolerance_cents),
+        )
+
+        groups: dict[tuple[str, str], list[dict]] = {}
+        for load in loads:
+            for group, key in MULTI_MATCH_GROUPS:
+                if load[key]:
+                    groups.setdefault((group, load[key]), []).append(load)
+
+        best: dict[frozenset[int], dict] = {}
+        timed_out = False
+        # Smaller groups first, so a tight budget still covers most of them.
+        for (group, key), members in sorted(groups.items(), key=lambda item: len(item[1])):
+            if len(members) < 2:
+                continue
+            for basis in ("gross", "net"):
+                combos, timed_out = _subset_sums(
+                    [load[f"{basis}_cents"] for load in members],
+                    target,
+                    tolerance_cents,
+                    MULTI_MATCH_MAX_LOADS,
+                    deadline,
+                )
+                for total, indexes in combos:
+                    chosen = [members[index] for index in indexes]
+                    load_ids = frozenset(load["id"] for load in chosen)
+                    gap = abs(total - target)
+                    if load_ids in best and best[load_ids]["gap_cents"] <= gap:
+                        continue
+                    best[load_ids] = {
+                        "group": group,
+                        "group_id": key,
+                        "basis": basis,
+                        "total": from_cents(total),
+                        "amount_gap": from_cents(gap),
+                        "gap_cents": gap,
+                        "loads": [
+                            {
+                                "id": load["id"],
+                                "load_id": load["external_id"],
+                                "load_date": load["load_date"],
+                                "amount_gross": load["amount_gross"],
+                                "amount_net": from_cents(load["net_cents"]),
+                            }
+                            for load in chosen
+                        ],
+                    }
+                if timed_out:
+                    break
+            if timed_out:
+                break
+
+        matches = sorted(best.values(), key=lambda item: (item["gap_cents"], len(item["loads"]), item["basis"]))
+        for match in matches:
+            match.pop("gap_cents")
+        return {
+            "transaction_id": txn["external_id"],
+            "bank_transaction_id": txn["id"],
+            "amount": txn["amount"],
+            "matches": matches[:limit],
+            "groups": len(groups),
+            "timed_out": timed_out,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
@@ -1,5 +1,7 @@
-from app.finance import ensure_dispatcher_fee_expense
-from app.importers import parse_amount, parse_date
+from decimal import Decimal
+
+from app.finance import ensure_dispatcher_fee_expenses
+from app.importers import parse_amount, parse_date, parse_decimal
 from app.repositories.registration_repository import RegistrationRepository
 
 
@@ -52,13 +54,13 @@ class RegistrationService:
             parse_date(load_date) if load_date else None,
             description,
             parse_amount(amount_gross),
-            parse_amount(slv_fee_percent) if slv_fee_percent else 0.0,
-            parse_amount(recife_fee_percent) if recife_fee_percent else 10.0,
+            parse_decimal(slv_fee_percent) if slv_fee_percent else Decimal(0),
+            parse_decimal(recife_fee_percent) if recife_fee_percent else Decimal(10),
             status,
             week_reference,
             sheet_owner,
         )
-        ensure_dispatcher_fee_expense(external_id)
+        ensure_dispatcher_fee_expenses([external_id])
         return count
 
     def add_expense(
@@ -1,31 +1,41 @@
+import asyncio
+import logging
 import shlex
-import tempfile
+import time
 from pathlib import Path
-from uuid import uuid4
 from typing import Any
+from uuid import uuid4
 
-import requests
-
-from app.config import TELEGRAM_ADMIN_CHAT_IDS, TELEGRAM_TOKEN
+from app.clients.telegram_client import (
+    AsyncTelegramClient,
+    TelegramApiError,
+    get_async_telegram_client,
+    get_telegram_client,
+)
+from app.config import AUDIT_MODE, AUDIT_SYNC_COMMANDS, SUMMARY_SEND_CONCURRENCY, TELEGRAM_ADMIN_CHAT_IDS
 from app.finance import (
+    auto_reconcile,
     build_summary,
-    close_week,
+    find_multi_load_matches,
     get_ledger,
     get_open_loads_summary,
     get_payables_receivables,
     suggest_reconciliation_candidates,
 )
-from app.importers import (
-    import_bank_accounts,
-    import_bank_transactions,
-    import_car_loads,
-    import_drivers,
-    import_expenses,
-    import_loads,
-    import_owners,
-    import_trucks,
+from app.import_validation import IMPORT_SPECS, check_csv_headers, dry_run_import, format_dry_run
+from app.jobs import enqueue_job, job_file
+from app.repositories.telegram_repository import AsyncTelegramRepository, TelegramRepository
+from app.services.audit_writer import AuditLogWriter, AuditWriteError
+from app.services.auth_cache import AuthorizationCache
+from app.services.command_registry import (
+    CommandContext,
+    CommandMetrics,
+    CommandRegistry,
+    Confirmation,
+    percentile,
 )
-from app.repositories.telegram_repository import TelegramRepository
+from app.services.confirmation_store import build_confirmation_store
+from app.services.update_dedup import UpdateDeduplicator
 from app.registrations import (
     add_bank_account,
     add_bank_transaction,
@@ -36,55 +46,33 @@ from app.registrations import (
     add_truck,
 )
 
+logger = logging.getLogger(__name__)
+
+
+CSV_IMPORT_COMMANDS = [f"/{kind}" for kind in IMPORT_SPECS]
+
+commands = CommandRegistry()
+
 
 class TelegramService:
-    def __init__(self, repository: TelegramRepository | None = None) -> None:
+    def __init__(
+        self,
+        repository: TelegramRepository | None = None,
+        async_repository: AsyncTelegramRepository | None = None,
+    ) -> None:
         self.repository = repository or TelegramRepository()
-        self.pending_confirmations: dict[str, dict[str, Any]] = {}
+        self.async_repository = async_repository or AsyncTelegramRepository()
+        self.auth_cache = AuthorizationCache()
+        self.audit_writer = AuditLogWriter(self.repository)
+        self.confirmations = build_confirmation_store(self.repository)
+        self.deduplicator = UpdateDeduplicator(self.repository, async_repository=self.async_repository)
+        self.command_metrics = CommandMetrics()
 
-    @staticmethod
-    def _csv_required_headers() -> dict[str, set[str]]:
-        return {
-            "/import_owners": {"owner_id", "name"},
-            "/import_drivers": {"driver_id", "name"},
-            "/import_trucks": {"truck_id", "owner_id"},
-            "/import_accounts": {"account_id", "label"},
-            "/import_loads": {"load_id", "amount_gross"},
-            "/import_bank": {"transaction_id", "txn_date", "amount"},
-            "/import_expenses": {"expense_date", "amount"},
-            "/import_car_loads": {"Order ID", "RATE"},
-        }
+    def send_bot_message(self, chat_id: str, text: str) -> dict:
+        return get_telegram_client().send_message(chat_id, text)
 
-    @staticmethod
-    def send_message(token: str, chat_id: str, text: str) -> None:
-        url = f"https://api.telegram.org/bot{token}/sendMessage"
-        response = requests.post(url, json={"chat_id": chat_id, "text": text}, timeout=10)
-        response.raise_for_status()
-
-    def send_bot_message(self, chat_id: str, text: str) -> None:
-        if not TELEGRAM_TOKEN:
-            raise RuntimeError("BOT_TELEGRAM_TOKEN não configurado.")
-        self.send_message(TELEGRAM_TOKEN, chat_id, text)
-
-    def _fetch_file(self, file_id: str) -> bytes:
-        if not TELEGRAM_TOKEN:
-            raise RuntimeError("BOT_TELEGRAM_TOKEN não configurado.")
-        info_response = requests.get(
-            f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getFile",
-            params={"file_id": file_id},
-            timeout=10,
-        )
-        info_response.raise_for_status()
-        payload = info_response.json()
-        file_path = payload.get("result", {}).get("file_path")
-        if not file_path:
-            raise RuntimeError("Arquivo não encontrado no Telegram.")
-        file_response = requests.get(
-            f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{file_path}",
-            timeout=10,
-        )
-        file_response.raise_for_status()
-        return file_response.content
+    def _download_file(self, file_id: str, destination: Path) -> None:
+        get_telegram_client().download_file(file_id, destination)
 
     @staticmethod
     def _parse_kv_args(text: str) -> dict[str, str]:
@@ -112,10 +100,12 @@ class TelegramService:
             "/ledger owner_id=OWNER_01 limit=10\n"
             "/open_loads owner_id=OWNER_01\n"
             "/balance owner_id=OWNER_01\n"
-            "/suggest_reconcile transaction_id=TXN_01\n"
+            "/suggest_reconcile transaction_id=TXN_01 tolerance=1.00\n"
+            "/auto_reconcile min_score=90 apply=0|1\n"
             "/subscribe_summary\n"
             "/unsubscribe_summary\n"
             "/authorize chat_id=123 role=operator (apenas admin)\n"
+            "/stats (apenas admin)\n"
             "Confirmações: /confirm e /cancel\n"
             "Importação via CSV (envie o arquivo com a legenda): /import_*"
         )
@@ -131,16 +121,31 @@ class TelegramService:
 
     def _upsert_authorized_user(self, chat_id: str, username: str | None, role: str = "operator") -> None:
         self.repository.upsert_authorized_user(chat_id, username, role)
+        self.auth_cache.set(chat_id, {"chat_id": chat_id, "username": username, "role": role})
+
+    def _authorized_user(self, chat_id: str) -> dict | None:
+        found, user = self.auth_cache.get(chat_id)
+        if not found:
+            user = self.repository.get_authorized_user(chat_id)
+            self.auth_cache.set(chat_id, user)
+        return user
+
+    def _ensure_admin(self, chat_id: str, username: str | None) -> None:
+        user = self._authorized_user(chat_id)
+        if user and user["role"] == "admin" and user["username"] == username:
+            return
+        self._upsert_authorized_user(chat_id, username, role="admin")
 
     def _is_authorized(self, chat_id: str) -> bool:
         if chat_id in TELEGRAM_ADMIN_CHAT_IDS:
             return True
-        return self.repository.is_authorized(chat_id)
+        return self._authorized_user(chat_id) is not None
 
     def _role_for(self, chat_id: str) -> str | None:
         if chat_id in TELEGRAM_ADMIN_CHAT_IDS:
             return "admin"
-        return self.repository.get_role(chat_id)
+        user = self._authorized_user(chat_id)
+        return user["role"] if user else None
 
     def _audit(
         self,
@@ -151,25 +156,30 @@ class TelegramService:
         status: str,
         error: str | None = None,
     ) -> None:
-        self.repository.create_audit_log(chat_id, username, command, payload, status, error)
+        self.audit_writer.write(chat_id, username, command, payload, status, error, sync=self._audit_is_sync(command))
 
-    def _validate_csv_headers(self, command: str, file_bytes: bytes) -> None:
-        required = self._csv_required_headers().get(command)
-        if not required:
-            return
-        first_line = file_bytes.decode("utf-8-sig", errors="ignore").splitlines()[0] if file_bytes else ""
-        headers = {item.strip() for item in first_line.split(",") if item.strip()}
-        missing = required - headers
-        if missing:
-            raise ValueError(f"CSV inválido para {command}. Faltando colunas: {', '.join(sorted(missing))}")
+    @staticmethod
+    def _audit_is_sync(command: str) -> bool:
+        return AUDIT_MODE == "sync" or command in AUDIT_SYNC_COMMANDS
+
+    def _audit_outcome(self, chat_id: str, username: str | None, command: str, payload: str, status: str) -> None:
+        # The action already ran (and committed); an audit failure here must not be reported
+        # as a failed command, or the user retries something that is not idempotent.
+        try:
+            self._audit(chat_id, username, command, payload, status)
+        except AuditWriteError as exc:
+            logger.error("Auditoria de %s (%s) não gravada: %s", command, status, exc)
+            self.send_bot_message(
+                chat_id, f"{command} foi executado, mas o registro de auditoria falhou: {exc} Não repita o comando."
+            )
 
     def _queue_confirmation(self, chat_id: str, action: str, args: dict[str, str]) -> None:
-        self.pending_confirmations[chat_id] = {"action": action, "args": args}
+        self.confirmations.put(chat_id, action, args)
 
     def _execute_confirmed(self, chat_id: str) -> str:
-        pending = self.pending_confirmations.get(chat_id)
+        pending = self.confirmations.claim(chat_id)
         if not pending:
-            return "Não existe ação pendente."
+            return "Não existe ação pendente (ou ela expirou)."
         action = pending["action"]
         args = pending["args"]
         if action == "add_load":
@@ -186,40 +196,93 @@ class TelegramService:
                 args.get("week_reference"),
                 args.get("sheet_owner"),
             )
-            self.pending_confirmations.pop(chat_id, None)
             return "Load cadastrado com sucesso."
         if action == "close_week":
-            result = close_week(args["week_reference"])
-            self.pending_confirmations.pop(chat_id, None)
+            job_id = enqueue_job("close_week", {"week_reference": args["week_reference"]}, chat_id=chat_id)
+            return f"Fechamento da semana {args['week_reference']} na fila (job {job_id}). Aviso aqui quando terminar."
+        if action == "auto_reconcile":
+            result = auto_reconcile(min_score=int(args["min_score"]), dry_run=False)
             return (
-                "Fechamento concluído:\n"
-                f"Semana: {args['week_reference']}\n"
-                f"Loads: {result['loads']}\n"
-                f"Total motoristas: {result['drivers']}\n"
-                f"Total donos: {result['owners']}"
+                "Conciliação automática concluída:\n"
+                f"Score mínimo: {result['min_score']}\n"
+                f"Conciliadas: {result['applied']}"
             )
         return "Ação pendente inválida."
 
-    def send_scheduled_summary(self) -> int:
-        viewers = self.repository.list_summary_subscribers()
-        if not viewers:
-            return 0
-        summary = build_summary()
-        text = (
-            "Resumo automático:\n"
+    @staticmethod
+    def _format_auto_reconcile(result: dict, limit: int = 20) -> str:
+        lines = [
+            f"TXN {item['transaction_id']} -> Load {item['load_external_id']} | score {item['score']} "
+            f"| gap {item['amount_gap']} | day_gap {item['day_gap']}"
+            for item in result["matches"][:limit]
+        ]
+        extra = len(result["matches"]) - limit
+        if extra > 0:
+            lines.append(f"... +{extra}")
+        return (
+            "Conciliação automática (simulação):\n"
+            f"Score mínimo: {result['min_score']}\n"
+            f"Créditos pendentes: {result['credits']}\n"
+            f"Loads em aberto: {result['open_loads']}\n"
+            f"Pares: {result['matched']}\n"
+            + "\n".join(lines)
+        )
+
+    @staticmethod
+    def _format_summary(summary: dict, title: str) -> str:
+        return (
+            f"{title}:\n"
             f"Créditos: {summary['total_credit']}\n"
             f"Débitos: {summary['total_debit']}\n"
             f"Despesas: {summary['total_expenses']}\n"
             f"Saldo estimado: {summary['balance']}\n"
             f"Loads pendentes: {summary['pending_loads']}"
         )
-        sent = 0
-        for row in viewers:
-            self.send_bot_message(str(row["chat_id"]), text)
-            sent += 1
-        return sent
 
-    def handle_update(self, update: dict) -> None:
+    async def send_scheduled_summary(self, client: AsyncTelegramClient | None = None) -> dict[str, Any]:
+        started = time.perf_counter()
+        viewers = await self.async_repository.list_summary_subscribers()
+        report: dict[str, Any] = {"subscribers": len(viewers), "sent": 0, "failed": 0, "pruned": 0}
+        if not viewers:
+            return report
+        # Computed once per tick, then fanned out to every subscriber.
+        text = self._format_summary(await asyncio.to_thread(build_summary), "Resumo automático")
+        client = client or get_async_telegram_client()
+        semaphore = asyncio.Semaphore(max(1, SUMMARY_SEND_CONCURRENCY))
+        latencies: list[float] = []
+        unreachable: list[str] = []
+
+        async def _send(chat_id: str) -> None:
+            async with semaphore:
+                send_started = time.perf_counter()
+                try:
+                    await client.send_message(chat_id, text)
+                except TelegramApiError as exc:
+                    if exc.chat_unreachable:
+                        unreachable.append(chat_id)
+                    else:
+                        report["failed"] += 1
+                        logger.warning("Resumo não enviado para %s: %s", chat_id, exc)
+                    return
+                except Exception:
+                    report["failed"] += 1
+                    logger.exception("Resumo não enviado para %s", chat_id)
+                    return
+                latencies.append(time.perf_counter() - send_started)
+                report["sent"] += 1
+
+        await asyncio.gather(*(_send(str(row["chat_id"])) for row in viewers))
+        if unreachable:
+            report["pruned"] = await self.async_repository.delete_subscriptions(unreachable)
+        latencies.sort()
+        report["latency_ms_avg"] = round(sum(latencies) * 1000 / len(latencies), 1) if latencies else 0.0
+        report["latency_ms_p95"] = round(percentile(latencies, 0.95) * 1000, 1)
+        report["latency_ms_max"] = round(latencies[-1] * 1000, 1) if latencies else 0.0
+        report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        return report
+
+    def handle_update(self, update: dict, claimed: bool = False) -> None:
+        """``claimed=True`` when the webhook already claimed the update_id (``deduplicator.aclaim``)."""
         message = update.get("message") or update.get("edited_message")
         if not message:
             return
@@ -231,313 +294,288 @@ class TelegramService:
         username = message.get("from", {}).get("username")
         if not chat_id:
             return
+        if not claimed and not self.deduplicator.claim(update.get("update_id")):
+            return
 
         if chat_id in TELEGRAM_ADMIN_CHAT_IDS:
-            self._upsert_authorized_user(chat_id, username, role="admin")
+            self._ensure_admin(chat_id, username)
 
         command_source = text.strip() if text else caption.strip()
         if not command_source:
             return
         command, *rest = command_source.split(maxsplit=1)
         payload = rest[0] if rest else ""
+        spec = commands.get(command)
 
+        started = time.perf_counter()
+        failed = False
         try:
-            if command in {"/start", "/help"}:
-                self.send_bot_message(chat_id, self.help_message())
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if not self._is_authorized(chat_id):
-                self.send_bot_message(chat_id, "Acesso negado. Peça autorização para o administrador.")
-                self._audit(chat_id, username, command, payload, "denied")
-                return
-
-            args = self._parse_kv_args(payload)
-
-            if command == "/authorize":
-                if self._role_for(chat_id) != "admin":
-                    raise ValueError("Apenas admin pode autorizar usuários.")
-                target_chat_id = args.get("chat_id")
-                role = args.get("role", "operator")
-                if not target_chat_id:
-                    raise ValueError("Informe chat_id.")
-                if role not in {"admin", "operator", "viewer"}:
-                    raise ValueError("role inválido.")
-                self._upsert_authorized_user(target_chat_id, None, role=role)
-                self.send_bot_message(chat_id, f"Usuário {target_chat_id} autorizado como {role}.")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/subscribe_summary":
-                role = self._role_for(chat_id) or "viewer"
-                self._upsert_authorized_user(chat_id, username, role=role)
-                self.repository.upsert_summary_subscription(chat_id)
-                self.send_bot_message(chat_id, "Inscrição em resumo automático ativada.")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/unsubscribe_summary":
-                self.repository.delete_subscription(chat_id)
-                self.send_bot_message(chat_id, "Inscrição removida.")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/confirm":
-                result_text = self._execute_confirmed(chat_id)
-                self.send_bot_message(chat_id, result_text)
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/cancel":
-                self.pending_confirmations.pop(chat_id, None)
-                self.send_bot_message(chat_id, "Ação pendente cancelada.")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/summary":
-                summary = build_summary()
-                self.send_bot_message(
-                    chat_id,
-                    "Resumo:\n"
-                    f"Créditos: {summary['total_credit']}\n"
-                    f"Débitos: {summary['total_debit']}\n"
-                    f"Despesas: {summary['total_expenses']}\n"
-                    f"Saldo estimado: {summary['balance']}\n"
-                    f"Loads pendentes: {summary['pending_loads']}",
-                )
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/close_week":
-                week_reference = args.get("week_reference")
-                if not week_reference:
-                    raise ValueError("Informe week_reference.")
-                self._queue_confirmation(chat_id, "close_week", {"week_reference": week_reference})
-                self.send_bot_message(
-                    chat_id,
-                    f"Confirmar fechamento da semana {week_reference}? Use /confirm ou /cancel.",
-                )
-                self._audit(chat_id, username, command, payload, "pending")
-                return
-
-            if command == "/ledger":
-                owner_id = args.get("owner_id")
-                driver_id = args.get("driver_id")
-                limit = int(args.get("limit", "10"))
-                entries = get_ledger(
-                    owner_external_id=owner_id,
-                    driver_external_id=driver_id,
-                    limit=limit,
-                )
-                if not entries:
-                    self.send_bot_message(chat_id, "Sem lançamentos no período.")
-                    self._audit(chat_id, username, command, payload, "ok")
+            if spec is not None and spec.public:
+                args: dict[str, str] = {}
+            else:
+                if not self._is_authorized(chat_id):
+                    self.send_bot_message(chat_id, "Acesso negado. Peça autorização para o administrador.")
+                    self._audit(chat_id, username, command, payload, "denied")
                     return
-                lines = [
-                    f"{item['entry_date']} | {item['entry_type']} | {item['amount']} | {item['description']}"
-                    for item in entries
-                ]
-                self.send_bot_message(chat_id, "Lançamentos:\n" + "\n".join(lines))
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/open_loads":
-                owner_id = args.get("owner_id")
-                driver_id = args.get("driver_id")
-                if not owner_id and not driver_id:
-                    raise ValueError("Informe owner_id ou driver_id.")
-                summary = get_open_loads_summary(
-                    owner_external_id=owner_id,
-                    driver_external_id=driver_id,
-                )
-                self.send_bot_message(
-                    chat_id,
-                    "Loads em aberto:\n"
-                    f"Quantidade: {summary['open_count']}\n"
-                    f"Total bruto: {summary['gross_total']}\n"
-                    f"SLV fee: {summary['slv_fee_total']}\n"
-                    f"Dispatcher fee: {summary['recife_fee_total']}\n"
-                    f"Total líquido: {summary['net_total']}",
-                )
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/balance":
-                owner_id = args.get("owner_id")
-                driver_id = args.get("driver_id")
-                if not owner_id and not driver_id:
-                    raise ValueError("Informe owner_id ou driver_id.")
-                totals = get_payables_receivables(
-                    owner_external_id=owner_id,
-                    driver_external_id=driver_id,
-                )
-                self.send_bot_message(
-                    chat_id,
-                    "Resumo financeiro:\n"
-                    f"A receber: {totals['receivable']}\n"
-                    f"A pagar (dispatcher): {totals['payable']}",
-                )
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/suggest_reconcile":
-                transaction_id = args.get("transaction_id")
-                if not transaction_id:
-                    raise ValueError("Informe transaction_id.")
-                suggestions = suggest_reconciliation_candidates(transaction_id)
-                if not suggestions:
-                    self.send_bot_message(chat_id, "Sem sugestões para essa transação.")
-                    self._audit(chat_id, username, command, payload, "ok")
+                if spec is None:
+                    self.send_bot_message(chat_id, "Comando não reconhecido. Use /help.")
+                    self._audit(chat_id, username, command, payload, "unknown")
                     return
-                lines = [
-                    f"Load {item['load_id']} | score {item['score']} | gap {item['amount_gap']} | day_gap {item['day_gap']}"
-                    for item in suggestions
-                ]
-                self.send_bot_message(chat_id, "Sugestões:\n" + "\n".join(lines))
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command.startswith("/import_"):
-                if not document:
-                    raise ValueError("Envie o CSV anexado com a legenda do comando.")
-                file_bytes = self._fetch_file(document["file_id"])
-                self._validate_csv_headers(command, file_bytes)
-                if args.get("dry_run") == "1":
-                    self.send_bot_message(chat_id, "Dry-run OK: CSV válido para importação.")
-                    self._audit(chat_id, username, command, payload, "ok")
-                    return
-                tmp_file_path = ""
-                try:
-                    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp_file:
-                        tmp_file.write(file_bytes)
-                        tmp_file_path = tmp_file.name
-
-                    if command == "/import_owners":
-                        count = import_owners(tmp_file_path)
-                    elif command == "/import_drivers":
-                        count = import_drivers(tmp_file_path)
-                    elif command == "/import_trucks":
-                        count = import_trucks(tmp_file_path)
-                    elif command == "/import_accounts":
-                        count = import_bank_accounts(tmp_file_path)
-                    elif command == "/import_loads":
-                        count = import_loads(tmp_file_path, sheet_owner=args.get("sheet_owner"))
-                    elif command == "/import_bank":
-                        count = import_bank_transactions(tmp_file_path, sheet_owner=args.get("sheet_owner"))
-                    elif command == "/import_expenses":
-                        count = import_expenses(tmp_file_path)
-                    elif command == "/import_car_loads":
-                        truck_id = args.get("truck_id")
-                        if not truck_id:
-                            raise ValueError("Informe truck_id para importação de carros.")
-                        count = import_car_loads(
-                            tmp_file_path,
-                            truck_external_id=truck_id,
-                            sheet_owner=args.get("sheet_owner"),
-                        )
-                    else:
-                        raise ValueError("Importação não reconhecida.")
-                finally:
-                    if tmp_file_path:
-                        Path(tmp_file_path).unlink(missing_ok=True)
-                self.send_bot_message(chat_id, f"Importação concluída ({count} registros).")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/add_owner":
-                required = {"name"}
-                if not required.issubset(args):
-                    raise ValueError("Informe name.")
-                owner_id = self._ensure_external_id(args, "owner_id", "OWNER")
-                telegram_chat_id = args.get("telegram_chat_id") or chat_id
-                add_owner(owner_id, args["name"], telegram_chat_id)
-                self.send_bot_message(chat_id, f"Dono cadastrado com sucesso. owner_id={owner_id}")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/add_driver":
-                required = {"name"}
-                if not required.issubset(args):
-                    raise ValueError("Informe name.")
-                driver_id = self._ensure_external_id(args, "driver_id", "DRIVER")
-                add_driver(driver_id, args["name"], args.get("owner_id"), args.get("is_owner_driver") == "1")
-                self.send_bot_message(chat_id, f"Motorista cadastrado com sucesso. driver_id={driver_id}")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/add_truck":
-                required = {"owner_id"}
-                if not required.issubset(args):
-                    raise ValueError("Informe owner_id.")
-                truck_id = self._ensure_external_id(args, "truck_id", "TRUCK")
-                add_truck(truck_id, args["owner_id"], args.get("plate"))
-                self.send_bot_message(chat_id, f"Truck cadastrado com sucesso. truck_id={truck_id}")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
-
-            if command == "/add_account":
-                required = {"label"}
-                if not required.issubset(args):
-                    raise ValueError("Informe label.")
-                account_id = self._ensure_external_id(args, "account_id", "ACC")
-                add_bank_account(account_id, args["label"], args.get("owner_id"), args.get("driver_id"))
-                self.send_bot_message(chat_id, f"Conta bancária cadastrada com sucesso. account_id={account_id}")
-                self._audit(chat_id, username, command, payload, "ok")
+                if spec.roles is not None and self._role_for(chat_id) not in spec.roles:
+                    raise ValueError(f"Apenas {'/'.join(sorted(spec.roles))} pode usar {command}.")
+                args = self._parse_kv_args(payload)
+                missing = [name for name in spec.required if name not in args]
+                if missing:
+                    raise ValueError(f"Informe {' e '.join(missing)}.")
+
+            # Audited commands leave a durable "started" row before acting: if it cannot be
+            # written the command fails here, before anything changes.
+            if self._audit_is_sync(command):
+                self._audit(chat_id, username, command, payload, "started")
+            result = spec.handler(self, CommandContext(chat_id, username, command, payload, args, document))
+            if isinstance(result, Confirmation):
+                self._queue_confirmation(chat_id, spec.confirmation, result.args)
+                self.send_bot_message(chat_id, f"{result.prompt} Use /confirm ou /cancel.")
+                self._audit_outcome(chat_id, username, command, payload, "pending")
                 return
+            self._audit_outcome(chat_id, username, command, payload, "ok")
+        except Exception as exc:
+            failed = True
+            self.send_bot_message(chat_id, f"Erro ao processar comando: {exc}")
+            try:
+                self._audit(chat_id, username, command, payload, "error", str(exc))
+            except AuditWriteError as audit_exc:
+                logger.error("Auditoria de %s não gravada: %s", command, audit_exc)
+        finally:
+            if spec is not None:
+                self.command_metrics.record(command, time.perf_counter() - started, failed)
+
+    @commands.command("/start", "/help", public=True)
+    def _cmd_help(self, ctx: CommandContext) -> None:
+        self.send_bot_message(ctx.chat_id, self.help_message())
+
+    @commands.command("/authorize", required=("chat_id",), roles={"admin"})
+    def _cmd_authorize(self, ctx: CommandContext) -> None:
+        role = ctx.args.get("role", "operator")
+        if role not in {"admin", "operator", "viewer"}:
+            raise ValueError("role inválido.")
+        self._upsert_authorized_user(ctx.args["chat_id"], None, role=role)
+        self.send_bot_message(ctx.chat_id, f"Usuário {ctx.args['chat_id']} autorizado como {role}.")
+
+    @commands.command("/stats", roles={"admin"})
+    def _cmd_stats(self, ctx: CommandContext) -> None:
+        snapshot = self.command_metrics.snapshot()
+        if not snapshot:
+            self.send_bot_message(ctx.chat_id, "Sem comandos registrados desde o início.")
+            return
+        lines = [
+            f"{command} | {item['calls']} chamadas | {item['errors']} erros | "
+            f"p50 {item['p50_ms']} ms | p95 {item['p95_ms']} ms | max {item['max_ms']} ms"
+            for command, item in snapshot.items()
+        ]
+        self.send_bot_message(ctx.chat_id, "Latência por comando:\n" + "\n".join(lines))
+
+    @commands.command("/subscribe_summary")
+    def _cmd_subscribe_summary(self, ctx: CommandContext) -> None:
+        role = self._role_for(ctx.chat_id) or "viewer"
+        self._upsert_authorized_user(ctx.chat_id, ctx.username, role=role)
+        self.repository.upsert_summary_subscription(ctx.chat_id)
+        self.send_bot_message(ctx.chat_id, "Inscrição em resumo automático ativada.")
+
+    @commands.command("/unsubscribe_summary")
+    def _cmd_unsubscribe_summary(self, ctx: CommandContext) -> None:
+        self.repository.delete_subscription(ctx.chat_id)
+        self.send_bot_message(ctx.chat_id, "Inscrição removida.")
+
+    @commands.command("/confirm")
+    def _cmd_confirm(self, ctx: CommandContext) -> None:
+        self.send_bot_message(ctx.chat_id, self._execute_confirmed(ctx.chat_id))
+
+    @commands.command("/cancel")
+    def _cmd_cancel(self, ctx: CommandContext) -> None:
+        self.confirmations.discard(ctx.chat_id)
+        self.send_bot_message(ctx.chat_id, "Ação pendente cancelada.")
+
+    @commands.command("/summary")
+    def _cmd_summary(self, ctx: CommandContext) -> None:
+        self.send_bot_message(ctx.chat_id, self._format_summary(build_summary(), "Resumo"))
+
+    @commands.command("/close_week", required=("week_reference",), confirmation="close_week")
+    def _cmd_close_week(self, ctx: CommandContext) -> Confirmation:
+        week_reference = ctx.args["week_reference"]
+        return Confirmation({"week_reference": week_reference}, f"Confirmar fechamento da semana {week_reference}?")
+
+    @commands.command("/ledger")
+    def _cmd_ledger(self, ctx: CommandContext) -> None:
+        entries = get_ledger(
+            owner_external_id=ctx.args.get("owner_id"),
+            driver_external_id=ctx.args.get("driver_id"),
+            limit=int(ctx.args.get("limit", "10")),
+        )
+        if not entries:
+            self.send_bot_message(ctx.chat_id, "Sem lançamentos no período.")
+            return
+        lines = [
+            f"{item['entry_date']} | {item['entry_type']} | {item['amount']} | {item['description']}"
+            for item in entries
+        ]
+        self.send_bot_message(ctx.chat_id, "Lançamentos:\n" + "\n".join(lines))
 
-            if command == "/add_load":
-                required = {"amount_gross"}
-                if not required.issubset(args):
-                    raise ValueError("Informe amount_gross.")
-                load_id = self._ensure_external_id(args, "load_id", "LOAD")
-                self._queue_confirmation(chat_id, "add_load", args)
-                self.send_bot_message(
-                    chat_id,
-                    f"Confirmar cadastro do load {load_id}? Use /confirm ou /cancel.",
-                )
-                self._audit(chat_id, username, command, payload, "pending")
-                return
+    @staticmethod
+    def _owner_or_driver(args: dict[str, str]) -> tuple[str | None, str | None]:
+        owner_id = args.get("owner_id")
+        driver_id = args.get("driver_id")
+        if not owner_id and not driver_id:
+            raise ValueError("Informe owner_id ou driver_id.")
+        return owner_id, driver_id
+
+    @commands.command("/open_loads")
+    def _cmd_open_loads(self, ctx: CommandContext) -> None:
+        owner_id, driver_id = self._owner_or_driver(ctx.args)
+        summary = get_open_loads_summary(owner_external_id=owner_id, driver_external_id=driver_id)
+        self.send_bot_message(
+            ctx.chat_id,
+            "Loads em aberto:\n"
+            f"Quantidade: {summary['open_count']}\n"
+            f"Total bruto: {summary['gross_total']}\n"
+            f"SLV fee: {summary['slv_fee_total']}\n"
+            f"Dispatcher fee: {summary['recife_fee_total']}\n"
+            f"Total líquido: {summary['net_total']}",
+        )
 
-            if command == "/add_expense":
-                required = {"expense_date", "amount"}
-                if not required.issubset(args):
-                    raise ValueError("Informe expense_date e amount.")
-                add_expense(
-                    args.get("owner_id"),
-                    args.get("truck_id"),
-                    args.get("account_id"),
-                    args["expense_date"],
-                    args["amount"],
-                    args.get("description"),
-                    args.get("category"),
-                    args.get("cost_center"),
-                )
-                self.send_bot_message(chat_id, "Despesa cadastrada com sucesso.")
-                self._audit(chat_id, username, command, payload, "ok")
-                return
+    @commands.command("/balance")
+    def _cmd_balance(self, ctx: CommandContext) -> None:
+        owner_id, driver_id = self._owner_or_driver(ctx.args)
+        totals = get_payables_receivables(owner_external_id=owner_id, driver_external_id=driver_id)
+        self.send_bot_message(
+            ctx.chat_id,
+            "Resumo financeiro:\n"
+            f"A receber: {totals['receivable']}\n"
+            f"A pagar (dispatcher): {totals['payable']}",
+        )
 
-            if command == "/add_bank_transaction":
-                required = {"txn_date", "amount"}
-                if not required.issubset(args):
-                    raise ValueError("Informe txn_date e amount.")
-                transaction_id = self._ensure_external_id(args, "transaction_id", "TXN")
-                add_bank_transaction(
-                    transaction_id,
-                    args.get("account_id"),
-                    args["txn_date"],
-                    args.get("description"),
-                    args["amount"],
-                    args.get("transaction_type"),
-                    args.get("category"),
-                    args.get("related_account_id"),
-                    args.get("sheet_owner"),
-                )
-                self.send_bot_message(chat_id, f"Transação bancária cadastrada com sucesso. transaction_id={transaction_id}")
-                self._audit(chat_id, username, command, payload, "ok")
+    @commands.command("/suggest_reconcile", required=("transaction_id",))
+    def _cmd_suggest_reconcile(self, ctx: CommandContext) -> None:
+        transaction_id = ctx.args["transaction_id"]
+        suggestions = suggest_reconciliation_candidates(transaction_id)
+        combos = find_multi_load_matches(
+            transaction_external_id=transaction_id,
+            tolerance=float(ctx.args["tolerance"]) if ctx.args.get("tolerance") else None,
+        )
+        if not suggestions and not combos["matches"]:
+            self.send_bot_message(ctx.chat_id, "Sem sugestões para essa transação.")
+            return
+        lines = [
+            f"Load {item['load_id']} | score {item['score']} | gap {item['amount_gap']} | day_gap {item['day_gap']}"
+            for item in suggestions
+        ]
+        if combos["matches"]:
+            lines.append("Combinações de loads:")
+            lines.extend(
+                f"{item['group']} {item['group_id']} ({item['basis']}) | total {item['total']} "
+                f"| gap {item['amount_gap']} | loads {', '.join(load['load_id'] for load in item['loads'])}"
+                for item in combos["matches"]
+            )
+        if combos["timed_out"]:
+            lines.append("(busca de combinações interrompida pelo limite de tempo)")
+        self.send_bot_message(ctx.chat_id, "Sugestões:\n" + "\n".join(lines))
+
+    @commands.command("/auto_reconcile", confirmation="auto_reconcile")
+    def _cmd_auto_reconcile(self, ctx: CommandContext) -> Confirmation | None:
+        result = auto_reconcile(min_score=int(ctx.args["min_score"]) if ctx.args.get("min_score") else None)
+        self.send_bot_message(ctx.chat_id, self._format_auto_reconcile(result))
+        if ctx.args.get("apply") == "1" and result["matched"]:
+            return Confirmation(
+                {"min_score": str(result["min_score"])},
+                f"Confirmar conciliação de {result['matched']} transações?",
+            )
+        return None
+
+    @commands.command(*CSV_IMPORT_COMMANDS)
+    def _cmd_import(self, ctx: CommandContext) -> None:
+        if not ctx.document:
+            raise ValueError("Envie o CSV anexado com a legenda do comando.")
+        if ctx.command == "/import_car_loads" and not ctx.args.get("truck_id"):
+            raise ValueError("Informe truck_id para importação de carros.")
+        # Saved under JOBS_DIR: the job reads it after this update is done, then deletes it.
+        file_path = job_file(".csv")
+        try:
+            self._download_file(ctx.document["file_id"], file_path)
+            kind = ctx.command.lstrip("/")
+            if ctx.args.get("dry_run") == "1":
+                report = dry_run_import(kind, file_path, ctx.args)
+                file_path.unlink(missing_ok=True)
+                self.send_bot_message(ctx.chat_id, format_dry_run(report))
                 return
-
-            self.send_bot_message(chat_id, "Comando não reconhecido. Use /help.")
-            self._audit(chat_id, username, command, payload, "unknown")
-        except Exception as exc:
-            self.send_bot_message(chat_id, f"Erro ao processar comando: {exc}")
-            self._audit(chat_id, username, command, payload, "error", str(exc))
+            check_csv_headers(kind, file_path)
+            message = self.send_bot_message(ctx.chat_id, "Importação recebida, aguardando na fila...")
+            enqueue_job(
+                kind,
+                {**ctx.args, "path": str(file_path)},
+                chat_id=ctx.chat_id,
+                message_id=(message or {}).get("message_id"),
+            )
+        except Exception:
+            file_path.unlink(missing_ok=True)
+            raise
+
+    @commands.command("/add_owner", required=("name",))
+    def _cmd_add_owner(self, ctx: CommandContext) -> None:
+        owner_id = self._ensure_external_id(ctx.args, "owner_id", "OWNER")
+        add_owner(owner_id, ctx.args["name"], ctx.args.get("telegram_chat_id") or ctx.chat_id)
+        self.send_bot_message(ctx.chat_id, f"Dono cadastrado com sucesso. owner_id={owner_id}")
+
+    @commands.command("/add_driver", required=("name",))
+    def _cmd_add_driver(self, ctx: CommandContext) -> None:
+        driver_id = self._ensure_external_id(ctx.args, "driver_id", "DRIVER")
+        add_driver(driver_id, ctx.args["name"], ctx.args.get("owner_id"), ctx.args.get("is_owner_driver") == "1")
+        self.send_bot_message(ctx.chat_id, f"Motorista cadastrado com sucesso. driver_id={driver_id}")
+
+    @commands.command("/add_truck", required=("owner_id",))
+    def _cmd_add_truck(self, ctx: CommandContext) -> None:
+        truck_id = self._ensure_external_id(ctx.args, "truck_id", "TRUCK")
+        add_truck(truck_id, ctx.args["owner_id"], ctx.args.get("plate"))
+        self.send_bot_message(ctx.chat_id, f"Truck cadastrado com sucesso. truck_id={truck_id}")
+
+    @commands.command("/add_account", required=("label",))
+    def _cmd_add_account(self, ctx: CommandContext) -> None:
+        account_id = self._ensure_external_id(ctx.args, "account_id", "ACC")
+        add_bank_account(account_id, ctx.args["label"], ctx.args.get("owner_id"), ctx.args.get("driver_id"))
+        self.send_bot_message(ctx.chat_id, f"Conta bancária cadastrada com sucesso. account_id={account_id}")
+
+    @commands.command("/add_load", required=("amount_gross",), confirmation="add_load")
+    def _cmd_add_load(self, ctx: CommandContext) -> Confirmation:
+        load_id = self._ensure_external_id(ctx.args, "load_id", "LOAD")
+        return Confirmation(ctx.args, f"Confirmar cadastro do load {load_id}?")
+
+    @commands.command("/add_expense", required=("expense_date", "amount"))
+    def _cmd_add_expense(self, ctx: CommandContext) -> None:
+        add_expense(
+            ctx.args.get("owner_id"),
+            ctx.args.get("truck_id"),
+            ctx.args.get("account_id"),
+            ctx.args["expense_date"],
+            ctx.args["amount"],
+            ctx.args.get("description"),
+            ctx.args.get("category"),
+            ctx.args.get("cost_center"),
+        )
+        self.send_bot_message(ctx.chat_id, "Despesa cadastrada com sucesso.")
+
+    @commands.command("/add_bank_transaction", required=("txn_date", "amount"))
+    def _cmd_add_bank_transaction(self, ctx: CommandContext) -> None:
+        transaction_id = self._ensure_external_id(ctx.args, "transaction_id", "TXN")
+        add_bank_transaction(
+            transaction_id,
+            ctx.args.get("account_id"),
+            ctx.args["txn_date"],
+            ctx.args.get("description"),
+            ctx.args["amount"],
+            ctx.args.get("transaction_type"),
+            ctx.args.get("category"),
+            ctx.args.get("related_account_id"),
+            ctx.args.get("sheet_owner"),
+        )
+        self.send_bot_message(
+            ctx.chat_id, f"Transação bancária cadastrada com sucesso. transaction_id={transaction_id}"
+        )
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import PROCESSED_UPDATES_RETENTION_HOURS, UPDATE_DEDUP_CACHE_SIZE
+from app.repositories.telegram_repository import AsyncTelegramRepository, TelegramRepository
+
+PURGE_INTERVAL_SECONDS = 3600
+
+
+class UpdateDeduplicator:
+    """Remembers Telegram update_ids so redelivered updates are not executed twice.
+
+    Recent ids are answered from a bounded LRU; the processed_updates table makes the
+    claim authoritative across workers and restarts and is trimmed to the retention
+    window at most once an hour. The webhook claims on the event loop (``aclaim``);
+    polling and direct callers use ``claim``.
+    """
+
+    def __init__(
+        self,
+        repository: TelegramRepository | None = None,
+        cache_size: int = UPDATE_DEDUP_CACHE_SIZE,
+        retention_hours: int = PROCESSED_UPDATES_RETENTION_HOURS,
+        async_repository: AsyncTelegramRepository | None = None,
+    ) -> None:
+        self.repository = repository or TelegramRepository()
+        self.async_repository = async_repository or AsyncTelegramRepository()
+        self.cache_size = max(1, cache_size)
+        self.retention_hours = retention_hours
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._stats = {"claimed": 0, "duplicates_cached": 0, "duplicates_db": 0, "purged": 0}
+
+    def _remember(self, update_id: int) -> None:
+        self._seen[update_id] = None
+        self._seen.move_to_end(update_id)
+        while len(self._seen) > self.cache_size:
+            self._seen.popitem(last=False)
+
+    def seen(self, update_id: int | None) -> bool:
+        if update_id is None:
+            return False
+        with self._lock:
+            if update_id in self._seen:
+                self._stats["duplicates_cached"] += 1
+                return True
+        return False
+
+    def claim(self, update_id: int | None) -> bool:
+        if update_id is None:
+            return True
+        if self.seen(update_id):
+            return False
+        claimed = self.repository.claim_update(update_id)
+        if self._record(update_id, claimed):
+            deleted = self.repository.purge_processed_updates(self.retention_hours)
+            with self._lock:
+                self._stats["purged"] += deleted
+        return claimed
+
+    async def aclaim(self, update_id: int | None) -> bool:
+        if update_id is None:
+            return True
+        if self.seen(update_id):
+            return False
+        claimed = await self.async_repository.claim_update(update_id)
+        if self._record(update_id, claimed):
+            deleted = await self.async_repository.purge_processed_updates(self.retention_hours)
+            with self._lock:
+                self._stats["purged"] += deleted
+        return claimed
+
+    async def arelease(self, update_id: int | None) -> None:
+        """Undoes an ``aclaim`` whose update could not be queued, so Telegram's retry runs it."""
+        if update_id is None:
+            return
+        await self.async_repository.release_update(update_id)
+        with self._lock:
+            self._seen.pop(update_id, None)
+            self._stats["claimed"] -= 1
+
+    def _record(self, update_id: int, claimed: bool) -> bool:
+        """Remembers the id and counts the outcome; returns True when a purge is due."""
+        with self._lock:
+            self._remember(update_id)
+            self._stats["claimed" if claimed else "duplicates_db"] += 1
+            purge = time.monotonic() >= self._next_purge
+            if purge:
+                self._next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+        return purge
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            duplicates = self._stats["duplicates_cached"] + self._stats["duplicates_db"]
+            total = self._stats["claimed"] + duplicates
+            return {
+                **self._stats,
+                "cached": len(self._seen),
+                "retry_rate": round(duplicates / total, 4) if total else 0.0,
+            }
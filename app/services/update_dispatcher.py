@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def update_key(update: dict) -> str:
+    message = update.get("message") or update.get("edited_message") or {}
+    chat_id = (message.get("chat") or {}).get("id")
+    if chat_id is not None:
+        return f"chat:{chat_id}"
+    return f"update:{update.get('update_id')}"
+
+
+class UpdateDispatcher:
+    """Bounded queue of Telegram updates drained by a pool of worker threads.
+
+    Updates of the same chat run one at a time in arrival order; different chats run
+    concurrently. A chat is in at most one place: waiting in ``_ready`` or being
+    handled (``_active``), so a slow chat never holds more than one worker.
+    """
+
+    def __init__(self, handler: Callable[[dict], None], workers: int = 4, max_queued: int = 1000) -> None:
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self._condition = threading.Condition()
+        self._pending: dict[str, deque[tuple[float, dict]]] = {}
+        self._ready: deque[str] = deque()
+        self._active: set[str] = set()
+        self._queued = 0
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        self._stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "processed": 0,
+            "failed": 0,
+            "max_queued_seen": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "handle_seconds_total": 0.0,
+            "handle_seconds_max": 0.0,
+        }
+
+    def start(self) -> None:
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"telegram-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads = self._threads
+            self._threads = []
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def submit(self, update: dict) -> None:
+        key = update_key(update)
+        with self._condition:
+            if self._queued >= self.max_queued:
+                self._stats["rejected"] += 1
+                raise QueueFullError("Fila de updates cheia.")
+            queue = self._pending.get(key)
+            if queue is None:
+                queue = self._pending[key] = deque()
+            queue.append((time.monotonic(), update))
+            if len(queue) == 1 and key not in self._active:
+                self._ready.append(key)
+                self._condition.notify()
+            self._queued += 1
+            self._stats["accepted"] += 1
+            self._stats["max_queued_seen"] = max(self._stats["max_queued_seen"], self._queued)
+
+    def _next(self) -> tuple[str, float, dict] | None:
+        with self._condition:
+            while not self._ready:
+                if self._stopping:
+                    return None
+                self._condition.wait()
+            key = self._ready.popleft()
+            enqueued_at, update = self._pending[key].popleft()
+            self._active.add(key)
+            self._queued -= 1
+            return key, enqueued_at, update
+
+    def _done(self, key: str, waited: float, elapsed: float, failed: bool) -> None:
+        with self._condition:
+            self._active.discard(key)
+            if self._pending[key]:
+                self._ready.append(key)
+                self._condition.notify()
+            else:
+                del self._pending[key]
+            self._stats["failed" if failed else "processed"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+            self._stats["handle_seconds_total"] += elapsed
+            self._stats["handle_seconds_max"] = max(self._stats["handle_seconds_max"], elapsed)
+
+    def _run(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            key, enqueued_at, update = item
+            started = time.monotonic()
+            failed = False
+            try:
+                self.handler(update)
+            except Exception:
+                failed = True
+                logger.exception("Falha ao processar update %s", update.get("update_id"))
+            self._done(key, started - enqueued_at, time.monotonic() - started, failed)
+
+    def metrics(self) -> dict[str, Any]:
+        with self._condition:
+            finished = self._stats["processed"] + self._stats["failed"]
+            return {
+                "workers": len(self._threads),
+                "queued": self._queued,
+                "max_queued": self.max_queued,
+                "in_flight": len(self._active),
+                "chats": len(self._pending),
+                "accepted": self._stats["accepted"],
+                "rejected": self._stats["rejected"],
+                "processed": self._stats["processed"],
+                "failed": self._stats["failed"],
+                "max_queued_seen": self._stats["max_queued_seen"],
+                "avg_wait_ms": round(self._stats["wait_seconds_total"] * 1000 / finished, 1) if finished else 0.0,
+                "max_wait_ms": round(self._stats["wait_seconds_max"] * 1000, 1),
+                "avg_handle_ms": round(self._stats["handle_seconds_total"] * 1000 / finished, 1) if finished else 0.0,
+                "max_handle_ms": round(self._stats["handle_seconds_max"] * 1000, 1),
+            }
@@ -1,13 +1,21 @@
-from app.models.dashboard import DashboardData
-from app.repositories.dashboard_repository import DashboardRepository
+from app.models.dashboard import DashboardData, DashboardFilters
+from app.repositories.dashboard_repository import AsyncDashboardRepository, DashboardRepository
 
 
 class WebService:
-    def __init__(self, repository: DashboardRepository | None = None) -> None:
+    def __init__(
+        self,
+        repository: DashboardRepository | None = None,
+        async_repository: AsyncDashboardRepository | None = None,
+    ) -> None:
         self.repository = repository or DashboardRepository()
+        self.async_repository = async_repository or AsyncDashboardRepository()
+
+    def fetch_dashboard(self, filters: DashboardFilters | None = None) -> DashboardData:
+        return self.repository.fetch_dashboard(filters)
 
-    def fetch_dashboard(self) -> DashboardData:
-        return self.repository.fetch_dashboard()
+    async def fetch_dashboard_async(self, filters: DashboardFilters | None = None) -> DashboardData:
+        return await self.async_repository.fetch_dashboard(filters)
 
     def reconcile(
         self,
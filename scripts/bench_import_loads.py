@@ -0,0 +1,241 @@
+"""Benchmark: per-row import_loads (the original path) vs the COPY/staging path.
+
+Runs against DATABASE_URL. Every row it creates uses the BENCH_ prefix and is deleted at the
+end, but point it at a scratch database anyway: the per-row run commits once per load.
+
+The old dispatcher fee check filtered expenses by description with no index, so the per-row
+path is quadratic in the size of expenses. By default the benchmark adds a temporary index for
+that lookup, which favours the per-row path; --no-fee-index measures it as it shipped.
+
+    python -m scripts.bench_import_loads --rows 50000
+"""
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.db import get_connection
+from app.importers import import_loads, parse_amount, parse_date
+
+PREFIX = "BENCH_"
+
+
+def write_csv(path: Path, rows: int, drivers: int, seed: int) -> None:
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    with path.open("w", encoding="utf-8", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["load_id", "driver_id", "truck_id", "load_date", "description", "amount_gross", "status", "week_reference"])
+        for index in range(rows):
+            fleet = rng.randrange(drivers)
+            load_date = start + timedelta(days=rng.randrange(365))
+            writer.writerow(
+                [
+                    f"{PREFIX}L{index:07d}",
+                    f"{PREFIX}D{fleet:03d}",
+                    f"{PREFIX}T{fleet:03d}",
+                    load_date.isoformat(),
+                    f"Load {index}",
+                    f"{rng.randrange(50_000, 900_000) / 100:.2f}",
+                    "open",
+                    f"{load_date.isocalendar().year}-W{load_date.isocalendar().week:02d}",
+                ]
+            )
+
+
+def setup_fleet(drivers: int) -> None:
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO owners (external_id, name) VALUES (%s, 'Bench') RETURNING id",
+                (f"{PREFIX}OWNER",),
+            )
+            owner_id = cursor.fetchone()["id"]
+            for index in range(drivers):
+                cursor.execute(
+                    "INSERT INTO drivers (external_id, name, owner_id) VALUES (%s, %s, %s)",
+                    (f"{PREFIX}D{index:03d}", f"Driver {index}", owner_id),
+                )
+                cursor.execute(
+                    "INSERT INTO trucks (external_id, owner_id) VALUES (%s, %s)",
+                    (f"{PREFIX}T{index:03d}", owner_id),
+                )
+        connection.commit()
+
+
+def clear_loads() -> None:
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM expenses WHERE load_id IN (SELECT id FROM loads WHERE external_id LIKE %s)",
+                (f"{PREFIX}%",),
+            )
+            cursor.execute("DELETE FROM loads WHERE external_id LIKE %s", (f"{PREFIX}%",))
+        connection.commit()
+
+
+def clear_fleet() -> None:
+    clear_loads()
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            for table in ("trucks", "drivers", "owners"):
+                cursor.execute(f"DELETE FROM {table} WHERE external_id LIKE %s", (f"{PREFIX}%",))
+        connection.commit()
+
+
+def written_counts() -> tuple[int, int]:
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT COUNT(*) AS loads, COUNT(e.id) AS fees
+                FROM loads l
+                LEFT JOIN expenses e ON e.load_id = l.id AND e.category = 'dispatcher'
+                WHERE l.external_id LIKE %s
+                """,
+                (f"{PREFIX}%",),
+            )
+            row = cursor.fetchone()
+    return row["loads"], row["fees"]
+
+
+def import_loads_per_row(path: Path, sheet_owner: str | None = None) -> int:
+    """The import as it was before the COPY path: one upsert with correlated sub-selects per
+    row, then the dispatcher fee lookup, existence check, insert and commit per load."""
+    with open(path, "r", encoding="utf-8-sig") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    with get_connection() as connection:
+        cursor = connection.cursor()
+        for row in rows:
+            cursor.execute(
+                """
+                INSERT INTO loads (
+                    external_id, driver_id, truck_id, load_date, description, amount_gross,
+                    slv_fee_percent, recife_fee_percent, status, week_reference, sheet_owner, updated_at
+                )
+                VALUES (
+                    %s,
+                    (SELECT id FROM drivers WHERE external_id = %s),
+                    (SELECT id FROM trucks WHERE external_id = %s),
+                    %s, %s, %s, %s, %s, COALESCE(%s, 'open'), %s, %s, CURRENT_TIMESTAMP
+                )
+                ON CONFLICT(external_id) DO UPDATE SET
+                    driver_id=excluded.driver_id,
+                    truck_id=excluded.truck_id,
+                    load_date=excluded.load_date,
+                    description=excluded.description,
+                    amount_gross=excluded.amount_gross,
+                    slv_fee_percent=excluded.slv_fee_percent,
+                    recife_fee_percent=excluded.recife_fee_percent,
+                    status=excluded.status,
+                    week_reference=excluded.week_reference,
+                    sheet_owner=excluded.sheet_owner,
+                    updated_at=CURRENT_TIMESTAMP
+                """,
+                (
+                    row.get("load_id"),
+                    row.get("driver_id"),
+                    row.get("truck_id"),
+                    parse_date(row.get("load_date")),
+                    row.get("description"),
+                    parse_amount(row.get("amount_gross")),
+                    11.0,
+                    10.0,
+                    row.get("status"),
+                    row.get("week_reference"),
+                    sheet_owner,
+                ),
+            )
+            cursor.execute(
+                """
+                SELECT l.id, l.external_id, l.load_date, l.amount_gross, l.recife_fee_percent, t.owner_id
+                FROM loads l
+                LEFT JOIN trucks t ON t.id = l.truck_id
+                WHERE l.external_id = %s
+                """,
+                (row.get("load_id"),),
+            )
+            load = cursor.fetchone()
+            if not load or not load["recife_fee_percent"]:
+                continue
+            fee = round(load["amount_gross"] * load["recife_fee_percent"] / 100, 2)
+            description = f"Dispatcher fee load {load['external_id']}"
+            cursor.execute(
+                "SELECT id FROM expenses WHERE description = %s AND amount = %s AND expense_date = %s",
+                (description, fee, load["load_date"]),
+            )
+            if cursor.fetchone():
+                continue
+            cursor.execute(
+                """
+                INSERT INTO expenses (owner_id, truck_id, bank_account_id, expense_date, amount, description,
+                                      category, cost_center, load_id)
+                VALUES (%s, NULL, NULL, %s, %s, %s, 'dispatcher', 'Dispatcher fee', %s)
+                """,
+                (load["owner_id"], load["load_date"], fee, description, load["id"]),
+            )
+            connection.commit()
+        connection.commit()
+        cursor.close()
+    return len(rows)
+
+
+def set_fee_index(enabled: bool) -> None:
+    with get_connection() as connection:
+        with connection.cursor() as cursor:
+            if enabled:
+                cursor.execute("CREATE INDEX IF NOT EXISTS bench_expenses_description ON expenses (description)")
+            else:
+                cursor.execute("DROP INDEX IF EXISTS bench_expenses_description")
+        connection.commit()
+
+
+def timed(label: str, run, path: Path) -> tuple[float, int, tuple[int, int]]:
+    clear_loads()
+    started = time.perf_counter()
+    imported = run(path)
+    elapsed = time.perf_counter() - started
+    counts = written_counts()
+    print(f"{label:<10} {elapsed:9.2f}s  {imported} linhas  loads={counts[0]} fees={counts[1]}")
+    return elapsed, imported, counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-speedup", type=float, default=20.0)
+    parser.add_argument("--no-fee-index", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "loads.csv"
+        write_csv(path, args.rows, args.drivers, args.seed)
+        clear_fleet()
+        setup_fleet(args.drivers)
+        try:
+            set_fee_index(not args.no_fee_index)
+            try:
+                per_row, per_row_count, per_row_written = timed("por linha", import_loads_per_row, path)
+            finally:
+                set_fee_index(False)
+            bulk, bulk_count, bulk_written = timed("COPY", import_loads, path)
+        finally:
+            clear_fleet()
+
+    if (per_row_count, per_row_written) != (bulk_count, bulk_written):
+        print("Resultados diferentes entre os dois caminhos.", file=sys.stderr)
+        return 1
+    speedup = per_row / bulk
+    print(f"speedup    {speedup:9.1f}x")
+    return 0 if speedup >= args.min_speedup else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
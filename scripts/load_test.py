@@ -0,0 +1,151 @@
+"""HTTP load test for the dashboard ("/") and the Telegram webhook.
+
+Keeps N keep-alive connections busy for a fixed time per concurrency level and prints
+req/s, latency percentiles and status codes. The client speaks HTTP/1.1 over raw asyncio
+streams so it spends as little CPU as possible; run it on another machine than the server
+and PostgreSQL when you can.
+
+With --pid (Linux, repeatable) it also prints the CPU time those processes used per
+request. 1000 / cpu_ms is what one dedicated core sustains for that process, which is the
+number to compare when the server shares its CPU with the database or the load generator.
+
+    python -m scripts.load_test dashboard --url http://127.0.0.1:8000 --concurrency 1 5 10 20 50 100
+    python -m scripts.load_test webhook --url http://127.0.0.1:8000 --secret "$BOT_TELEGRAM_WEBHOOK_SECRET"
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat", encoding="ascii") as stat_file:
+        fields = stat_file.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15; the split above starts at field 3.
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", "0")))
+    return status
+
+
+class Target:
+    def __init__(self, kind: str, url: str, page_size: int, secret: str | None) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.kind = kind
+        self.page_size = page_size
+        self.secret = secret
+        self.update_ids = itertools.count(int(time.time() * 1000))
+
+    def request(self) -> bytes:
+        if self.kind == "dashboard":
+            return (
+                f"GET /?page_size={self.page_size} HTTP/1.1\r\nHost: {self.host}\r\n\r\n"
+            ).encode("ascii")
+        body = json.dumps(
+            {"update_id": next(self.update_ids), "message": {"chat": {"id": 999}, "text": ""}}
+        ).encode("utf-8")
+        secret = f"X-Telegram-Bot-Api-Secret-Token: {self.secret}\r\n" if self.secret else ""
+        return (
+            f"POST /telegram/webhook HTTP/1.1\r\nHost: {self.host}\r\n{secret}"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("ascii") + body
+
+
+async def _client(target: Target, stop: float, results: list) -> None:
+    # A dropped connection is counted as an error and reopened, so one failure does not
+    # leave the client idle for the rest of the level.
+    while time.perf_counter() < stop:
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        try:
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                writer.write(target.request())
+                try:
+                    status = await _read_response(reader)
+                except (asyncio.IncompleteReadError, ConnectionError) as exc:
+                    results.append((type(exc).__name__, time.perf_counter() - started))
+                    break
+                results.append((status, time.perf_counter() - started))
+        finally:
+            writer.close()
+
+
+async def run_level(target: Target, concurrency: int, seconds: float, pids: list[int]) -> dict:
+    warmup: list = []
+    await asyncio.gather(*(_client(target, time.perf_counter() + 0.5, warmup) for _ in range(min(concurrency, 5))))
+    results: list = []
+    cpu_before = sum(_cpu_seconds(pid) for pid in pids)
+    own_before = time.process_time()
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(target, started + seconds, results) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu = sum(_cpu_seconds(pid) for pid in pids) - cpu_before
+    own = time.process_time() - own_before
+    latencies = sorted(latency for _, latency in results)
+    codes: dict = {}
+    for status, _ in results:
+        codes[status] = codes.get(status, 0) + 1
+    count = len(results) or 1
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "rps": len(results) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "codes": codes,
+        "server_cpu_ms": cpu * 1000 / count if pids else None,
+        "client_cpu_ms": own * 1000 / count,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=["dashboard", "webhook"])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 20, 50, 100])
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--secret", default=None)
+    parser.add_argument("--pid", type=int, action="append", default=[])
+    args = parser.parse_args()
+
+    target = Target(args.kind, args.url, args.page_size, args.secret)
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_level(target, concurrency, args.seconds, args.pid))
+        line = (
+            f"{args.kind} c={result['concurrency']:<4} {result['rps']:7.1f} req/s  "
+            f"p50={result['p50_ms']:.0f}ms p95={result['p95_ms']:.0f}ms  "
+            f"client_cpu={result['client_cpu_ms']:.2f}ms/req"
+        )
+        if result["server_cpu_ms"] is not None:
+            line += f"  server_cpu={result['server_cpu_ms']:.2f}ms/req"
+        print(f"{line}  codes={result['codes']}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
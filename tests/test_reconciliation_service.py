@@ -0,0 +1,46 @@
+from datetime import date
+from decimal import Decimal
+
+from app.services.reconciliation_service import ReconciliationService
+
+
+class FakeReconciliationRepository:
+    def __init__(self, credit: dict, loads: list[dict]) -> None:
+        self.credit = credit
+        self.loads = loads
+
+    def get_credit(self, bank_transaction_id=None, external_id=None):
+        return self.credit
+
+    def list_open_loads_between(self, date_from, date_to, max_amount):
+        return [load for load in self.loads if date_from <= load["load_date"] <= date_to]
+
+
+def _load(load_id: int, amount: str, driver: str) -> dict:
+    cents = int(Decimal(amount) * 100)
+    return {
+        "id": load_id,
+        "external_id": f"L{load_id}",
+        "load_date": date(2024, 5, 1),
+        "amount_gross": Decimal(amount),
+        "sheet_owner": None,
+        "driver_external_id": driver,
+        "truck_external_id": None,
+        "gross_cents": cents,
+        "net_cents": cents,
+    }
+
+
+def test_find_multi_load_matches_combines_loads_of_one_group():
+    repository = FakeReconciliationRepository(
+        {"id": 1, "external_id": "TXN_01", "txn_date": date(2024, 5, 3), "amount": Decimal("1500.00")},
+        [_load(1, "1000.00", "D1"), _load(2, "500.00", "D1"), _load(3, "700.00", "D1"), _load(4, "800.00", "D2")],
+    )
+
+    result = ReconciliationService(repository).find_multi_load_matches(transaction_external_id="TXN_01", tolerance=0)
+
+    assert result["timed_out"] is False
+    best = result["matches"][0]
+    assert best["group"] == "driver" and best["group_id"] == "D1"
+    assert sorted(load["load_id"] for load in best["loads"]) == ["L1", "L2"]
+    assert best["amount_gap"] == Decimal("0.00")
@@ -0,0 +1,16 @@
+import pytest
+
+from app.controllers.web_controller import _safe_return_to
+
+
+@pytest.mark.parametrize(
+    "value",
+    [None, "", "reconcile", "//evil.com", "/\\evil.com", "/\\/evil.com", "/\t/evil.com", "https://evil.com"],
+)
+def test_safe_return_to_rejects_off_site_targets(value):
+    assert _safe_return_to(value) == "/"
+
+
+@pytest.mark.parametrize("value", ["/", "/?page_size=10&txn_cursor=abc", "/jobs/3"])
+def test_safe_return_to_keeps_local_paths(value):
+    assert _safe_return_to(value) == value